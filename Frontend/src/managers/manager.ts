@@ -10,10 +10,11 @@ export class Manager{
     onVoiceComplete : () => void
     currentMessageId: any = null
     isVoiceMode: boolean = false // Track if we're in voice mode
+    sessionId: string | null = sessionStorage.getItem("chat_session_id") // Server-side chat history
 
     constructor(wsUrl: string, onMessageUpdate: (messageId: any, chunk: string, isLoading: boolean, isComplete?: boolean) => void, onNewMessage: (sender: string, text: string, loading?: boolean) => any,onVoiceComplete: ()=>void){
         this.audioManager = new AudioManager();
-        this.ws = new WebSocket(wsUrl)
+        this.ws = new WebSocket(this.sessionId ? `${wsUrl}${wsUrl.includes("?") ? "&" : "?"}session_id=${encodeURIComponent(this.sessionId)}` : wsUrl)
         this.ws.binaryType = "arraybuffer";
         this.chat_history = [];
         this.onMessageUpdate = onMessageUpdate;
@@ -32,12 +33,29 @@ export class Manager{
         this.audioManager.AddandPlay(chunk)
     }
 
+    // Barge-in: the server cancels the answer in progress when a new message arrives,
+    // so close the current message and drop its queued audio here too
+    InterruptCurrentMessage(){
+        if (this.currentMessageId && this.onMessageUpdate) {
+            this.onMessageUpdate(this.currentMessageId, "", false, true);
+            this.currentMessageId = null;
+        }
+        this.audioManager.resetSession();
+    }
+
+    StopResponse(){
+        this.InterruptCurrentMessage();
+        this.ws.send(JSON.stringify({ type: "stop" }));
+    }
+
     SendChatMessage(question: string, chat_history: Array<string>){
+        this.InterruptCurrentMessage();
         this.isVoiceMode = false; // Set to text mode
         // Send in the exact format your backend expects
         this.ws.send(JSON.stringify({
             type: "chat",
             question: question,
+            session_id: this.sessionId,
             chat_history: chat_history
         }));
         // Create a new AI message with loading state
@@ -45,12 +63,14 @@ export class Manager{
     }
     
     SendVoiceMessage(question: string, chat_history: Array<string>){
+        this.InterruptCurrentMessage();
         this.isVoiceMode = true; // Set to voice mode
         console.log("Sending voice message");
         // Send in the exact format your backend expects
         this.ws.send(JSON.stringify({
             type: "voice",
             question: question,
+            session_id: this.sessionId,
             chat_history: chat_history
         }));
         // Create a new AI message with loading state - start empty for transcript
@@ -104,8 +124,14 @@ export class Manager{
                     const jsonData = JSON.parse(event.data);
                     console.log("JSON received:", jsonData);
                     
+                    // Session assigned by the server; history is kept there
+                    if (jsonData['type'] === 'session') {
+                        this.sessionId = jsonData['session_id'];
+                        sessionStorage.setItem("chat_session_id", jsonData['session_id']);
+                    }
+
                     // Handle chat responses
-                    if (jsonData['type'] === 'chat') {
+                    else if (jsonData['type'] === 'chat') {
                         if (jsonData['complete'] === true) {
                             // Chat message is complete
                             this.ChatMessageCompleteHandler();
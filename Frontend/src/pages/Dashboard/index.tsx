@@ -35,6 +35,7 @@ const AdminDashboard = () => {
   // Results states
   const [queryResults, setQueryResults] = useState(null);
   const [scrapeResults, setScrapeResults] = useState(null);
+  const [scrapeJob, setScrapeJob] = useState(null);
   const [notifications, setNotifications] = useState([]);
 
   const API_BASE = import.meta.env.VITE_SERVER_API_URL; // Adjust this to your API base URL
@@ -165,11 +166,25 @@ const AdminDashboard = () => {
       url: scrapeUrl, 
       limit: scrapeLimit 
     });
-    if (data?.success) {
-      setScrapeResults(data.text);
-      addNotification(`Successfully scraped ${data.text?.length || 0} chunks`, 'success');
-    } else {
+    if (!data?.success) {
       addNotification(data?.message || 'Scraping failed', 'error');
+      return;
+    }
+    addNotification('Scraping started', 'info');
+
+    // Ingestion runs in the background; poll the job until it finishes
+    let job = data;
+    while (job && (job.status === 'queued' || job.status === 'running')) {
+      await new Promise(resolve => setTimeout(resolve, 1000));
+      const response = await fetch(`${API_BASE}/jobs/${data.job_id}`);
+      job = await response.json();
+      setScrapeJob(job);
+      setScrapeResults(job.preview);
+    }
+    if (job?.status === 'completed') {
+      addNotification(`Successfully scraped ${job.chunks} chunks (${job.upserted} new)`, 'success');
+    } else {
+      addNotification(job?.error || `Scraping ${job?.status || 'failed'}`, 'error');
     }
   };
 
@@ -659,7 +674,7 @@ const AdminDashboard = () => {
               <div className="bg-white rounded-lg shadow p-6">
                 <h3 className="text-lg font-medium text-gray-900 mb-4">Scraping Results</h3>
                 <p className="text-sm text-gray-600 mb-4">
-                  Scraped {scrapeResults.length} chunks successfully
+                  {scrapeJob?.status === 'running' ? 'Scraping' : 'Scraped'} {scrapeJob?.pages ?? 0} pages, {scrapeJob?.chunks ?? 0} chunks ({scrapeJob?.upserted ?? 0} upserted, {scrapeJob?.not_modified ?? 0} pages unchanged)
                 </p>
                 <div className="space-y-3 max-h-96 overflow-y-auto">
                   {scrapeResults.slice(0, 10).map((chunk, index) => (
@@ -674,9 +689,9 @@ const AdminDashboard = () => {
                       </div>
                     </div>
                   ))}
-                  {scrapeResults.length > 10 && (
+                  {(scrapeJob?.chunks ?? 0) > scrapeResults.length && (
                     <div className="text-sm text-gray-500 text-center">
-                      ... and {scrapeResults.length - 10} more chunks
+                      ... and {scrapeJob.chunks - scrapeResults.length} more chunks
                     </div>
                   )}
                 </div>
@@ -0,0 +1,199 @@
+#########################################################################
+#                       Chunking benchmark
+#
+#   Chunks a corpus of extracted pages with the previous splitters
+#   (RecursiveCharacterTextSplitter 500/50 for scrapes, 1000/100 for
+#   bulk records) and with utils.ingestion.chunker, in process and
+#   through the ingestion worker pool, and reports:
+#   - throughput (pages/sec)
+#   - chunk sizes in embedding tokens (mean, p5/p95, spread, largest)
+#     and the tokens embedded in total, overlap and heading paths included
+#   - retrieval quality: a query is built from a sentence of a page (some
+#     of its words dropped, the rest in order); a hit is a retrieved
+#     chunk holding the whole sentence. recall@k and MRR over all queries
+#
+#   Embeddings are the hashed bag-of-words of benchmarks.fakes unless
+#   --openai is given (uses OPENAI_API_KEY, costs a few cents).
+#   Without --corpus, synthetic pages from benchmarks.extraction are used;
+#   their sentences are random words, so only a real corpus gives
+#   meaningful retrieval numbers.
+#
+#   Run from Server/:  python -m benchmarks.chunking --corpus DIR
+#########################################################################
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import statistics
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from benchmarks.extraction import load_corpus, synthetic_page
+from benchmarks.fakes import embed_text
+from config import CONFIG
+from llm.tokens import CHARS_PER_TOKEN, encoding, text_tokens
+from utils.ingestion.chunker import EMBEDDING_MODEL, Chunker
+from utils.webscrapper.extractor import extract_page
+from utils.webscrapper.webscrapper import chunk_pages
+from utils.workers import run_in_worker, shutdown_worker_pool
+
+SENTENCE = re.compile(r"[A-Z][^.!?\n]{40,200}[.!?]")
+
+
+def legacy(chunk_size: int, chunk_overlap: int) -> Callable[[str], List[str]]:
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return splitter.split_text
+
+
+def structured(tokens: int) -> Callable[[str], List[str]]:
+    chunker = Chunker(tokens, tokens // 8, tokens // 4)
+    return lambda text: [chunk["content"] for chunk in chunker.split(text)]
+
+
+async def pooled(texts: List[str]) -> List[dict]:
+    pages = [{"url": f"https://example.com/{i}", "content": text} for i, text in enumerate(texts)]
+    results = await asyncio.gather(*(run_in_worker(chunk_pages, [page]) for page in pages))
+    return [chunk for chunks in results for chunk in chunks]
+
+
+def timed(label: str, count: int, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<24} {count / elapsed:8.1f} pages/s  {elapsed * 1000 / count:6.2f} ms/page")
+    return result
+
+
+def percentile(values: List[int], share: float) -> int:
+    ordered = sorted(values)
+    return ordered[min(int(share * len(ordered)), len(ordered) - 1)]
+
+
+################################################
+##              RETRIEVAL
+################################################
+
+def normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w]+", " ", text.lower()).split())
+
+
+def make_queries(texts: List[str], count: int, rng: random.Random) -> List[dict]:
+    """Sentences of the pages, each with a query of about 60% of its words."""
+    candidates = [(page, sentence) for page, text in enumerate(texts) for sentence in SENTENCE.findall(text)]
+    queries = []
+    for page, sentence in rng.sample(candidates, min(count, len(candidates))):
+        words = sentence.split()
+        kept = sorted(rng.sample(range(len(words)), max(3, int(len(words) * 0.6))))
+        queries.append({"page": page, "answer": normalize(sentence), "query": " ".join(words[i] for i in kept)})
+    return queries
+
+
+def embedder(use_openai: bool) -> Callable[[List[str]], np.ndarray]:
+    if not use_openai:
+        return lambda texts: np.stack([embed_text(text) for text in texts])
+    from langchain_openai import OpenAIEmbeddings
+
+    model = OpenAIEmbeddings(openai_api_key=CONFIG.OPENAI_API_KEY, openai_api_base=CONFIG.OPENAI_BASE_URL)
+
+    def embed(texts: List[str]) -> np.ndarray:
+        vectors = np.array(model.embed_documents(texts), dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return embed
+
+
+def evaluate(chunks: List[str], queries: List[dict], embed, k: int) -> Dict[str, float]:
+    vectors = embed(chunks)
+    normalized = [normalize(chunk) for chunk in chunks]
+    scores = embed([query["query"] for query in queries]) @ vectors.T
+    sizes = [text_tokens(chunk, EMBEDDING_MODEL) for chunk in chunks]
+    hits, reciprocal, answerable, context = 0, 0.0, 0, 0
+    for query, row in zip(queries, scores):
+        answerable += any(query["answer"] in chunk for chunk in normalized)
+        top = np.argsort(-row)[:k]
+        context += sum(sizes[index] for index in top)
+        for rank, index in enumerate(top, start=1):
+            if query["answer"] in normalized[index]:
+                hits += 1
+                reciprocal += 1.0 / rank
+                break
+    return {
+        "recall": hits / len(queries),
+        "mrr": reciprocal / len(queries),
+        "answerable": answerable / len(queries),  # sentences some chunk holds whole
+        "context": context / len(queries),  # prompt tokens the k chunks take
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="directory of saved .html pages (default: synthetic pages)")
+    parser.add_argument("--pages", type=int, default=200, help="synthetic pages to generate")
+    parser.add_argument("--workers", type=int, nargs="*", default=None, help="pool sizes to measure")
+    parser.add_argument("--chunk-tokens", type=int, nargs="*", default=None, help="structured chunk sizes to compare")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--openai", action="store_true", help="embed with OpenAI instead of the hashed stand-in")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    if args.corpus:
+        html = load_corpus(args.corpus)
+        source = args.corpus
+    else:
+        html = [synthetic_page(number, rng) for number in range(args.pages)]
+        source = "synthetic"
+    texts = [text for text in (extract_page("https://example.com/", page)[0] for page in html) if text.strip()]
+    if not texts:
+        raise SystemExit(f"no pages with text in {args.corpus}")
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, max(1, cpus // 2), cpus})
+    tokenizer = "tiktoken" if encoding(EMBEDDING_MODEL) is not None else f"estimated ({CHARS_PER_TOKEN} chars/token)"
+    print(
+        f"corpus: {len(texts)} pages ({sum(map(len, texts)) / 1e6:.1f} M chars, {source}), {cpus} CPUs, "
+        f"tokens: {tokenizer}, target {CONFIG.CHUNK_TOKENS} tokens\n"
+    )
+
+    # 500 and 1000 characters are about 128 and 256 tokens of English text
+    splitters = {"chars 500/50": legacy(500, 50), "chars 1000/100": legacy(1000, 100)}
+    for tokens in args.chunk_tokens or sorted({128, CONFIG.CHUNK_TOKENS}):
+        splitters[f"structured {tokens}"] = structured(tokens)
+    print("throughput:")
+    chunked = {}
+    for name, split in splitters.items():
+        chunked[name] = timed(name, len(texts), lambda: [chunk for text in texts for chunk in split(text)])
+    for count in workers:
+        os.environ["INGEST_PROCESSES"] = str(count)
+        asyncio.run(pooled(texts[:count]))  # start the workers outside the measurement
+        timed(f"structured {CONFIG.CHUNK_TOKENS} pool ({count})", len(texts), lambda: asyncio.run(pooled(texts)))
+        shutdown_worker_pool()
+
+    print("\nchunk sizes (tokens):")
+    print(f"  {'':<24} {'chunks':>7} {'mean':>6} {'p5':>5} {'p95':>5} {'std':>6} {'max':>5} {'embedded':>9}")
+    for name, chunks in chunked.items():
+        sizes = [text_tokens(chunk, EMBEDDING_MODEL) for chunk in chunks]
+        print(
+            f"  {name:<24} {len(sizes):>7} {statistics.mean(sizes):>6.0f} {percentile(sizes, 0.05):>5} "
+            f"{percentile(sizes, 0.95):>5} {statistics.pstdev(sizes):>6.0f} {max(sizes):>5} {sum(sizes):>9}"
+        )
+
+    queries = make_queries(texts, args.queries, rng)
+    embed = embedder(args.openai)
+    print(f"\nretrieval ({len(queries)} queries, top {args.k}, {'OpenAI' if args.openai else 'hashed bag-of-words'} embeddings):")
+    print(f"  {'':<24} {'recall':>7} {'MRR':>6} {'whole':>6} {'context':>8}")
+    for name, chunks in chunked.items():
+        result = evaluate(chunks, queries, embed, args.k)
+        print(
+            f"  {name:<24} {result['recall']:>7.1%} {result['mrr']:>6.3f} {result['answerable']:>6.0%} "
+            f"{result['context']:>8.0f}"
+        )
+    print("  (whole: sentences some chunk holds uncut; context: tokens of the k retrieved chunks per query)")
+
+
+if __name__ == "__main__":
+    main()
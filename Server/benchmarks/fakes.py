@@ -0,0 +1,481 @@
+#########################################################################
+#                   Local stand-ins for upstream services
+#
+#   Small HTTP servers that speak just enough of each upstream API for
+#   the chatbot to run offline:
+#   - OpenAI:     streamed chat completions at a set token rate, and
+#                 deterministic (hashed bag-of-words) embeddings
+#   - Pinecone:   control plane (index catalog) and data plane (brute
+#                 force cosine query, upsert, delete) with set latency
+#   - ElevenLabs: PCM 16 kHz streamed at real-time speed
+#   - Website:    linked HTML pages for the crawler
+#
+#   Used by benchmarks.load; also runnable on their own:
+#       python -m benchmarks.fakes --port 9000
+#   serves them at /openai/v1, /pinecone, /elevenlabs and /site.
+#########################################################################
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import random
+import re
+import socket
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
+
+EMBEDDING_DIMENSION = 1536
+PCM_BYTES_PER_SECOND = 16000 * 2  # pcm_16000: 16 kHz, 16-bit mono
+
+WORDS = (
+    "account billing plan upgrade storage support dashboard password reset login email invoice refund "
+    "shipping order delivery warranty return device battery router firmware update install configure "
+    "network wireless signal setting screen display speaker microphone pairing bluetooth app mobile "
+    "desktop browser security privacy data export import backup restore sync folder share team admin"
+).split()
+
+
+@dataclass
+class FakeSettings:
+    tokens_per_second: float = 50.0      # OpenAI streaming rate
+    ttft: float = 0.3                    # OpenAI time to first token
+    prefill_per_1k_tokens: float = 0.02  # extra TTFT per 1k prompt tokens
+    answer_tokens: int = 60
+    embedding_latency: float = 0.05
+    pinecone_latency: float = 0.03
+    tts_ttfb: float = 0.2
+    tts_chars_per_second: float = 15.0   # speaking rate of the fake voice
+    tts_realtime: float = 1.0            # 1.0 streams audio as fast as it plays
+    site_pages: int = 50
+    site_latency: float = 0.01
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def embed_text(text: str, dimension: int = EMBEDDING_DIMENSION) -> np.ndarray:
+    """Hashed bag-of-words vector: texts sharing words are close, like a real embedding."""
+    vector = np.zeros(dimension, dtype=np.float32)
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        h = zlib.crc32(word.encode("utf-8"))
+        vector[h % dimension] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[zlib.crc32(text.encode("utf-8")) % dimension] = 1.0
+        return vector
+    return vector / norm
+
+
+def answer_tokens(seed: str, count: int) -> List[str]:
+    """A deterministic answer: `count` word tokens in sentences of 8-16 words."""
+    rng = random.Random(seed)
+    tokens, sentence = [], 0
+    for i in range(count):
+        word = rng.choice(WORDS)
+        if sentence == 0:
+            word = word.capitalize()
+        sentence += 1
+        end = sentence >= rng.randint(8, 16) or i == count - 1
+        tokens.append((" " if i else "") + word + ("." if end else ("," if sentence % 6 == 0 else "")))
+        if end:
+            sentence = 0
+    return tokens
+
+
+################################################
+##              OPENAI
+################################################
+
+def openai_app(settings: FakeSettings) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "gpt-4o", "object": "model", "owned_by": "fake"}]}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"]
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        # token-id inputs (pre-tokenized by the client) are hashed as words
+        texts = [text if isinstance(text, str) else " ".join(f"t{token}" for token in text) for text in inputs]
+        await asyncio.sleep(settings.embedding_latency)
+        vectors = [embed_text(text, body.get("dimensions") or EMBEDDING_DIMENSION) for text in texts]
+        base64_output = body.get("encoding_format") == "base64"
+        data = [
+            {
+                "object": "embedding",
+                "index": i,
+                "embedding": base64.b64encode(vector.astype("<f4").tobytes()).decode() if base64_output else vector.tolist(),
+            }
+            for i, vector in enumerate(vectors)
+        ]
+        tokens = sum(len(text) // 4 + 1 for text in texts)
+        return {"object": "list", "data": data, "model": body.get("model", "fake"), "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        prompt = " ".join(str(message.get("content", "")) for message in messages)
+        prompt_tokens = len(prompt) // 4 + 1
+        question = str(messages[-1].get("content", "")) if messages else ""
+        count = min(settings.answer_tokens, body.get("max_tokens") or body.get("max_completion_tokens") or settings.answer_tokens)
+        tokens = answer_tokens(question, count)
+        ttft = settings.ttft + settings.prefill_per_1k_tokens * prompt_tokens / 1000
+        model = body.get("model", "gpt-4o")
+        created = int(time.time())
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + len(tokens) / settings.tokens_per_second)
+            return {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)},
+            }
+
+        def event(delta: dict, finish: Optional[str] = None) -> str:
+            chunk = {
+                "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            return f"data: {json.dumps(chunk)}\n\n"
+
+        async def stream():
+            await asyncio.sleep(ttft)
+            yield event({"role": "assistant", "content": ""})
+            start = time.perf_counter()
+            for i, token in enumerate(tokens):
+                # paced against the start, so the rate holds under event loop jitter
+                delay = start + i / settings.tokens_per_second - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                yield event({"content": token})
+            yield event({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+################################################
+##              PINECONE
+################################################
+
+class _FakeIndex:
+    def __init__(self, name: str, dimension: int, metric: str):
+        self.name = name
+        self.dimension = dimension
+        self.metric = metric
+        # namespace -> id -> (vector, metadata)
+        self.namespaces: Dict[str, Dict[str, Tuple[np.ndarray, dict]]] = {}
+        self.lock = threading.Lock()
+
+    def query(self, vector: List[float], top_k: int, namespace: str, values: bool, metadata: bool) -> List[dict]:
+        with self.lock:
+            items = list(self.namespaces.get(namespace, {}).items())
+        if not items:
+            return []
+        matrix = np.stack([item[1][0] for item in items])
+        query = np.asarray(vector, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = matrix @ query / np.where(norms == 0, 1.0, norms)
+        top = np.argsort(-scores)[:top_k]
+        matches = []
+        for i in top:
+            doc_id, (stored, meta) = items[i]
+            match = {"id": doc_id, "score": float(scores[i])}
+            if values:
+                match["values"] = stored.tolist()
+            if metadata:
+                match["metadata"] = meta
+            matches.append(match)
+        return matches
+
+
+def pinecone_app(settings: FakeSettings, base_url: str) -> FastAPI:
+    """Control plane at /indexes; each index's data plane at /data/<name>."""
+    app = FastAPI()
+    indexes: Dict[str, _FakeIndex] = {}
+
+    def model(index: _FakeIndex) -> dict:
+        return {
+            "name": index.name,
+            "dimension": index.dimension,
+            "metric": index.metric,
+            "host": f"{base_url}/data/{index.name}",
+            "spec": {"serverless": {"cloud": "aws", "region": "us-east-1"}},
+            "status": {"ready": True, "state": "Ready"},
+            "deletion_protection": "disabled",
+            "vector_type": "dense",
+        }
+
+    def get(name: str) -> _FakeIndex:
+        if name not in indexes:
+            raise HTTPException(404, {"error": {"code": "NOT_FOUND", "message": f"Index {name} not found"}})
+        return indexes[name]
+
+    @app.get("/indexes")
+    async def list_indexes():
+        return {"indexes": [model(index) for index in indexes.values()]}
+
+    @app.post("/indexes", status_code=201)
+    async def create_index(request: Request):
+        body = await request.json()
+        index = indexes.setdefault(body["name"], _FakeIndex(body["name"], body.get("dimension", EMBEDDING_DIMENSION), body.get("metric", "cosine")))
+        return model(index)
+
+    @app.get("/indexes/{name}")
+    async def describe_index(name: str):
+        return model(get(name))
+
+    @app.delete("/indexes/{name}", status_code=202)
+    async def delete_index(name: str):
+        get(name)
+        del indexes[name]
+        return PlainTextResponse("")
+
+    @app.post("/data/{name}/query")
+    async def query(name: str, request: Request):
+        body = await request.json()
+        index = get(name)
+        await asyncio.sleep(settings.pinecone_latency)
+        namespace = body.get("namespace", "")
+        matches = await asyncio.to_thread(
+            index.query, body["vector"], body.get("topK", 10), namespace,
+            body.get("includeValues", False), body.get("includeMetadata", False),
+        )
+        return {"matches": matches, "namespace": namespace, "usage": {"readUnits": 1}}
+
+    @app.post("/data/{name}/vectors/upsert")
+    async def upsert(name: str, request: Request):
+        body = await request.json()
+        index = get(name)
+        await asyncio.sleep(settings.pinecone_latency)
+        with index.lock:
+            namespace = index.namespaces.setdefault(body.get("namespace", ""), {})
+            for vector in body["vectors"]:
+                namespace[vector["id"]] = (np.asarray(vector["values"], dtype=np.float32), vector.get("metadata") or {})
+        return {"upsertedCount": len(body["vectors"])}
+
+    @app.post("/data/{name}/vectors/delete")
+    async def delete(name: str, request: Request):
+        body = await request.json()
+        index = get(name)
+        await asyncio.sleep(settings.pinecone_latency)
+        with index.lock:
+            namespace = index.namespaces.setdefault(body.get("namespace", ""), {})
+            if body.get("deleteAll"):
+                namespace.clear()
+            for doc_id in body.get("ids") or []:
+                namespace.pop(doc_id, None)
+        return {}
+
+    @app.api_route("/data/{name}/describe_index_stats", methods=["GET", "POST"])
+    async def describe_index_stats(name: str):
+        index = get(name)
+        with index.lock:
+            counts = {ns: {"vectorCount": len(vectors)} for ns, vectors in index.namespaces.items()}
+        return {
+            "namespaces": counts,
+            "dimension": index.dimension,
+            "indexFullness": 0.0,
+            "totalVectorCount": sum(count["vectorCount"] for count in counts.values()),
+        }
+
+    return app
+
+
+################################################
+##              ELEVENLABS
+################################################
+
+def elevenlabs_app(settings: FakeSettings) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/v1/models")
+    async def models():
+        return [{"model_id": "eleven_flash_v2_5", "name": "fake"}]
+
+    @app.post("/v1/text-to-speech/{voice_id}/stream")
+    async def stream(voice_id: str, request: Request):
+        body = await request.json()
+        seconds = max(len(body.get("text", "")) / settings.tts_chars_per_second, 0.1)
+        total = int(seconds * PCM_BYTES_PER_SECOND) & ~1
+        chunk = PCM_BYTES_PER_SECOND // 10  # 100 ms of audio
+
+        async def audio():
+            await asyncio.sleep(settings.tts_ttfb)
+            start = time.perf_counter()
+            sent = 0
+            while sent < total:
+                size = min(chunk, total - sent)
+                # 16-bit samples of a quiet 440 Hz tone
+                samples = (np.sin(np.arange(sent // 2, (sent + size) // 2) * 2 * math.pi * 440 / 16000) * 1000).astype("<i2")
+                yield samples.tobytes()
+                sent += size
+                if settings.tts_realtime > 0:
+                    delay = start + sent / PCM_BYTES_PER_SECOND / settings.tts_realtime - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+        return StreamingResponse(audio(), media_type="audio/pcm")
+
+    return app
+
+
+################################################
+##              WEBSITE
+################################################
+
+def website_app(settings: FakeSettings) -> FastAPI:
+    """`site_pages` pages, each linking to a few others, with a nav bar and footer like real sites."""
+    app = FastAPI()
+
+    def page(n: int) -> str:
+        rng = random.Random(n)
+        links = sorted({rng.randrange(settings.site_pages) for _ in range(4)} | {(n + 1) % settings.site_pages})
+        paragraphs = []
+        for _ in range(rng.randint(4, 8)):
+            paragraphs.append("<p>" + "".join(answer_tokens(f"{n}-{len(paragraphs)}", rng.randint(40, 90))) + "</p>")
+        sku = f"<p>Model SKU-{n:05d} ships with firmware v{n % 7}.{n % 5}.{n % 3}.</p>"
+        items = "".join(f"<li><a href='/site/page/{link}'>Article {link}</a></li>" for link in links)
+        return (
+            f"<html><head><title>Help article {n}</title></head><body>"
+            f"<nav><a href='/site/'>Home</a> <a href='/site/page/0'>Getting started</a> Support Pricing Contact</nav>"
+            f"<main><h1>Help article {n}</h1>{''.join(paragraphs)}{sku}"
+            f"<ul>{items}</ul></main>"
+            f"<footer>© Example Inc. All rights reserved. Privacy Terms Cookies</footer></body></html>"
+        )
+
+    @app.get("/robots.txt")
+    async def robots():
+        return PlainTextResponse("User-agent: *\nAllow: /\n")
+
+    @app.get("/")
+    async def home():
+        await asyncio.sleep(settings.site_latency)
+        links = "".join(f"<li><a href='/site/page/{n}'>Article {n}</a></li>" for n in range(settings.site_pages))
+        return HTMLResponse(f"<html><head><title>Help center</title></head><body><h1>Help center</h1><ul>{links}</ul></body></html>")
+
+    @app.get("/page/{n}")
+    async def article(n: int):
+        if not 0 <= n < settings.site_pages:
+            raise HTTPException(404)
+        await asyncio.sleep(settings.site_latency)
+        return HTMLResponse(page(n))
+
+    return app
+
+
+################################################
+##              SERVING
+################################################
+
+class FakeServices:
+    """Every stand-in on one local port, each under its own path prefix."""
+
+    def __init__(self, settings: FakeSettings = None, port: int = None):
+        self.settings = settings or FakeSettings()
+        self.port = port or free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.app = FastAPI()
+        self.app.mount("/openai", openai_app(self.settings))
+        self.app.mount("/pinecone", pinecone_app(self.settings, f"{self.base_url}/pinecone"))
+        self.app.mount("/elevenlabs", elevenlabs_app(self.settings))
+        self.app.mount("/site", website_app(self.settings))
+        # upstream calls by kind, e.g. to check that coalescing saves generations
+        self.calls: Dict[str, int] = {}
+        self.app.middleware("http")(self._count)
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    CALL_KINDS = (
+        ("/openai/v1/chat/completions", "openai_chat"),
+        ("/openai/v1/embeddings", "openai_embeddings"),
+        ("/pinecone/data/", "pinecone_data"),
+        ("/elevenlabs/v1/text-to-speech/", "elevenlabs_tts"),
+        ("/site/", "website"),
+    )
+
+    async def _count(self, request: Request, call_next):
+        for prefix, kind in self.CALL_KINDS:
+            if request.url.path.startswith(prefix):
+                self.calls[kind] = self.calls.get(kind, 0) + 1
+                break
+        return await call_next(request)
+
+    @property
+    def env(self) -> Dict[str, str]:
+        """Environment that points the chatbot at these services."""
+        return {
+            "OPENAI_BASE_URL": f"{self.base_url}/openai/v1",
+            "ELEVEN_BASE_URL": f"{self.base_url}/elevenlabs",
+            "PINECONE_HOST": f"{self.base_url}/pinecone",
+            "OPENAI_API_KEY": "fake",
+            "PINECONE_API_KEY": "fake",
+            "ELEVEN_API_KEY": "fake",
+            "VECTOR_BACKEND": "pinecone",
+        }
+
+    @property
+    def site_url(self) -> str:
+        return f"{self.base_url}/site/"
+
+    def start(self) -> "FakeServices":
+        """Serve from a background thread (own event loop) until stop()."""
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning", backlog=4096)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("fake services did not start")
+            time.sleep(0.02)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--tokens-per-second", type=float, default=FakeSettings.tokens_per_second)
+    parser.add_argument("--ttft", type=float, default=FakeSettings.ttft)
+    parser.add_argument("--pinecone-latency", type=float, default=FakeSettings.pinecone_latency)
+    parser.add_argument("--tts-ttfb", type=float, default=FakeSettings.tts_ttfb)
+    args = parser.parse_args()
+
+    settings = FakeSettings(
+        tokens_per_second=args.tokens_per_second, ttft=args.ttft,
+        pinecone_latency=args.pinecone_latency, tts_ttfb=args.tts_ttfb,
+    )
+    services = FakeServices(settings, args.port)
+    print("Point the server at the fakes with:")
+    for key, value in services.env.items():
+        print(f"  export {key}={value}")
+    print(f"Website to scrape: {services.site_url}")
+    uvicorn.run(services.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+#########################################################################
+#                   End-to-end WebSocket load benchmark
+#
+#   Starts the local stand-ins (benchmarks.fakes), runs the server in a
+#   subprocess against them, ingests the fake website through the admin
+#   scrape endpoint and then drives N concurrent sessions over
+#   /api/user/ws. Reports per mode (chat / voice):
+#   - time to first text, time to first audio (voice), turn time,
+#     as p50 / p95 / p99
+#   - turns/s, text chars/s and audio seconds per wall second
+#   - ingestion throughput and server-side stage latencies (/metrics)
+#
+#   Offline and deterministic enough for CI trend tracking; --json
+#   writes a flat {metric: value} file to compare between runs.
+#
+#   Run from Server/:  python -m benchmarks.load --sessions 20 --mode mixed
+#   Against a server already pointed at the fakes:  --server http://host:port
+#########################################################################
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+import websockets
+
+from benchmarks.fakes import PCM_BYTES_PER_SECOND, WORDS, FakeServices, FakeSettings, free_port
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def questions(count: int, pages: int, seed: int = 0) -> List[str]:
+    """Support-style questions; every fourth names a SKU (the lexical fast path)."""
+    rng = random.Random(seed)
+    asked = []
+    for i in range(count):
+        if i % 4 == 3:
+            asked.append(f"Which firmware does SKU-{rng.randrange(pages):05d} ship with?")
+        else:
+            asked.append(f"How do I {rng.choice(WORDS)} the {rng.choice(WORDS)} on my {rng.choice(WORDS)}?")
+    return asked
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+################################################
+##              SERVER UNDER TEST
+################################################
+
+def start_server(services: FakeServices, workdir: str, port: int, extra_env: Dict[str, str]) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        **services.env,
+        "LOCAL_INDEX_DIR": os.path.join(workdir, "local_index"),
+        "LEXICAL_INDEX_DIR": os.path.join(workdir, "lexical"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite"),
+        "INGEST_MANIFEST_PATH": os.path.join(workdir, "manifest.sqlite"),
+        "TTS_CACHE_DIR": os.path.join(workdir, "tts"),
+        # every turn does the full work unless a cache is asked for
+        "TTS_CACHE_ENABLED": "false",
+        "RESPONSE_CACHE_ENABLED": "false",
+        # hashed bag-of-words embeddings score lower than OpenAI's
+        "CONTEXT_MIN_SCORE": "0",
+        "CRAWL_RESPECT_ROBOTS": "false",
+        **extra_env,
+    }
+    log = open(os.path.join(workdir, "server.log"), "wb")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=SERVER_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/docs")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+
+async def ingest(base_url: str, site_url: str, pages: int) -> dict:
+    """Scrape the fake website through the admin API and wait for the job."""
+    async with httpx.AsyncClient(timeout=30) as client:
+        response = (await client.post(f"{base_url}/api/admin/scrape/website", json={"url": site_url, "limit": pages, "depth": 3})).json()
+        if not response.get("success"):
+            raise RuntimeError(f"scrape failed: {response}")
+        while True:
+            job = (await client.get(f"{base_url}/api/admin/jobs/{response['job_id']}")).json()
+            if job["status"] not in ("queued", "running"):
+                return job
+            await asyncio.sleep(0.2)
+
+
+async def server_stages(base_url: str) -> Dict[str, float]:
+    """Mean server-side latency per stage, from chatbot_stage_seconds on /metrics."""
+    async with httpx.AsyncClient() as client:
+        text = (await client.get(f"{base_url}/metrics")).text
+    sums = dict(re.findall(r'chatbot_stage_seconds_sum\{stage="([^"]+)"\} (\S+)', text))
+    counts = dict(re.findall(r'chatbot_stage_seconds_count\{stage="([^"]+)"\} (\S+)', text))
+    return {stage: float(sums[stage]) / float(counts[stage]) for stage in sums if float(counts.get(stage, 0))}
+
+
+################################################
+##              LOAD GENERATOR
+################################################
+
+class Results:
+    def __init__(self):
+        self.first_text: Dict[str, List[float]] = {"chat": [], "voice": []}
+        self.first_audio: List[float] = []
+        self.turn: Dict[str, List[float]] = {"chat": [], "voice": []}
+        self.chars: Dict[str, int] = {"chat": 0, "voice": 0}
+        self.audio_bytes = 0
+        self.errors: Dict[str, int] = {"chat": 0, "voice": 0}
+
+
+async def session(ws_url: str, number: int, mode: str, asked: List[str], results: Results, think: float):
+    async with websockets.connect(f"{ws_url}?session_id=bench-{number}", max_size=None) as ws:
+        for question in asked:
+            kind = mode if mode != "mixed" else ("voice" if number % 2 else "chat")
+            start = time.perf_counter()
+            first_text = first_audio = None
+            await ws.send(json.dumps({"type": kind, "question": question}))
+            try:
+                while True:
+                    message = await asyncio.wait_for(ws.recv(), timeout=120)
+                    now = time.perf_counter() - start
+                    if isinstance(message, bytes):
+                        results.audio_bytes += len(message)
+                        first_audio = first_audio if first_audio is not None else now
+                        continue
+                    data = json.loads(message)
+                    if data.get("error"):
+                        raise RuntimeError(data["error"])
+                    if data.get("type") != kind:
+                        continue
+                    if data.get("data"):
+                        results.chars[kind] += len(data["data"])
+                        first_text = first_text if first_text is not None else now
+                    if data.get("complete"):
+                        break
+            except Exception as e:
+                print(f"session {number}: {kind} turn failed: {e!r}")
+                results.errors[kind] += 1
+                continue
+            results.turn[kind].append(now)
+            if first_text is not None:
+                results.first_text[kind].append(first_text)
+            if first_audio is not None:
+                results.first_audio.append(first_audio)
+            if think:
+                await asyncio.sleep(think)
+
+
+async def run_load(base_url: str, sessions: int, turns: int, mode: str, pages: int, think: float, same_questions: bool = False) -> dict:
+    ws_url = base_url.replace("http", "ws", 1) + "/api/user/ws"
+    results = Results()
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        session(ws_url, i, mode, questions(turns, pages, seed=0 if same_questions else i), results, think)
+        for i in range(sessions)
+    ))
+    wall = time.perf_counter() - start
+
+    report = {"wall_s": wall}
+    for kind in ("chat", "voice"):
+        if not results.turn[kind] and not results.errors[kind]:
+            continue
+        report[f"{kind}_turns"] = len(results.turn[kind])
+        report[f"{kind}_errors"] = results.errors[kind]
+        report[f"{kind}_turns_per_s"] = len(results.turn[kind]) / wall
+        report[f"{kind}_chars_per_s"] = results.chars[kind] / wall
+        for name, values in ((f"{kind}_first_text_s", results.first_text[kind]), (f"{kind}_turn_s", results.turn[kind])):
+            for p, value in percentiles(values).items():
+                report[f"{name}_{p}"] = value
+    if results.first_audio:
+        for p, value in percentiles(results.first_audio).items():
+            report[f"voice_first_audio_s_{p}"] = value
+        report["voice_audio_s_per_s"] = results.audio_bytes / PCM_BYTES_PER_SECOND / wall
+    return report
+
+
+def print_report(report: dict, ingestion: Optional[dict], stages: Dict[str, float]):
+    if ingestion:
+        print(
+            f"\ningestion: {ingestion['status']} pages={ingestion['pages']} chunks={ingestion['chunks']} "
+            f"duplicates={ingestion.get('duplicates', 0)} upserted={ingestion['upserted']} in {ingestion['elapsed']:.2f}s ({ingestion['upserted_per_sec']:.0f} chunks/s)"
+        )
+    print(f"\nload: {report['wall_s']:.2f}s wall")
+    for kind in ("chat", "voice"):
+        if f"{kind}_turns" not in report:
+            continue
+        print(
+            f"  {kind:<5} turns={report[f'{kind}_turns']} errors={report[f'{kind}_errors']} "
+            f"turns/s={report[f'{kind}_turns_per_s']:.2f} chars/s={report[f'{kind}_chars_per_s']:.0f}"
+        )
+        rows = [("first text", f"{kind}_first_text_s"), ("turn", f"{kind}_turn_s")]
+        if kind == "voice" and "voice_first_audio_s_p50" in report:
+            rows.insert(1, ("first audio", "voice_first_audio_s"))
+        for label, key in rows:
+            values = [report.get(f"{key}_{p}") for p in ("p50", "p95", "p99")]
+            if values[0] is None:
+                continue
+            print(f"    {label:<12} p50={values[0] * 1000:7.0f}ms  p95={values[1] * 1000:7.0f}ms  p99={values[2] * 1000:7.0f}ms")
+        if kind == "voice" and "voice_audio_s_per_s" in report:
+            print(f"    audio        {report['voice_audio_s_per_s']:.1f}s of speech per wall second")
+    calls = {key[len("upstream_"):-len("_calls")]: value for key, value in report.items() if key.startswith("upstream_")}
+    if calls:
+        print("  upstream calls: " + " ".join(f"{kind}={count}" for kind, count in sorted(calls.items())))
+    if stages:
+        print("\nserver stages (mean):")
+        for name, mean in sorted(stages.items(), key=lambda item: -item[1]):
+            print(f"  {name:<22} {mean * 1000:8.1f}ms")
+
+
+async def main_async(args):
+    settings = FakeSettings(
+        tokens_per_second=args.tokens_per_second, ttft=args.ttft,
+        pinecone_latency=args.pinecone_latency, embedding_latency=args.embedding_latency,
+        tts_ttfb=args.tts_ttfb, tts_realtime=args.tts_realtime, site_pages=args.pages,
+    )
+    services = FakeServices(settings).start()
+    workdir = tempfile.mkdtemp(prefix="chatbot-bench-")
+    server = None
+    try:
+        base_url = args.server
+        if base_url is None:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            extra_env = dict(item.split("=", 1) for item in args.env)
+            server = start_server(services, workdir, port, extra_env)
+        await wait_ready(base_url)
+
+        ingestion = None
+        if args.pages:
+            ingestion = await ingest(base_url, services.site_url, args.pages)
+
+        calls_before = dict(services.calls)
+        report = await run_load(base_url, args.sessions, args.turns, args.mode, args.pages, args.think, args.same_questions)
+        for kind, count in services.calls.items():
+            report[f"upstream_{kind}_calls"] = count - calls_before.get(kind, 0)
+        stages = await server_stages(base_url)
+        print_report(report, ingestion, stages)
+
+        if args.json:
+            flat = {**report, **{f"stage_{name}_mean_s": mean for name, mean in stages.items()}}
+            if ingestion:
+                flat["ingest_chunks_per_s"] = ingestion["upserted_per_sec"]
+            with open(args.json, "w") as f:
+                json.dump({"settings": vars(args), "metrics": flat}, f, indent=2, default=str)
+            print(f"\nwrote {args.json}")
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+            if args.keep_logs:
+                print(f"server log: {os.path.join(workdir, 'server.log')}")
+        services.stop()
+        if not args.keep_logs:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent WebSocket sessions")
+    parser.add_argument("--turns", type=int, default=3, help="questions per session")
+    parser.add_argument("--mode", choices=("chat", "voice", "mixed"), default="mixed")
+    parser.add_argument("--same-questions", action="store_true", help="every session asks the same questions (a burst)")
+    parser.add_argument("--think", type=float, default=0.0, help="pause between a session's turns (s)")
+    parser.add_argument("--pages", type=int, default=30, help="fake website pages to ingest first (0 skips)")
+    parser.add_argument("--tokens-per-second", type=float, default=FakeSettings.tokens_per_second)
+    parser.add_argument("--ttft", type=float, default=FakeSettings.ttft)
+    parser.add_argument("--embedding-latency", type=float, default=FakeSettings.embedding_latency)
+    parser.add_argument("--pinecone-latency", type=float, default=FakeSettings.pinecone_latency)
+    parser.add_argument("--tts-ttfb", type=float, default=FakeSettings.tts_ttfb)
+    parser.add_argument("--tts-realtime", type=float, default=FakeSettings.tts_realtime, help="audio speed vs playback (0: unpaced)")
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE for the server (repeatable)")
+    parser.add_argument("--server", help="benchmark a running server instead of starting one")
+    parser.add_argument("--json", help="write the metrics here for trend tracking")
+    parser.add_argument("--keep-logs", action="store_true")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#########################################################################
+#                       Re-ranking benchmark
+#
+#   Builds scraped-style chunks (500 chars, 50 overlap) of a few pages with
+#   embeddings where neighbouring chunks are similar, then compares the
+#   plain top-k against MMR over the over-fetched candidates followed by
+#   adjacent-chunk merging. Reports context size, the share of context
+#   that repeats other context, sources covered and the stage's CPU time.
+#
+#   Run from Server/:  python -m benchmarks.rerank
+#########################################################################
+
+import argparse
+import random
+import time
+import zlib
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+from pc.rerank import merge_adjacent, mmr
+
+WORDS = (
+    "account billing plan storage upgrade support dashboard invoice refund device firmware router "
+    "network password reset email team admin export import report schedule backup restore sync "
+    "camera battery charger cable warranty repair shipping order return label courier tracking "
+    "course lesson quiz certificate mentor enrol grade module video transcript forum deadline"
+).split()
+
+
+def make_pages(pages: int, sentences: int, rng: random.Random):
+    """Pages share a few common words but each has its own topic vocabulary."""
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    docs = []
+    for page in range(pages):
+        vocabulary = rng.sample(WORDS, 14)
+        text = " ".join(
+            " ".join(rng.choice(vocabulary) for _ in range(rng.randint(8, 16))).capitalize() + "."
+            for _ in range(sentences)
+        )
+        chunks = splitter.split_text(text)
+        for index, chunk in enumerate(chunks):
+            docs.append(Document(
+                id=f"{page}-{index}", page_content=chunk,
+                metadata={"source_url": f"https://example.com/page{page}", "chunk_index": index},
+            ))
+    return docs
+
+
+def embed(texts, dim: int, rng: np.random.Generator):
+    """Stand-in embedding: hashed word-pair counts plus noise, so chunks sharing text are close."""
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = text.lower().replace(".", "").split()
+        for pair in zip(words, words[1:]):
+            vectors[row, zlib.crc32(" ".join(pair).encode()) % dim] += 1.0
+    vectors += 0.05 * rng.normal(size=vectors.shape).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def redundancy(docs):
+    """Share of 5-word shingles in the context that already appeared earlier in it."""
+    seen, repeated, total = set(), 0, 0
+    for doc in docs:
+        words = doc.page_content.split()
+        for i in range(len(words) - 4):
+            shingle = tuple(words[i:i + 5])
+            total += 1
+            repeated += shingle in seen
+            seen.add(shingle)
+    return repeated / max(total, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--lambda-mult", type=float, default=0.7)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    np_rng = np.random.default_rng(7)
+    docs = make_pages(6, 40, rng)
+    vectors = embed([doc.page_content for doc in docs], args.dim, np_rng)
+
+    stats = {"top-k": [], "mmr+merge": []}
+    stage_us = []
+    for _ in range(args.queries):
+        # a question worded like one sentence of some chunk
+        sentence = rng.choice(docs[rng.randrange(len(docs))].page_content.split(". "))
+        query = embed([sentence], args.dim, np_rng)[0]
+        order = np.argsort(-(vectors @ query))[: args.candidates]
+        candidates = [docs[i] for i in order]
+
+        plain = candidates[: args.k]
+        start = time.perf_counter()
+        picked = mmr(query, vectors[order], args.k, args.lambda_mult)
+        reranked = merge_adjacent([candidates[i] for i in picked])
+        stage_us.append((time.perf_counter() - start) * 1e6)
+
+        for label, context in (("top-k", plain), ("mmr+merge", reranked)):
+            stats[label].append((
+                sum(len(doc.page_content) for doc in context),
+                redundancy(context),
+                len({doc.metadata["source_url"] for doc in context}),
+            ))
+
+    for label, rows in stats.items():
+        chars, repeated, sources = (np.mean(column) for column in zip(*rows))
+        print(f"{label:<10}: context={chars:.0f} chars  repeated={repeated:.1%}  sources={sources:.2f}")
+    stage_us.sort()
+    print(f"stage cost ({args.candidates} candidates x {args.dim} dims): "
+          f"p50={stage_us[len(stage_us) // 2]:.0f}us p99={stage_us[int(len(stage_us) * 0.99)]:.0f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#########################################################################
+#                   Retrieval concurrency benchmark
+#
+#   Simulates N parallel chat sessions. Each session retrieves context
+#   from a fake vectorstore with blocking network latency and then
+#   streams tokens. Reports p50/p99 inter-token latency with the old
+#   inline (blocking) retrieval vs PineconeClient.asimilarity_search.
+#
+#   Run from Server/:  python -m benchmarks.retrieval_concurrency
+#########################################################################
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from langchain_core.documents import Document
+from pc.pinecone import PineconeClient
+
+
+class SlowVectorStore:
+    """Blocking stand-in for PineconeVectorStore with a fixed round trip."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def similarity_search(self, query: str, k: int = 4):
+        time.sleep(self.latency)
+        return [Document(page_content=f"{query} {i}") for i in range(k)]
+
+
+def _offline_client(vectorstore) -> PineconeClient:
+    client = object.__new__(PineconeClient)
+    client.index_name = "bench"
+    client.vectorstore = vectorstore
+    return client
+
+
+async def _session(client, blocking: bool, tokens: int, token_interval: float, gaps: list):
+    if blocking:
+        client.vectorstore.similarity_search("question", k=4)
+    else:
+        await client.asimilarity_search("question", k=4)
+
+    last = time.perf_counter()
+    for _ in range(tokens):
+        await asyncio.sleep(token_interval)
+        now = time.perf_counter()
+        gaps.append(now - last)
+        last = now
+
+
+async def _run(client, sessions: int, blocking: bool, tokens: int, token_interval: float):
+    gaps: list = []
+
+    async def staggered(i):
+        await asyncio.sleep(i * token_interval)
+        await _session(client, blocking, tokens, token_interval, gaps)
+
+    await asyncio.gather(*(staggered(i) for i in range(sessions)))
+    gaps.sort()
+    return gaps
+
+
+def _pct(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.08, help="fake retrieval round trip (s)")
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--token-interval", type=float, default=0.02)
+    args = parser.parse_args()
+
+    client = _offline_client(SlowVectorStore(args.latency))
+    for label, blocking in (("before (inline)", True), ("after  (async) ", False)):
+        gaps = asyncio.run(_run(client, args.sessions, blocking, args.tokens, args.token_interval))
+        print(
+            f"{label}: sessions={args.sessions} "
+            f"p50={_pct(gaps, 0.50):.1f}ms p99={_pct(gaps, 0.99):.1f}ms "
+            f"max={gaps[-1] * 1000:.1f}ms mean={statistics.mean(gaps) * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#########################################################################
+#                       Segmenter benchmark
+#
+#   Replays token streams of typical assistant answers through the old
+#   flush rule (rescan the buffer for . , ? on every token) and through
+#   utils.segmenter.Segmenter. Reports TTS calls per answer, characters
+#   per call, modelled time-to-first-audio and segmentation CPU time.
+#
+#   Run from Server/:  python -m benchmarks.segmenter
+#########################################################################
+
+import argparse
+import re
+import time
+
+from utils.segmenter import voice_segmenter
+
+ANSWERS = [
+    "Sure! Our premium plan costs $49.99 per month and includes 3.5 TB of storage, priority support, "
+    "and access to the analytics dashboard. You can upgrade any time from the billing page at "
+    "app.example.com/billing. If you pay annually, you save about 20%, which works out to roughly "
+    "$480 a year. Would you like me to walk you through the upgrade?",
+    "Our office hours are 9 a.m. to 5 p.m., Monday through Friday. Dr. Patel leads the onboarding team, "
+    "and she usually replies within one business day. For urgent issues, e.g. an outage, please call "
+    "the support line at 1-800-555-0199 or open a ticket marked as critical.",
+    "Here is how to reset your password:\n1. Open the login page.\n2. Click \"Forgot password\".\n"
+    "3. Enter the email linked to your account, and check your inbox for the reset link. "
+    "The link expires after 30 minutes, so use it soon. If it doesn't arrive, check your spam folder, "
+    "or contact us and we'll resend it manually.",
+    "Version 2.4.1 fixed the sync bug you mentioned. It was caused by a race between the uploader and "
+    "the indexer, so large files were sometimes skipped. Updating should solve it; if it doesn't, send "
+    "us the log file from Settings, then Diagnostics, and we'll take a closer look.",
+]
+
+TOKEN = re.compile(r"\s?[A-Za-z]{1,4}|\s?\d{1,3}|\s?[^\sA-Za-z\d]|\s+")
+
+
+def tokens(text: str):
+    return TOKEN.findall(text)
+
+
+def legacy_segments(stream):
+    """The previous flush rule from AudioGeneratorFromTextGenerator."""
+    buffer = ""
+    for chunk in stream:
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        buffer += chunk + " "
+        if len(buffer) > 150 or any(punct in buffer for punct in [".", ",", "?"]):
+            yield buffer.strip()
+            buffer = ""
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def new_segments(stream):
+    segmenter = voice_segmenter()
+    for chunk in stream:
+        for segment in segmenter.feed(chunk):
+            if segment.strip():
+                yield segment.strip()
+    remaining = segmenter.flush()
+    if remaining and remaining.strip():
+        yield remaining.strip()
+
+
+def first_flush_token(segment_fn, stream):
+    """Index of the token whose arrival completes the first segment."""
+    next(segment_fn(_counting(stream)))
+    return _counting.count
+
+
+def _counting(stream):
+    _counting.count = 0
+    for token in stream:
+        _counting.count += 1
+        yield token
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--token-ms", type=float, default=25.0, help="LLM inter-token time")
+    parser.add_argument("--tts-ttfb-ms", type=float, default=250.0, help="TTS time to first byte")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    streams = [tokens(answer) for answer in ANSWERS]
+    for label, segment_fn in (("legacy   ", legacy_segments), ("segmenter", new_segments)):
+        calls = chars = 0
+        first_audio = []
+        for stream in streams:
+            segments = list(segment_fn(stream))
+            calls += len(segments)
+            chars += sum(len(s) for s in segments)
+            first_audio.append(first_flush_token(segment_fn, stream) * args.token_ms + args.tts_ttfb_ms)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for stream in streams:
+                for _ in segment_fn(stream):
+                    pass
+        per_answer = (time.perf_counter() - start) / (args.repeat * len(streams)) * 1e6
+
+        print(
+            f"{label}: TTS calls/answer={calls / len(streams):.1f} chars/call={chars / calls:.0f} "
+            f"first-audio={sum(first_audio) / len(first_audio):.0f}ms cpu/answer={per_answer:.0f}us"
+        )
+    print("\nfirst segment per answer (legacy | segmenter):")
+    for stream in streams:
+        print(f"  {next(legacy_segments(stream))!r:<28} | {next(new_segments(stream))!r}")
+
+
+if __name__ == "__main__":
+    main()
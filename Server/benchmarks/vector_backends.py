@@ -0,0 +1,75 @@
+#########################################################################
+#                   Local vector index benchmark
+#
+#   Builds a LocalVectorStore over synthetic clustered embeddings and
+#   compares query latency and recall@k of the approximate IVF mode
+#   against the exact flat baseline.
+#
+#   Run from Server/:  python -m benchmarks.vector_backends --rows 100000
+#########################################################################
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from pc.local_store import LocalVectorStore
+
+
+def _synthetic(rows: int, dim: int, clusters: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=rows)
+    return centers[labels] + 0.3 * rng.normal(size=(rows, dim)).astype(np.float32), centers, rng
+
+
+def _time_queries(store, queries, k):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = store.similarity_search_by_vector(query.tolist(), k=k)
+        latencies.append(time.perf_counter() - start)
+        results.append({doc.id for doc in hits})
+    latencies.sort()
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16])
+    args = parser.parse_args()
+
+    vectors, centers, rng = _synthetic(args.rows, args.dim, clusters=max(8, args.rows // 500))
+    queries = centers[rng.integers(0, len(centers), size=args.queries)] + 0.3 * rng.normal(size=(args.queries, args.dim))
+    texts = [f"doc {i}" for i in range(args.rows)]
+
+    with tempfile.TemporaryDirectory() as path:
+        flat = LocalVectorStore(path, embedding=None, mode="flat")
+        start = time.perf_counter()
+        for offset in range(0, args.rows, 10_000):
+            flat.add_vectors(texts[offset:offset + 10_000], vectors[offset:offset + 10_000])
+        print(f"indexed {args.rows} x {args.dim} in {time.perf_counter() - start:.2f}s")
+
+        truth, latencies = _time_queries(flat, queries, args.k)
+        print(f"flat       p50={latencies[len(latencies) // 2] * 1000:.2f}ms recall@{args.k}=1.000")
+
+        for nprobe in args.nprobe:
+            ivf = LocalVectorStore(path, embedding=None, mode="ivf", nprobe=nprobe)
+            start = time.perf_counter()
+            ivf.similarity_search_by_vector(queries[0].tolist(), k=args.k)  # trains the index
+            train = time.perf_counter() - start
+            found, latencies = _time_queries(ivf, queries, args.k)
+            recall = np.mean([len(a & b) / args.k for a, b in zip(found, truth)])
+            print(
+                f"ivf np={nprobe:<3} p50={latencies[len(latencies) // 2] * 1000:.2f}ms "
+                f"recall@{args.k}={recall:.3f} (train {train:.2f}s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
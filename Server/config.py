@@ -23,5 +23,396 @@ class _Config:
     def ELEVEN_API_KEY(self):
         return os.getenv("ELEVEN_API_KEY")
 
+    ############## UPSTREAM CLIENTS ##############
+
+    @property
+    def OPENAI_BASE_URL(self):
+        return os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+    @property
+    def ELEVEN_BASE_URL(self):
+        return os.getenv("ELEVEN_BASE_URL", "https://api.elevenlabs.io")
+
+    @property
+    def PINECONE_HOST(self):
+        # control plane URL; unset uses Pinecone's default (set for local stand-ins)
+        return os.getenv("PINECONE_HOST") or None
+
+    @property
+    def HTTP_POOL_SIZE(self):
+        # keep-alive connections per upstream (OpenAI, ElevenLabs, Pinecone)
+        return int(os.getenv("HTTP_POOL_SIZE", "32"))
+
+    @property
+    def HTTP_KEEPALIVE_EXPIRY(self):
+        return float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "120"))
+
+    @property
+    def HTTP_CONNECT_TIMEOUT(self):
+        return float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+    @property
+    def HTTP_TIMEOUT(self):
+        return float(os.getenv("HTTP_TIMEOUT", "120"))
+
+    @property
+    def HTTP_WARM_CONNECTIONS(self):
+        # connections opened to each upstream at startup; 0 disables warm-up
+        return int(os.getenv("HTTP_WARM_CONNECTIONS", "2"))
+
+    ############## VECTOR STORE ##############
+
+    @property
+    def VECTOR_BACKEND(self):
+        # "pinecone" (serverless) or "local" (in-process NumPy index)
+        return os.getenv("VECTOR_BACKEND", "pinecone").lower()
+
+    @property
+    def LOCAL_INDEX_DIR(self):
+        return os.getenv("LOCAL_INDEX_DIR", ".cache/local_index")
+
+    @property
+    def LOCAL_INDEX_MODE(self):
+        # "flat" (exact), "ivf" (approximate) or "auto" (ivf once the index is large)
+        return os.getenv("LOCAL_INDEX_MODE", "auto").lower()
+
+    @property
+    def LOCAL_INDEX_NPROBE(self):
+        return int(os.getenv("LOCAL_INDEX_NPROBE", "8"))
+
+    @property
+    def INDEX_POOL_SIZE(self):
+        # ready vectorstore handles kept open for per-session index routing
+        return int(os.getenv("INDEX_POOL_SIZE", "16"))
+
+    @property
+    def INDEX_CATALOG_TTL(self):
+        # seconds the list of existing indexes is trusted before asking Pinecone again
+        return float(os.getenv("INDEX_CATALOG_TTL", "300"))
+
+    ############## CRAWLER ##############
+
+    @property
+    def INGEST_MANIFEST_PATH(self):
+        return os.getenv("INGEST_MANIFEST_PATH", ".cache/ingest_manifest.sqlite")
+
+    @property
+    def CRAWL_CONCURRENCY(self):
+        return int(os.getenv("CRAWL_CONCURRENCY", "32"))
+
+    @property
+    def CRAWL_PER_HOST_CONCURRENCY(self):
+        return int(os.getenv("CRAWL_PER_HOST_CONCURRENCY", "8"))
+
+    @property
+    def CRAWL_DELAY(self):
+        # minimum seconds between two requests to the same host
+        return float(os.getenv("CRAWL_DELAY", "0"))
+
+    @property
+    def CRAWL_RESPECT_ROBOTS(self):
+        return os.getenv("CRAWL_RESPECT_ROBOTS", "true").lower() == "true"
+
+    ############## INGESTION PIPELINE ##############
+
+    @property
+    def INGEST_QUEUE_SIZE(self):
+        return int(os.getenv("INGEST_QUEUE_SIZE", "64"))
+
+    @property
+    def INGEST_PROCESSES(self):
+        # processes parsing pages and chunking documents; 0 runs them in a thread of the server
+        return int(os.getenv("INGEST_PROCESSES", str(max(1, (os.cpu_count() or 2) // 2))))
+
+    @property
+    def EMBED_BATCH_SIZE(self):
+        return int(os.getenv("EMBED_BATCH_SIZE", "128"))
+
+    @property
+    def UPSERT_BATCH_SIZE(self):
+        return int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+
+    @property
+    def INGEST_EMBED_WORKERS(self):
+        return int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+
+    @property
+    def INGEST_UPSERT_WORKERS(self):
+        return int(os.getenv("INGEST_UPSERT_WORKERS", "4"))
+
+    @property
+    def INGEST_RETRIES(self):
+        return int(os.getenv("INGEST_RETRIES", "5"))
+
+    @property
+    def INGEST_RETRY_DELAY(self):
+        return float(os.getenv("INGEST_RETRY_DELAY", "0.5"))
+
+    ############## NEAR-DUPLICATES ##############
+
+    @property
+    def DEDUP_ENABLED(self):
+        # skip chunks that nearly duplicate stored ones (headers, footers, legal text)
+        return os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+
+    @property
+    def DEDUP_THRESHOLD(self):
+        # estimated Jaccard similarity of word 3-grams at which a chunk counts as a duplicate
+        return float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+
+    @property
+    def DEDUP_INDEX_DIR(self):
+        return os.getenv("DEDUP_INDEX_DIR", ".cache/dedup")
+
+    ############## CHUNKING ##############
+
+    @property
+    def CHUNK_TOKENS(self):
+        # chunk size in tokens of the embedding model, heading path line included
+        return int(os.getenv("CHUNK_TOKENS", "256"))
+
+    @property
+    def CHUNK_OVERLAP_TOKENS(self):
+        # end of the previous chunk repeated when a section continues (whole sentences)
+        return int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+
+    @property
+    def CHUNK_MIN_TOKENS(self):
+        # a heading starts a new chunk once the current one holds this many tokens
+        return int(os.getenv("CHUNK_MIN_TOKENS", "64"))
+
+    ############## TEXT SEGMENTATION ##############
+
+    @property
+    def VOICE_SEGMENT_FIRST_MIN_CHARS(self):
+        return int(os.getenv("VOICE_SEGMENT_FIRST_MIN_CHARS", "4"))
+
+    @property
+    def VOICE_SEGMENT_FIRST_MAX_CHARS(self):
+        # without a clause boundary sooner, the first segment is cut at a space after this many characters
+        return int(os.getenv("VOICE_SEGMENT_FIRST_MAX_CHARS", "24"))
+
+    @property
+    def VOICE_SEGMENT_MIN_CHARS(self):
+        return int(os.getenv("VOICE_SEGMENT_MIN_CHARS", "80"))
+
+    @property
+    def VOICE_SEGMENT_MAX_CHARS(self):
+        return int(os.getenv("VOICE_SEGMENT_MAX_CHARS", "200"))
+
+    @property
+    def CHAT_SEGMENT_MAX_CHARS(self):
+        return int(os.getenv("CHAT_SEGMENT_MAX_CHARS", "80"))
+
+    ############## TEXT TO SPEECH ##############
+
+    @property
+    def TTS_LOOKAHEAD(self):
+        # segments synthesized concurrently ahead of the one being played
+        return int(os.getenv("TTS_LOOKAHEAD", "2"))
+
+    @property
+    def TTS_CACHE_ENABLED(self):
+        return os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+
+    @property
+    def TTS_CACHE_DIR(self):
+        return os.getenv("TTS_CACHE_DIR", ".cache/tts")
+
+    @property
+    def TTS_CACHE_MAX_BYTES(self):
+        return int(os.getenv("TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+    ############## RETRIEVAL ##############
+
+    @property
+    def RETRIEVAL_WORKERS(self):
+        return int(os.getenv("RETRIEVAL_WORKERS", "8"))
+
+    @property
+    def RETRIEVAL_TIMEOUT(self):
+        return float(os.getenv("RETRIEVAL_TIMEOUT", "5"))
+
+    @property
+    def RETRIEVAL_CANDIDATES(self):
+        # vector hits over-fetched (with their vectors) for MMR re-ranking
+        return int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+
+    @property
+    def MMR_LAMBDA(self):
+        # 1.0 ranks by relevance only, lower values favour diversity
+        return float(os.getenv("MMR_LAMBDA", "0.7"))
+
+    @property
+    def MERGE_ADJACENT_CHUNKS(self):
+        return os.getenv("MERGE_ADJACENT_CHUNKS", "true").lower() == "true"
+
+    @property
+    def HYBRID_SEARCH_ENABLED(self):
+        # BM25 lexical search fused with vector search (reciprocal rank fusion)
+        return os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+
+    @property
+    def LEXICAL_INDEX_DIR(self):
+        return os.getenv("LEXICAL_INDEX_DIR", ".cache/lexical")
+
+    @property
+    def RRF_K(self):
+        return int(os.getenv("RRF_K", "60"))
+
+    @property
+    def LEXICAL_FAST_PATH_MARGIN(self):
+        # an identifier hit this many times stronger than the runner-up skips vector search
+        return float(os.getenv("LEXICAL_FAST_PATH_MARGIN", "2"))
+
+    ############## CONTEXT ##############
+
+    @property
+    def CONTEXT_TOKENS_CHAT(self):
+        # token budget for retrieved context in the chat prompt
+        return int(os.getenv("CONTEXT_TOKENS_CHAT", "1200"))
+
+    @property
+    def CONTEXT_TOKENS_VOICE(self):
+        # spoken answers are short; a smaller prompt gets the first token out sooner
+        return int(os.getenv("CONTEXT_TOKENS_VOICE", "500"))
+
+    @property
+    def CONTEXT_MAX_CHUNKS(self):
+        # chunks retrieved per question; the budget decides how many are used
+        return int(os.getenv("CONTEXT_MAX_CHUNKS", "8"))
+
+    @property
+    def CONTEXT_MIN_SCORE(self):
+        # cosine relevance floor; unrelated text scores about 0.7 with text-embedding-ada-002
+        return float(os.getenv("CONTEXT_MIN_SCORE", "0.75"))
+
+    @property
+    def CONTEXT_MIN_LEXICAL_SCORE(self):
+        # floor for BM25-only hits: share of the question's term weight (IDF) a chunk must contain
+        return float(os.getenv("CONTEXT_MIN_LEXICAL_SCORE", "0.5"))
+
+    @property
+    def CONTEXT_MIN_CHUNK_TOKENS(self):
+        # a chunk that does not fit is cut to the remaining budget if this much is left
+        return int(os.getenv("CONTEXT_MIN_CHUNK_TOKENS", "64"))
+
+    ############## RESPONSE CACHE ##############
+
+    @property
+    def RESPONSE_CACHE_ENABLED(self):
+        return os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+
+    @property
+    def RESPONSE_CACHE_THRESHOLD(self):
+        return float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+
+    @property
+    def RESPONSE_CACHE_TTL(self):
+        return float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+    @property
+    def RESPONSE_CACHE_SIZE(self):
+        return int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+
+    ############## SESSIONS ##############
+
+    @property
+    def SESSION_HISTORY_TOKENS(self):
+        # chat history tokens sent with each question (on top of the rolling summary)
+        return int(os.getenv("SESSION_HISTORY_TOKENS", "1500"))
+
+    @property
+    def SESSION_SUMMARY_TOKENS(self):
+        return int(os.getenv("SESSION_SUMMARY_TOKENS", "400"))
+
+    @property
+    def SESSION_SUMMARY_MODEL(self):
+        return os.getenv("SESSION_SUMMARY_MODEL", "gpt-4o-mini")
+
+    @property
+    def SESSION_TTL(self):
+        return float(os.getenv("SESSION_TTL", "3600"))
+
+    @property
+    def SESSION_MAX(self):
+        return int(os.getenv("SESSION_MAX", "10000"))
+
+    ############## COALESCING ##############
+
+    @property
+    def COALESCE_ENABLED(self):
+        # identical concurrent first questions share one generation (and its audio)
+        return os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+
+    ############## ADMISSION CONTROL ##############
+
+    @property
+    def ADMISSION_ENABLED(self):
+        return os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+
+    @property
+    def OPENAI_MAX_CONCURRENT(self):
+        # answer streams and ingestion embedding batches in flight at once
+        return int(os.getenv("OPENAI_MAX_CONCURRENT", "64"))
+
+    @property
+    def OPENAI_MAX_PER_CONNECTION(self):
+        return int(os.getenv("OPENAI_MAX_PER_CONNECTION", "2"))
+
+    @property
+    def OPENAI_TOKENS_PER_MINUTE(self):
+        # set below the account's TPM limit to queue instead of hitting 429s; 0 = unlimited
+        return float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "0"))
+
+    @property
+    def OPENAI_EXPECTED_COMPLETION_TOKENS(self):
+        # charged up front for an answer, corrected once it has streamed
+        return int(os.getenv("OPENAI_EXPECTED_COMPLETION_TOKENS", "300"))
+
+    @property
+    def ELEVEN_MAX_CONCURRENT(self):
+        # ElevenLabs plans cap concurrent requests (e.g. 10 on Pro)
+        return int(os.getenv("ELEVEN_MAX_CONCURRENT", "10"))
+
+    @property
+    def ELEVEN_MAX_PER_CONNECTION(self):
+        return int(os.getenv("ELEVEN_MAX_PER_CONNECTION", "3"))
+
+    @property
+    def ELEVEN_CHARS_PER_MINUTE(self):
+        return float(os.getenv("ELEVEN_CHARS_PER_MINUTE", "0"))
+
+    @property
+    def ADMISSION_DEADLINE_VOICE(self):
+        # longest expected wait for capacity before a turn is refused (seconds)
+        return float(os.getenv("ADMISSION_DEADLINE_VOICE", "3"))
+
+    @property
+    def ADMISSION_DEADLINE_CHAT(self):
+        return float(os.getenv("ADMISSION_DEADLINE_CHAT", "8"))
+
+    ############## METRICS ##############
+
+    @property
+    def METRICS_ENABLED(self):
+        # GET /metrics in the Prometheus text format
+        return os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    @property
+    def TRACE_TURNS(self):
+        # log per-turn stage spans and keep the latest for /api/admin/traces
+        return os.getenv("TRACE_TURNS", "false").lower() == "true"
+
+    ############## EMBEDDING CACHE ##############
+
+    @property
+    def EMBEDDING_CACHE_PATH(self):
+        return os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+
+    @property
+    def EMBEDDING_CACHE_SIZE(self):
+        return int(os.getenv("EMBEDDING_CACHE_SIZE", "200000"))
+
 CONFIG = _Config()
 
@@ -0,0 +1,106 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Semantic response cache.
+
+    Answers are stored under a namespace (index name, index data version, prompt hash)
+    together with the normalized question embedding. A lookup returns the cached answer
+    of the most similar question in the namespace if its cosine similarity reaches the
+    threshold. Entries expire after `ttl` seconds and the least recently used entry is
+    evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600, max_entries: int = 512):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # key -> (namespace, vector, answer, created_at)
+        self._entries: "OrderedDict[int, Tuple[tuple, np.ndarray, str, float]]" = OrderedDict()
+        self._index_versions: Dict[str, int] = {}
+        self._next_key = 0
+
+    @staticmethod
+    def namespace(index_name: str, data_version: int, prompt: Optional[str]) -> tuple:
+        prompt_hash = hashlib.sha1((prompt or "").encode("utf-8")).hexdigest()
+        return (index_name, data_version, prompt_hash)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop_stale(self, namespace: tuple):
+        """Forget every entry of an index once its data version moves on."""
+        index_name, data_version, _ = namespace
+        if self._index_versions.get(index_name) == data_version:
+            return
+        self._index_versions[index_name] = data_version
+        for key in [k for k, entry in self._entries.items() if entry[0][0] == index_name]:
+            del self._entries[key]
+
+    def lookup(self, namespace: tuple, embedding: List[float]) -> Optional[str]:
+        self._drop_stale(namespace)
+        now = time.monotonic()
+        expired = [k for k, entry in self._entries.items() if now - entry[3] > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+        keys = [k for k, entry in self._entries.items() if entry[0] == namespace]
+        if not keys:
+            self.misses += 1
+            return None
+
+        matrix = np.stack([self._entries[k][1] for k in keys])
+        scores = matrix @ self._normalize(embedding)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(keys[best])
+        self.hits += 1
+        return self._entries[keys[best]][2]
+
+    def store(self, namespace: tuple, embedding: List[float], answer: str):
+        self._drop_stale(namespace)
+        self._entries[self._next_key] = (namespace, self._normalize(embedding), answer, time.monotonic())
+        self._next_key += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, index_name: str = None):
+        """Drop every entry, or only those belonging to one index."""
+        if index_name is None:
+            self._entries.clear()
+            return
+        for key in [k for k, entry in self._entries.items() if entry[0][0] == index_name]:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def replay_answer(answer: str, words_per_chunk: int = 3):
+    """Split a cached answer into small chunks that look like a token stream."""
+    words = answer.split(" ")
+    for i in range(0, len(words), words_per_chunk):
+        chunk = " ".join(words[i:i + words_per_chunk])
+        if i + words_per_chunk < len(words):
+            chunk += " "
+        yield chunk
@@ -0,0 +1,125 @@
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from llm.tokens import text_tokens, truncate_tokens
+
+SEPARATOR = "\n\n"
+
+
+@dataclass
+class ContextStats:
+    """What went into one turn's context."""
+    budget: int
+    tokens: int = 0
+    chunks: int = 0
+    below_floor: int = 0  # dropped by the relevance floor
+    over_budget: int = 0  # relevant, but did not fit
+    truncated: bool = False
+
+    def as_dict(self) -> dict:
+        return {
+            "budget": self.budget,
+            "tokens": self.tokens,
+            "chunks": self.chunks,
+            "below_floor": self.below_floor,
+            "over_budget": self.over_budget,
+            "truncated": self.truncated,
+        }
+
+
+class ContextAssembler:
+    """
+    Packs retrieved chunks into a token budget instead of joining a fixed number of them.
+
+    - chunks arrive best first (fused / re-ranked order) and are packed in that order
+    - vector hits whose cosine "score" is below `min_score` are dropped, so a question the
+      knowledge base knows nothing about gets an empty context rather than noise; lexical
+      hits are held to `min_lexical_score` on their "lexical_score" (share of the question's
+      term weight they contain), and a chunk with neither score only passes without floors
+    - a chunk that does not fit is skipped for smaller ones after it, or cut to the
+      remaining budget when at least `min_chunk_tokens` are left
+    - token counts of stored chunks are cached (LRU), so a popular chunk is tokenized once
+    """
+
+    def __init__(
+        self,
+        min_score: float = 0.0,
+        min_chunk_tokens: int = 64,
+        cache_size: int = 8192,
+        model: str = "gpt-4o",
+        min_lexical_score: float = 0.0,
+    ):
+        self.min_score = min_score
+        self.min_lexical_score = min_lexical_score
+        self.min_chunk_tokens = min_chunk_tokens
+        self.cache_size = cache_size
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+        self._tokens: "OrderedDict[tuple, int]" = OrderedDict()
+        self._separator = text_tokens(SEPARATOR, model)
+
+    def tokens(self, doc: Document) -> int:
+        # merged passages reuse their first chunk's id, so the length is part of the key
+        key = (doc.id or zlib.crc32(doc.page_content.encode("utf-8")), len(doc.page_content))
+        count = self._tokens.get(key)
+        if count is not None:
+            self.hits += 1
+            self._tokens.move_to_end(key)
+            return count
+        self.misses += 1
+        count = text_tokens(doc.page_content, self.model)
+        self._tokens[key] = count
+        if len(self._tokens) > self.cache_size:
+            self._tokens.popitem(last=False)
+        return count
+
+    def relevant(self, doc: Document) -> bool:
+        score = doc.metadata.get("score")
+        if score is not None:
+            return score >= self.min_score
+        lexical_score = doc.metadata.get("lexical_score")
+        if lexical_score is not None:
+            return lexical_score >= self.min_lexical_score
+        return self.min_score <= 0 and self.min_lexical_score <= 0
+
+    def assemble(self, docs: List[Document], budget: int) -> Tuple[str, List[Document], ContextStats]:
+        """(context, packed chunks, stats) for at most `budget` tokens of context."""
+        stats = ContextStats(budget=budget)
+        parts: List[str] = []
+        packed: List[Document] = []
+        remaining = budget
+        for doc in docs:
+            if not self.relevant(doc):
+                stats.below_floor += 1
+                continue
+            if not doc.page_content.strip():
+                continue
+            cost = self.tokens(doc) + (self._separator if parts else 0)
+            if cost <= remaining:
+                parts.append(doc.page_content)
+            elif remaining - (self._separator if parts else 0) >= self.min_chunk_tokens:
+                parts.append(truncate_tokens(doc.page_content, remaining - (self._separator if parts else 0), self.model))
+                cost = remaining
+                stats.truncated = True
+            else:
+                stats.over_budget += 1
+                continue
+            packed.append(doc)
+            remaining -= cost
+        stats.chunks = len(packed)
+        stats.tokens = budget - remaining
+        return SEPARATOR.join(parts), packed, stats
+
+    def stats(self) -> dict:
+        return {
+            "min_score": self.min_score,
+            "min_lexical_score": self.min_lexical_score,
+            "cached_chunks": len(self._tokens),
+            "token_cache_hits": self.hits,
+            "token_cache_misses": self.misses,
+        }
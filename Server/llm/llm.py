@@ -1,5 +1,7 @@
 import asyncio
-from typing import AsyncGenerator, List
+import time
+from contextlib import aclosing
+from typing import AsyncGenerator, List, Optional
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 from langchain.chains import ConversationalRetrievalChain
@@ -9,6 +11,14 @@ from config import CONFIG
 from langchain.prompts import PromptTemplate
 from langchain.callbacks.base import BaseCallbackHandler
 from pc.pinecone import PineconeClient
+from utils.clients import CLIENTS
+from llm.cache import SemanticCache, replay_answer
+from pc.lexical import reciprocal_rank_fusion
+from pc.rerank import merge_adjacent, mmr
+from llm.session import Session, SessionStore, Turn, count_tokens, parse_client_history
+from llm.context import ContextAssembler
+from utils.metrics import CONTEXT_TOKENS, LLM_TOKENS_PER_SECOND, LLM_TTFT_SECONDS, REGISTRY, observe_stage, span
+from utils.scheduler import OPENAI_CAPACITY
 
 class LLM:
 ################################################
@@ -21,6 +31,10 @@ class LLM:
     stream_llm =None
     embeddings = None
     model_name = None
+    response_cache = None
+    sessions = None
+    summary_llm = None
+    context = None
     _initialized=False
 ################################################
 ##          SINGLETON INSTANCE
@@ -45,10 +59,55 @@ class LLM:
         self.model_name = model_name
         ################## OPEN AI MODEL & EMBEDDINGS ##############    
 
+        # Both models share the pooled keep-alive transport owned by the server lifespan
         self.llm = ChatOpenAI(
                 openai_api_key=self.openai_api_key, 
+                openai_api_base=CONFIG.OPENAI_BASE_URL,
                 model=model_name,
                 temperature=0.7, #increases creativity of model
+                http_async_client=CLIENTS.openai_async,
+            )
+        self.stream_llm = ChatOpenAI(
+            openai_api_key=self.openai_api_key,
+            openai_api_base=CONFIG.OPENAI_BASE_URL,
+            model=model_name,
+            temperature=0.7,
+            streaming=True,
+            http_async_client=CLIENTS.openai_async,
+        )
+
+        ################## SESSION HISTORY ##############
+        self.summary_llm = ChatOpenAI(
+            openai_api_key=self.openai_api_key,
+            openai_api_base=CONFIG.OPENAI_BASE_URL,
+            model=CONFIG.SESSION_SUMMARY_MODEL,
+            temperature=0,
+            http_async_client=CLIENTS.openai_async,
+        )
+        self.sessions = SessionStore(
+            self.summarize,
+            history_tokens=CONFIG.SESSION_HISTORY_TOKENS,
+            summary_tokens=CONFIG.SESSION_SUMMARY_TOKENS,
+            ttl=CONFIG.SESSION_TTL,
+            max_sessions=CONFIG.SESSION_MAX,
+            model=model_name,
+        )
+        REGISTRY.gauge("chatbot_active_sessions", "Conversations held server-side", source=lambda: self.sessions.stats()["sessions"])
+
+        ################## CONTEXT ASSEMBLY ##############
+        self.context = ContextAssembler(
+            min_score=CONFIG.CONTEXT_MIN_SCORE,
+            min_chunk_tokens=CONFIG.CONTEXT_MIN_CHUNK_TOKENS,
+            model=model_name,
+            min_lexical_score=CONFIG.CONTEXT_MIN_LEXICAL_SCORE,
+        )
+
+        ################## SEMANTIC RESPONSE CACHE ##############
+        if CONFIG.RESPONSE_CACHE_ENABLED:
+            self.response_cache = SemanticCache(
+                threshold=CONFIG.RESPONSE_CACHE_THRESHOLD,
+                ttl=CONFIG.RESPONSE_CACHE_TTL,
+                max_entries=CONFIG.RESPONSE_CACHE_SIZE,
             )
 
         self.__class__._initialized = True
@@ -56,6 +115,90 @@ class LLM:
 
 
 
+    #######################################################
+    #             Retrieval
+    #           Vector search fused with BM25 hits by
+    #           reciprocal rank fusion
+    #######################################################
+
+    async def _embed_question(self, question: str) -> Optional[List[float]]:
+        start = time.perf_counter()
+        try:
+            return await self.pc.embeddings.aembed_query(question)
+        except Exception as e:
+            print(f"Error embedding question: {e}")
+            return None
+        finally:
+            observe_stage("embedding", start)
+
+    async def _retrieve(self, question: str, index_name: str, namespace: Optional[str], lexical_docs: List = None, embedding: List[float] = None, k: int = None):
+        k = k or CONFIG.CONTEXT_MAX_CHUNKS
+        wanted = k * 2 if lexical_docs else k
+        if embedding is not None:
+            # Over-fetch with vectors, then keep a relevant but non-redundant subset (MMR)
+            candidates = await self.pc.asimilarity_search_with_vectors(
+                embedding, k=max(CONFIG.RETRIEVAL_CANDIDATES, wanted), index_name=index_name, namespace=namespace
+            )
+            picked = mmr(embedding, [vector for _, vector in candidates], wanted, CONFIG.MMR_LAMBDA)
+            vector_docs = [candidates[i][0] for i in picked]
+        else:
+            vector_docs = await self.pc.asimilarity_search(
+                question, k=wanted, index_name=index_name, namespace=namespace
+            )
+        docs = reciprocal_rank_fusion([vector_docs, lexical_docs], k=CONFIG.RRF_K, limit=k) if lexical_docs else vector_docs[:k]
+        # Neighbouring chunks of one page become one passage without the repeated overlap
+        return merge_adjacent(docs) if CONFIG.MERGE_ADJACENT_CHUNKS else docs
+
+    def _lexical_only(self, lexical_docs: List):
+        docs = lexical_docs[:CONFIG.CONTEXT_MAX_CHUNKS]
+        return merge_adjacent(docs) if CONFIG.MERGE_ADJACENT_CHUNKS else docs
+
+    def _assemble_context(self, docs: List, context_tokens: Optional[int], session: Optional[Session]):
+        """Pack the retrieved chunks into the prompt's token budget; records the size on the session."""
+        budget = CONFIG.CONTEXT_TOKENS_CHAT if context_tokens is None else context_tokens
+        context, packed, stats = self.context.assemble(docs, budget)
+        CONTEXT_TOKENS.observe(stats.tokens)
+        print(
+            f"Context: {stats.tokens}/{budget} tokens from {stats.chunks} of {len(docs)} chunks "
+            f"({stats.below_floor} below relevance floor, {stats.over_budget} over budget)"
+        )
+        if session is not None:
+            session.context = stats
+        return context, packed
+
+    def _route(self, session: Optional[Session]):
+        """(index, namespace) to retrieve from: the session's, else the default index."""
+        if session is not None and session.index_name:
+            return session.index_name, session.namespace
+        return self.pc.getIndexName(), session.namespace if session is not None else None
+
+    def _build_messages(self, system_prompt: str, question: str, chat_history: List[str], session: Optional[Session]):
+        history = session if session is not None else self.sessions.transient(chat_history, question)
+        return [
+            SystemMessage(content=system_prompt),
+            *self.sessions.messages(history),
+            HumanMessage(content=question),
+        ]
+
+    @staticmethod
+    def _request_cost(messages) -> int:
+        """Tokens charged to the OpenAI budget before the answer is known."""
+        return sum(count_tokens(message.content) for message in messages) + CONFIG.OPENAI_EXPECTED_COMPLETION_TOKENS
+
+    async def summarize(self, previous: str, turns: List[Turn], max_tokens: int) -> str:
+        """Fold older turns into the rolling summary (runs in the background)."""
+        transcript = "\n".join(f"{turn.role}: {turn.content}" for turn in turns)
+        messages = [
+            SystemMessage(content=(
+                "Summarize the conversation between a user and an assistant so it can continue "
+                "without the full transcript. Keep names, facts, decisions and open questions. "
+                f"Use at most {int(max_tokens * 0.75)} words."
+            )),
+            HumanMessage(content=f"Previous summary:\n{previous or '(none)'}\n\nNew turns:\n{transcript}"),
+        ]
+        response = await self.summary_llm.ainvoke(messages, max_tokens=max_tokens)
+        return response.content
+
     #######################################################
     #             Get Response (Non streaming)
     #           Set custom prompt
@@ -64,12 +207,17 @@ class LLM:
     #           Returns response['answer']
     #######################################################
 
-    async def get_response(self, question: str, chat_history: List[str] = [] , prompt:str = None):
+    async def get_response(self, question: str, chat_history: List[str] = [] , prompt:str = None, session: Optional[Session] = None, context_tokens: Optional[int] = None):
 
         ################# Prompt converts into Prompt Template ##################
 
-        docs = self.pc.vectorstore.similarity_search(question, k=4)
-        context = "\n\n".join([doc.page_content for doc in docs])
+        index_name, namespace = self._route(session)
+        lexical_docs, confident = await self.pc.alexical_search(question, k=CONFIG.CONTEXT_MAX_CHUNKS * 2, index_name=index_name, namespace=namespace)
+        if confident:
+            docs = self._lexical_only(lexical_docs)
+        else:
+            docs = await self._retrieve(question, index_name, namespace, lexical_docs, await self._embed_question(question))
+        context, docs = self._assemble_context(docs, context_tokens, session)
 
         if prompt:
             try:
@@ -83,14 +231,16 @@ class LLM:
 
 
         ################## Setting Response chain for custom prompt ###############
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=f"Chat History :\n{chat_history}\n\n Question : {question} ")
-            ]      
+        messages = self._build_messages(system_prompt, question, chat_history, session)
 
         ################## Get Response and returns it #####################
         try:
-            response = await self.llm.ainvoke(messages)
+            async with OPENAI_CAPACITY.slot(cost=self._request_cost(messages)) as lease:
+                response = await self.llm.ainvoke(messages)
+                if lease is not None:
+                    lease.spent(lease.cost - CONFIG.OPENAI_EXPECTED_COMPLETION_TOKENS + count_tokens(response.content))
+            if session is not None:
+                self.sessions.add_turn(session, question, response.content)
             return response.content
         except Exception as e:
             print(f"Error in get_response: {e}")
@@ -107,14 +257,60 @@ class LLM:
     #           Returns response['answer']
     #######################################################
 
-    async def get_stream_response(self, question: str, chat_history: List[str]=[], prompt:str = None) -> AsyncGenerator[str, None]:
+    @staticmethod
+    def _has_history(question: str, chat_history: List[str], session: Optional[Session]) -> bool:
+        if session is not None:
+            return bool(session.turns or session.summary)
+        return bool(parse_client_history(chat_history, question))
+
+    async def get_stream_response(self, question: str, chat_history: List[str]=[], prompt:str = None, session: Optional[Session] = None, context_tokens: Optional[int] = None) -> AsyncGenerator[str, None]:
+
+        index_name, index_namespace = self._route(session)
+        if session is not None:
+            session.context = None  # cached answers use no context
+        namespace = None
+        embedding = None
 
-        ################## Prompt converts into Prompt Template #################
+        ################ 1. Lexical search, overlapped with the question embedding ################
+        retrieval_start = time.perf_counter()
+        embedding_task = asyncio.create_task(self._embed_question(question))
+        try:
+            lexical_docs, confident = await self.pc.alexical_search(
+                question, k=CONFIG.CONTEXT_MAX_CHUNKS * 2, index_name=index_name, namespace=index_namespace
+            )
+            observe_stage("lexical_search", retrieval_start)
+            if confident:
+                # Fast path: an exact identifier hit (SKU, error code) needs no embedding round trip
+                embedding_task.cancel()
+                docs = self._lexical_only(lexical_docs)
+            else:
+                embedding = await embedding_task
+
+                ####################### 2. Semantic cache lookup #######################
+                # a follow-up ("and how much is it?") depends on the conversation, so only
+                # opening questions are answered from, or stored in, the shared cache
+                if self.response_cache is not None and embedding is not None and not self._has_history(question, chat_history, session):
+                    cache_key = f"{index_name}/{index_namespace}" if index_namespace else index_name
+                    namespace = SemanticCache.namespace(cache_key, self.pc.version_of(index_name), prompt)
+                    cached = self.response_cache.lookup(namespace, embedding)
+                    if cached is not None:
+                        observe_stage("cache_hit", retrieval_start)
+                        for chunk in replay_answer(cached):
+                            yield chunk
+                        if session is not None:
+                            self.sessions.add_turn(session, question, cached)
+                        return
 
-        docs = self.pc.vectorstore.similarity_search(question, k=4)
-        context = "\n\n".join([doc.page_content for doc in docs])
+                ################## 3. Vector search fused with lexical hits #################
+                docs = await self._retrieve(question, index_name, index_namespace, lexical_docs, embedding)
+        finally:
+            embedding_task.cancel()
+        observe_stage("retrieval", retrieval_start)
 
-        ####################### 3. Inject variables into prompt #######################
+        ####################### 4. Pack chunks into the token budget #######################
+        context, docs = self._assemble_context(docs, context_tokens, session)
+
+        ####################### 5. Inject variables into prompt #######################
         if prompt:
             try:
                 system_prompt = prompt.format(
@@ -125,18 +321,40 @@ class LLM:
         else:
             system_prompt = question  # fallback if no prompt given
 
-        ####################### 4. Initialize streaming LLM #######################
-        stream_llm = ChatOpenAI(
-            openai_api_key=self.openai_api_key,
-            model=self.model_name,
-            temperature=0.7,
-            streaming=True,
-        )
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=f"Chat History :\n{chat_history}\n\n Question : {question} ")
-            ]      
-        ####################### 5. Stream the response #######################
-        async for chunk in stream_llm.astream(messages):
-            if hasattr(chunk, 'content') and chunk.content:
-                yield chunk.content
+        ####################### 6. Build messages #######################
+        messages = self._build_messages(system_prompt, question, chat_history, session)
+        ####################### 7. Stream the response #######################
+        # aclosing: a cancelled turn closes the OpenAI stream instead of leaving it open
+        answer = []
+        request_start = time.perf_counter()
+        first_token = None
+        try:
+            # waits (or raises Overloaded) when OpenAI capacity is taken by other turns
+            async with OPENAI_CAPACITY.slot(cost=self._request_cost(messages)) as lease:
+                request_start = time.perf_counter()
+                async with aclosing(self.stream_llm.astream(messages)) as stream:
+                    async for chunk in stream:
+                        if hasattr(chunk, 'content') and chunk.content:
+                            if first_token is None:
+                                first_token = time.perf_counter()
+                                LLM_TTFT_SECONDS.observe(first_token - request_start)
+                                span("llm_first_token", request_start, first_token - request_start)
+                            answer.append(chunk.content)
+                            yield chunk.content
+                if lease is not None:
+                    # one streamed chunk is one token
+                    lease.spent(lease.cost - CONFIG.OPENAI_EXPECTED_COMPLETION_TOKENS + len(answer))
+        finally:
+            if first_token is not None:
+                # one streamed chunk is one token
+                streaming = time.perf_counter() - first_token
+                span("llm_stream", first_token, streaming)
+                if len(answer) > 1 and streaming > 0:
+                    LLM_TOKENS_PER_SECOND.observe((len(answer) - 1) / streaming)
+            # an interrupted answer is kept too: the user heard that much of it
+            if session is not None and answer:
+                self.sessions.add_turn(session, question, "".join(answer))
+
+        ####################### 8. Cache complete, grounded answers #######################
+        if namespace is not None and docs and answer:
+            self.response_cache.store(namespace, embedding, "".join(answer))
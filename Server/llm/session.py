@@ -0,0 +1,219 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from llm.context import ContextStats
+from llm.tokens import text_tokens
+
+# Tokens the chat format adds around every message (role, separators)
+MESSAGE_OVERHEAD = 4
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Tokens a message with this content adds to a prompt."""
+    return text_tokens(text, model) + MESSAGE_OVERHEAD
+
+
+@dataclass
+class Turn:
+    role: str  # "user" or "assistant"
+    content: str
+    tokens: int
+
+    def message(self) -> BaseMessage:
+        return HumanMessage(content=self.content) if self.role == "user" else AIMessage(content=self.content)
+
+
+@dataclass
+class Session:
+    id: str
+    turns: List[Turn] = field(default_factory=list)
+    summary: str = ""
+    summary_tokens: int = 0
+    last_seen: float = field(default_factory=time.monotonic)
+    summarizing: Optional[asyncio.Task] = None
+    # knowledge base the session is routed to (None: the server's default index)
+    index_name: Optional[str] = None
+    namespace: Optional[str] = None
+    # context packed into the latest turn's prompt
+    context: Optional[ContextStats] = None
+
+    @property
+    def history_tokens(self) -> int:
+        return sum(turn.tokens for turn in self.turns)
+
+
+# (previous summary, turns to fold in, token limit) -> new summary
+Summarizer = Callable[[str, List[Turn], int], Awaitable[str]]
+
+
+def parse_client_history(chat_history: List[str], question: Optional[str] = None) -> List[tuple]:
+    """
+    Client history entries look like "user: ..." / "ai: ..."; returns (role, content).
+    Clients may send the current `question` as the last entry; it is not a previous turn.
+    """
+    turns = []
+    for entry in chat_history or []:
+        if not isinstance(entry, str) or not entry.strip():
+            continue
+        sender, sep, text = entry.partition(":")
+        if sep and sender.strip().lower() in ("user", "human"):
+            turns.append(("user", text.strip()))
+        elif sep and sender.strip().lower() in ("ai", "assistant", "bot"):
+            turns.append(("assistant", text.strip()))
+        else:
+            turns.append(("user", entry.strip()))
+    if question and turns and turns[-1] == ("user", question.strip()):
+        turns.pop()
+    return turns
+
+
+class SessionStore:
+    """
+    Server-side conversation history, keyed by session ID.
+
+    - every turn is token-counted once, when it is added
+    - the prompt gets the rolling summary plus the newest turns that fit in
+      `history_tokens`, so its size stays bounded however long the conversation runs
+    - once the stored turns exceed the budget, the oldest ones are folded into the
+      summary by a background task; turns keep being served (within the budget)
+      while it runs, so summarization never delays a response
+    - sessions expire after `ttl` seconds of inactivity and the least recently used
+      session is evicted beyond `max_sessions`
+    """
+
+    def __init__(
+        self,
+        summarizer: Summarizer,
+        history_tokens: int = 1500,
+        summary_tokens: int = 400,
+        ttl: float = 3600,
+        max_sessions: int = 10000,
+        model: str = "gpt-4o",
+    ):
+        self.summarizer = summarizer
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.model = model
+        self.summaries = 0
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_seen <= self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            self._drop(session.id)
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id, None)
+        if session is not None and session.summarizing is not None:
+            session.summarizing.cancel()
+
+    def get(self, session_id: Optional[str] = None, chat_history: List[str] = None, question: Optional[str] = None) -> Session:
+        """
+        The session for `session_id`, created if unknown (or if no ID is given). A new
+        session is seeded from the client's history so context survives a server restart.
+        """
+        self._expire()
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None:
+            session = self.transient(chat_history, question)
+            session.id = session_id or uuid.uuid4().hex
+            self._sessions[session.id] = session
+            self._maybe_summarize(session)
+        self._sessions.move_to_end(session.id)
+        session.last_seen = time.monotonic()
+        return session
+
+    def drop(self, session_id: str):
+        self._drop(session_id)
+
+    def transient(self, chat_history: List[str] = None, question: Optional[str] = None) -> Session:
+        """An unstored session seeded from client history, for callers without a session ID."""
+        session = Session(id="")
+        for role, content in parse_client_history(chat_history, question):
+            self._append(session, role, content)
+        return session
+
+    def _append(self, session: Session, role: str, content: str):
+        if content:
+            session.turns.append(Turn(role, content, count_tokens(content, self.model)))
+
+    def add_turn(self, session: Session, question: str, answer: str):
+        self._append(session, "user", question)
+        self._append(session, "assistant", answer)
+        session.last_seen = time.monotonic()
+        self._maybe_summarize(session)
+
+    def messages(self, session: Session) -> List[BaseMessage]:
+        """Summary plus the newest turns that fit in the history budget, oldest first."""
+        budget = self.history_tokens
+        recent = []
+        for turn in reversed(session.turns):
+            if turn.tokens > budget:
+                break
+            budget -= turn.tokens
+            recent.append(turn.message())
+        recent.reverse()
+        if session.summary:
+            recent.insert(0, SystemMessage(content=f"Summary of the earlier conversation:\n{session.summary}"))
+        return recent
+
+    ################################################
+    ##              SUMMARIZATION
+    ################################################
+
+    def _maybe_summarize(self, session: Session):
+        if session.summarizing is not None or session.history_tokens <= self.history_tokens:
+            return
+        try:
+            session.summarizing = asyncio.get_running_loop().create_task(self._summarize(session))
+        except RuntimeError:
+            pass  # no event loop (e.g. a script); the budget still bounds the prompt
+
+    async def _summarize(self, session: Session):
+        """Fold the oldest turns into the summary until the rest fits in half the budget."""
+        try:
+            keep, kept = len(session.turns), 0
+            while keep > 0 and kept + session.turns[keep - 1].tokens <= self.history_tokens // 2:
+                keep -= 1
+                kept += session.turns[keep].tokens
+            # summarize whole exchanges, so the kept history starts with a question
+            while keep < len(session.turns) and session.turns[keep].role != "user":
+                keep += 1
+            folded = session.turns[:keep]
+            if not folded:
+                return
+            summary = await self.summarizer(session.summary, folded, self.summary_tokens)
+            # turns added meanwhile are appended after `folded`, so it is still the prefix
+            del session.turns[:len(folded)]
+            session.summary = summary.strip()
+            session.summary_tokens = count_tokens(session.summary, self.model)
+            self.summaries += 1
+            # catch up if the conversation outgrew the budget again meanwhile
+            session.summarizing = None
+            self._maybe_summarize(session)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error summarizing session {session.id}: {e}")
+        finally:
+            if session.summarizing is asyncio.current_task():
+                session.summarizing = None
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "summaries": self.summaries,
+            "history_tokens": self.history_tokens,
+            "summary_tokens": self.summary_tokens,
+        }
@@ -0,0 +1,38 @@
+from functools import lru_cache
+
+import tiktoken
+
+# Without the tokenizer files, one token is taken as this many characters
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def encoding(model: str):
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # the BPE file is downloaded on first use; without it fall back to an estimate
+        print(f"Tokenizer for '{model}' unavailable, estimating token counts: {e}")
+        return None
+
+
+def text_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Tokens in a piece of text."""
+    enc = encoding(model)
+    if enc is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> str:
+    """The longest prefix of `text` within `max_tokens`."""
+    if max_tokens <= 0:
+        return ""
+    enc = encoding(model)
+    if enc is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = enc.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else enc.decode(tokens[:max_tokens])
@@ -0,0 +1,210 @@
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+BANDS = 16  # 16 bands of 8 rows: pairs above ~0.7 Jaccard become candidates
+ROWS = NUM_PERM // BANDS
+MAX_BLOCK = 8192  # shingles hashed per matrix product (NUM_PERM x MAX_BLOCK uint64 = 8 MB)
+
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32
+_MASK = np.uint64(0xFFFFFFFF)
+# Fixed seed: signatures are persisted, so the permutations must be the same in every run
+_rng = np.random.RandomState(20240607)
+_A = _rng.randint(1, 4294967291, NUM_PERM, dtype=np.uint64)
+_B = _rng.randint(0, 4294967291, NUM_PERM, dtype=np.uint64)
+_SHINGLE_MIX = _rng.randint(1, 2**62, SHINGLE_WORDS, dtype=np.uint64) | np.uint64(1)
+_BAND_MIX = _rng.randint(1, 2**62, ROWS, dtype=np.uint64) | np.uint64(1)
+
+
+def shingles(text: str) -> np.ndarray:
+    """32-bit hashes of the text's overlapping word 3-grams (lower-cased, punctuation ignored)."""
+    words = _WORD.findall(text.lower()) or [""]
+    hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words), dtype=np.uint64, count=len(words))
+    if len(hashes) < SHINGLE_WORDS:
+        hashes = np.concatenate([hashes, np.zeros(SHINGLE_WORDS - len(hashes), dtype=np.uint64)])
+    # multiply-add of the window's word hashes; uint64 arithmetic wraps, which is fine for hashing
+    width = len(hashes) - SHINGLE_WORDS + 1
+    mixed = sum(hashes[i:i + width] * _SHINGLE_MIX[i] for i in range(SHINGLE_WORDS))
+    return np.unique((mixed ^ (mixed >> np.uint64(32))) & _MASK)
+
+
+def signatures(texts: List[str]) -> np.ndarray:
+    """MinHash signatures (len(texts) x NUM_PERM, uint32), many texts per vectorized block."""
+    sets = [shingles(text) for text in texts]
+    out = np.empty((len(sets), NUM_PERM), dtype=np.uint32)
+    start = 0
+    while start < len(sets):
+        end, size = start + 1, len(sets[start])
+        while end < len(sets) and size + len(sets[end]) <= MAX_BLOCK:
+            size += len(sets[end])
+            end += 1
+        block = np.concatenate(sets[start:end])
+        # (a * h + b) mod p for every permutation and shingle; a, b, h < 2**32 so nothing overflows
+        hashed = (_A[:, None] * block[None, :] + _B[:, None]) % _PRIME
+        offsets = np.cumsum([0] + [len(s) for s in sets[start:end - 1]])
+        out[start:end] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        start = end
+    return out
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """One 64-bit LSH bucket key per band of each signature."""
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    return (bands * _BAND_MIX).sum(axis=2)
+
+
+class NearDuplicateIndex:
+    """
+    MinHash/LSH index of the chunks stored in one vector index, used to skip chunks that
+    nearly duplicate stored ones (shared headers, footers, legal text) before they are embedded.
+
+    Signatures live in memory (buckets per LSH band, a matrix for verification) and in a
+    sqlite file, one row per chunk. Chunks accepted by `check` are matched against right away
+    (duplicates within a batch or page), but only written to disk by `commit` once they are
+    stored in the vector index. Accepted chunks that fail to be stored are dropped again by
+    `rollback` (and are gone after a restart in any case).
+    """
+
+    def __init__(self, path: str, threshold: float = 0.8):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS signatures (id TEXT PRIMARY KEY, signature BLOB)")
+        self._db.commit()
+
+        # row -> id (None once deleted); id -> row; band -> {bucket key: rows}
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix = np.empty((1024, NUM_PERM), dtype=np.uint32)
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(BANDS)]
+        self._pending: Dict[str, int] = {}
+
+        stored = self._db.execute("SELECT id, signature FROM signatures").fetchall()
+        if stored:
+            matrix = np.frombuffer(b"".join(blob for _, blob in stored), dtype=np.uint32).reshape(len(stored), NUM_PERM)
+            self._index([doc_id for doc_id, _ in stored], matrix)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _index(self, ids: List[str], matrix: np.ndarray) -> List[int]:
+        keys = band_keys(matrix)
+        needed = len(self._ids) + len(ids)
+        if needed > len(self._matrix):
+            grown = np.empty((max(needed, 2 * len(self._matrix)), NUM_PERM), dtype=np.uint32)
+            grown[:len(self._ids)] = self._matrix[:len(self._ids)]
+            self._matrix = grown
+        rows = []
+        for doc_id, signature, row_keys in zip(ids, matrix, keys):
+            row = len(self._ids)
+            self._ids.append(doc_id)
+            self._rows[doc_id] = row
+            self._matrix[row] = signature
+            for band, key in enumerate(row_keys.tolist()):
+                self._buckets[band].setdefault(key, []).append(row)
+            rows.append(row)
+        return rows
+
+    def _match(self, signature: np.ndarray, keys: np.ndarray) -> Optional[str]:
+        candidates = set()
+        for band, key in enumerate(keys.tolist()):
+            candidates.update(self._buckets[band].get(key, ()))
+        if not candidates:
+            return None
+        rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        # share of equal MinHash values estimates the Jaccard similarity of the shingle sets
+        similarity = (self._matrix[rows] == signature).mean(axis=1)
+        best = int(similarity.argmax())
+        return self._ids[rows[best]] if similarity[best] >= self.threshold else None
+
+    ################################################
+    ##              INGESTION
+    ################################################
+
+    def check(self, ids: List[str], texts: List[str]) -> List[Optional[str]]:
+        """
+        For every chunk, the ID of a stored (or earlier accepted) chunk it nearly duplicates,
+        or None. Chunks that are not duplicates are accepted and matched against from now on.
+        A chunk whose ID is already indexed is its own re-ingestion, not a duplicate.
+        """
+        matrix = signatures(texts)
+        keys = band_keys(matrix)
+        matches: List[Optional[str]] = []
+        with self._lock:
+            for i, doc_id in enumerate(ids):
+                match = None if doc_id in self._rows else self._match(matrix[i], keys[i])
+                if match is None and doc_id not in self._rows:
+                    (row,) = self._index([doc_id], matrix[i:i + 1])
+                    self._pending[doc_id] = row
+                matches.append(match)
+        return matches
+
+    def commit(self, ids: Iterable[str]):
+        """Persist accepted chunks once they are stored in the vector index."""
+        with self._lock:
+            rows = [(doc_id, self._matrix[self._pending.pop(doc_id)].tobytes()) for doc_id in ids if doc_id in self._pending]
+            if rows:
+                self._db.executemany("INSERT OR REPLACE INTO signatures (id, signature) VALUES (?, ?)", rows)
+                self._db.commit()
+
+    def add(self, ids: List[str], texts: List[str]):
+        """Index chunks that are already stored (backfill), without checking them."""
+        matrix = signatures(texts)
+        with self._lock:
+            fresh = [i for i, doc_id in enumerate(ids) if doc_id not in self._rows]
+            self._index([ids[i] for i in fresh], matrix[fresh])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO signatures (id, signature) VALUES (?, ?)",
+                [(ids[i], matrix[i].tobytes()) for i in fresh],
+            )
+            self._db.commit()
+
+    def rollback(self, ids: Iterable[str]):
+        """Forget accepted chunks that were never stored (their embedding or upsert failed)."""
+        with self._lock:
+            for doc_id in ids:
+                if doc_id in self._pending:
+                    self._unindex(doc_id)
+
+    def delete(self, ids: List[str]):
+        """Forget deleted chunks, so their duplicates are stored again on the next ingestion."""
+        with self._lock:
+            for doc_id in ids:
+                self._unindex(doc_id)
+            self._db.executemany("DELETE FROM signatures WHERE id = ?", [(doc_id,) for doc_id in ids])
+            self._db.commit()
+
+    def _unindex(self, doc_id: str):
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return
+        self._pending.pop(doc_id, None)
+        self._ids[row] = None
+        for band, key in enumerate(band_keys(self._matrix[row:row + 1])[0].tolist()):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.remove(row)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def stats(self) -> dict:
+        return {"chunks": len(self._rows), "pending": len(self._pending), "threshold": self.threshold}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def drop(path: str):
+        if os.path.exists(path):
+            os.remove(path)
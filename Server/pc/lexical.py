@@ -0,0 +1,236 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Words plus identifiers such as "sku-1042", "e_404" or "v2.3.1" kept as one token
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how",
+    "i", "in", "is", "it", "me", "my", "of", "on", "or", "the", "this", "to", "what", "when",
+    "where", "which", "who", "why", "with", "you", "your",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms; compound identifiers also yield their parts ("sku-1042" -> sku, 1042)."""
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[-_./]", token) if part and part not in STOPWORDS)
+    return terms
+
+
+def is_identifier(term: str) -> bool:
+    """
+    Codes, SKUs and versions ("sku-1042", "e404", "v2.1"): terms mixing letters and digits.
+    Plain or punctuated numbers (years, prices, dates, zip codes) are ordinary terms.
+    """
+    return any(c.isdigit() for c in term) and any(c.isalpha() for c in term)
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index kept next to a vector index.
+
+    Postings live in memory for sub-millisecond queries. On disk each chunk is one row in a
+    sqlite file (text, metadata and its zlib-compressed term counts), so updates are
+    incremental and the postings are rebuilt from the rows at load.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, text TEXT, metadata TEXT, terms BLOB)"
+        )
+        self._db.commit()
+
+        # doc number -> (id, length); id -> doc number; term -> {doc number: tf}
+        self._docs: Dict[int, Tuple[str, int]] = {}
+        self._numbers: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._total_length = 0
+        self._next = 0
+        for doc_id, blob in self._db.execute("SELECT id, terms FROM chunks"):
+            self._index(doc_id, json.loads(zlib.decompress(blob)))
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _index(self, doc_id: str, counts: Dict[str, int]):
+        number = self._next
+        self._next += 1
+        length = sum(counts.values())
+        self._docs[number] = (doc_id, length)
+        self._numbers[doc_id] = number
+        self._total_length += length
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[number] = tf
+
+    def _unindex(self, doc_id: str, counts: Dict[str, int]):
+        number = self._numbers.pop(doc_id, None)
+        if number is None:
+            return
+        _, length = self._docs.pop(number)
+        self._total_length -= length
+        for term in counts:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(number, None)
+                if not postings:
+                    del self._postings[term]
+
+    ################################################
+    ##              WRITES
+    ################################################
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[dict]):
+        """Insert or replace chunks."""
+        rows = []
+        with self._lock:
+            self._delete(ids)
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                counts = dict(Counter(tokenize(text)))
+                self._index(doc_id, counts)
+                rows.append((doc_id, text, json.dumps(metadata), zlib.compress(json.dumps(counts).encode("utf-8"))))
+            self._db.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)", rows)
+            self._db.commit()
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            self._delete(ids)
+
+    def _delete(self, ids: List[str]):
+        known = [doc_id for doc_id in ids if doc_id in self._numbers]
+        for start in range(0, len(known), 500):
+            batch = known[start:start + 500]
+            marks = ",".join("?" * len(batch))
+            for doc_id, blob in self._db.execute(f"SELECT id, terms FROM chunks WHERE id IN ({marks})", batch).fetchall():
+                self._unindex(doc_id, json.loads(zlib.decompress(blob)))
+            self._db.execute(f"DELETE FROM chunks WHERE id IN ({marks})", batch)
+        self._db.commit()
+
+    def texts(self, batch_size: int = 1000) -> Iterator[List[Tuple[str, str]]]:
+        """Stored (id, text) pairs in batches."""
+        with self._lock:
+            rows = self._db.execute("SELECT id, text FROM chunks").fetchall()
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def drop(path: str):
+        if os.path.exists(path):
+            os.remove(path)
+
+    ################################################
+    ##              SEARCH
+    ################################################
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[str, float]]:
+        """Top-k (id, BM25 score)."""
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._docs)
+            if not count or not terms:
+                return []
+            average = self._total_length / count
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for number, tf in postings.items():
+                    length = self._docs[number][1]
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / average)
+                    scores[number] = scores.get(number, 0.0) + idf * tf * (self.k1 + 1) / norm
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [(self._docs[number][0], score) for number, score in top]
+
+    def coverage(self, query: str, ids: List[str]) -> Dict[str, float]:
+        """
+        Share of the query's IDF weight each chunk contains (0-1), a BM25 relevance that does
+        not depend on the corpus or the query length: a chunk sharing one common term with a
+        long question scores low, one holding all its rare terms close to 1.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._docs)
+            if not count or not terms:
+                return {doc_id: 0.0 for doc_id in ids}
+            weights = {}
+            for term in terms:
+                postings = self._postings.get(term, {})
+                weights[term] = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            total = sum(weights.values())
+            result = {}
+            for doc_id in ids:
+                number = self._numbers.get(doc_id)
+                matched = sum(w for term, w in weights.items() if number in self._postings.get(term, {}))
+                result[doc_id] = matched / total if number is not None and total else 0.0
+            return result
+
+    def contains(self, doc_id: str, terms: List[str]) -> bool:
+        number = self._numbers.get(doc_id)
+        return number is not None and all(number in self._postings.get(term, {}) for term in terms)
+
+    def documents(self, ids: List[str]) -> List[Document]:
+        if not ids:
+            return []
+        with self._lock:
+            marks = ",".join("?" * len(ids))
+            rows = {
+                row[0]: row for row in
+                self._db.execute(f"SELECT id, text, metadata FROM chunks WHERE id IN ({marks})", ids)
+            }
+        return [
+            Document(id=doc_id, page_content=rows[doc_id][1], metadata=json.loads(rows[doc_id][2]))
+            for doc_id in ids if doc_id in rows
+        ]
+
+    def confident_hit(self, query: str, hits: List[Tuple[str, float]], margin: float) -> Optional[str]:
+        """
+        The top hit's id if the query names identifiers (codes, SKUs, versions), the top hit
+        contains all of them and it outscores the runner-up by `margin`; else None.
+        """
+        identifiers = [term for term in set(tokenize(query)) if is_identifier(term)]
+        if not identifiers or not hits:
+            return None
+        top_id, top_score = hits[0]
+        if not self.contains(top_id, identifiers):
+            return None
+        if len(hits) > 1 and top_score < margin * hits[1][1]:
+            return None
+        return top_id
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int = 60, limit: int = 4) -> List[Document]:
+    """Merge ranked lists; a document scores sum(1 / (k + rank)) over the lists it appears in."""
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = doc.id or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            documents.setdefault(key, doc)
+    ordered = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [documents[key] for key in ordered]
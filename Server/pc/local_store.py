@@ -0,0 +1,306 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector index, a drop-in for PineconeVectorStore.
+
+    Layout of an index directory:
+        vectors.f32   raw float32 rows (L2-normalized), memory-mapped for search
+        docs.jsonl    one record per row: id, text, metadata (deletes are tombstones)
+
+    Search modes:
+        flat  exact cosine search over every row
+        ivf   k-means inverted file: only the `nprobe` closest clusters are scanned
+        auto  flat below `ivf_threshold` rows, ivf above
+    """
+
+    def __init__(
+        self,
+        path: str,
+        embedding: Embeddings,
+        mode: str = "auto",
+        nprobe: int = 8,
+        ivf_threshold: int = 20_000,
+    ):
+        if mode not in ("flat", "ivf", "auto"):
+            raise ValueError(f"Unknown local index mode: {mode}")
+        self.path = path
+        self.embedding = embedding
+        self.mode = mode
+        self.nprobe = nprobe
+        self.ivf_threshold = ivf_threshold
+
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._row_of: dict = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._dim: Optional[int] = None
+        self._matrix: Optional[np.ndarray] = None
+        # IVF state, rebuilt lazily when the index has grown enough
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._trained_rows = 0
+
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    ################################################
+    ##              PERSISTENCE
+    ################################################
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.f32")
+
+    @property
+    def _docs_path(self) -> str:
+        return os.path.join(self.path, "docs.jsonl")
+
+    def _load(self):
+        if not os.path.exists(self._docs_path):
+            return
+        alive = []
+        with open(self._docs_path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("deleted"):
+                    row = self._row_of.pop(record["id"], None)
+                    if row is not None:
+                        alive[row] = False
+                    continue
+                self._row_of[record["id"]] = len(self._ids)
+                self._ids.append(record["id"])
+                self._texts.append(record["text"])
+                self._metadatas.append(record.get("metadata") or {})
+                alive.append(True)
+                self._dim = record.get("dim", self._dim)
+        self._alive = np.asarray(alive, dtype=bool)
+        self._remap()
+
+    def _remap(self):
+        rows = len(self._ids)
+        if rows == 0 or self._dim is None:
+            self._matrix = None
+            return
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim))
+
+    @staticmethod
+    def drop(path: str):
+        shutil.rmtree(path, ignore_errors=True)
+
+    ################################################
+    ##              WRITES
+    ################################################
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_vectors(texts, vectors, metadatas, ids)
+
+    def add_vectors(
+        self,
+        texts: List[str],
+        vectors: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = matrix.shape[1]
+            elif matrix.shape[1] != self._dim:
+                raise ValueError(f"Expected vectors of dimension {self._dim}, got {matrix.shape[1]}")
+
+            # Upserts: tombstone the previous row of a reused id
+            replaced = [i for i in ids if i in self._row_of]
+            if replaced:
+                self.delete(replaced)
+
+            with open(self._vectors_path, "ab") as f:
+                f.write(matrix.tobytes())
+            with open(self._docs_path, "a", encoding="utf-8") as f:
+                for doc_id, text, metadata in zip(ids, texts, metadatas):
+                    f.write(json.dumps({"id": doc_id, "text": text, "metadata": metadata, "dim": self._dim}) + "\n")
+
+            start = len(self._ids)
+            for offset, (doc_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+                self._row_of[doc_id] = start + offset
+                self._ids.append(doc_id)
+                self._texts.append(text)
+                self._metadatas.append(metadata)
+            self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            self._remap()
+            if self._centroids is not None:
+                self._assign(np.arange(start, len(self._ids)))
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        with self._lock:
+            with open(self._docs_path, "a", encoding="utf-8") as f:
+                for doc_id in ids:
+                    row = self._row_of.pop(doc_id, None)
+                    if row is None:
+                        continue
+                    self._alive[row] = False
+                    f.write(json.dumps({"id": doc_id, "deleted": True}) + "\n")
+        return True
+
+    ################################################
+    ##              IVF INDEX
+    ################################################
+
+    def _use_ivf(self) -> bool:
+        if self.mode == "flat":
+            return False
+        if self.mode == "ivf":
+            return True
+        return int(self._alive.sum()) >= self.ivf_threshold
+
+    def _train(self, iterations: int = 10, seed: int = 0):
+        rows = np.flatnonzero(self._alive)
+        nlist = max(1, int(np.sqrt(len(rows))))
+        rng = np.random.default_rng(seed)
+        sample = self._matrix[rng.choice(rows, size=min(len(rows), nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assignment == c]
+                if len(members):
+                    mean = members.mean(axis=0)
+                    centroids[c] = mean / (np.linalg.norm(mean) or 1)
+        self._centroids = centroids
+        self._lists = [np.zeros(0, dtype=np.int64) for _ in range(nlist)]
+        self._assign(rows)
+        self._trained_rows = len(rows)
+
+    def _assign(self, rows: np.ndarray):
+        for start in range(0, len(rows), 65_536):
+            batch = rows[start:start + 65_536]
+            assignment = np.argmax(self._matrix[batch] @ self._centroids.T, axis=1)
+            for c in np.unique(assignment):
+                self._lists[c] = np.concatenate([self._lists[c], batch[assignment == c]])
+
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """Rows to scan for this query, or None for an exact scan over everything."""
+        if not self._use_ivf():
+            return None
+        live = int(self._alive.sum())
+        if self._centroids is None or live > 2 * self._trained_rows:
+            self._train()
+        probe = min(self.nprobe, len(self._centroids))
+        nearest = np.argpartition(-(self._centroids @ query), probe - 1)[:probe]
+        rows = np.concatenate([self._lists[c] for c in nearest])
+        return rows[self._alive[rows]]
+
+    ################################################
+    ##              SEARCH
+    ################################################
+
+    def _top(self, embedding: List[float], k: int, filter: Optional[dict]) -> List[Tuple[int, float]]:
+        """(row, cosine score) of the k best live rows; call with the lock held."""
+        if self._matrix is None or not self._alive.any():
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+
+        rows = self._candidates(query)
+        if rows is None:
+            scores = self._matrix @ query
+            scores[~self._alive] = -np.inf
+            rows = np.arange(len(scores))
+        else:
+            scores = self._matrix[rows] @ query
+
+        if filter:
+            keep = np.array(
+                [all(self._metadatas[r].get(key) == value for key, value in filter.items()) for r in rows],
+                dtype=bool,
+            )
+            scores = np.where(keep, scores, -np.inf)
+
+        top = min(k, len(scores))
+        if top == 0:
+            return []
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [(int(rows[i]), float(scores[i])) for i in best if np.isfinite(scores[i])]
+
+    def _document(self, row: int) -> Document:
+        return Document(id=self._ids[row], page_content=self._texts[row], metadata=self._metadatas[row])
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None
+    ) -> List[Tuple[Document, float]]:
+        with self._lock:
+            return [(self._document(row), score) for row, score in self._top(embedding, k, filter)]
+
+    def similarity_search_with_vectors_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None
+    ) -> List[Tuple[Document, float, np.ndarray]]:
+        """Like similarity_search_with_score_by_vector, plus each hit's stored (normalized) vector."""
+        with self._lock:
+            return [
+                (self._document(row), score, np.array(self._matrix[row]))
+                for row, score in self._top(embedding, k, filter)
+            ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, kwargs.get("filter"))]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, kwargs.get("filter"))
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1) / 2
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        path: str = ".cache/local_index/default",
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(path, embedding, **kwargs)
+        store.add_texts(texts, metadatas)
+        return store
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
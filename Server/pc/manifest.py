@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(source_url: str, chunk_hash: str) -> str:
+    """Deterministic vector ID: the same chunk of the same page always maps to the same vector."""
+    return hashlib.sha256(f"{source_url}#{chunk_hash}".encode("utf-8")).hexdigest()
+
+
+class IngestManifest:
+    """
+    Local record of what has been ingested into each index, per source URL:
+    the HTTP validators (ETag / Last-Modified) of the last fetch, the links the page
+    contained and the IDs of the vectors currently stored for it.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " index_name TEXT NOT NULL, url TEXT NOT NULL,"
+            " etag TEXT, last_modified TEXT, links TEXT, chunk_ids TEXT,"
+            " PRIMARY KEY (index_name, url))"
+        )
+        self._conn.commit()
+
+    def _get(self, index_name: str, url: str, column: str):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {column} FROM pages WHERE index_name = ? AND url = ?", (index_name, url)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _upsert(self, index_name: str, url: str, **columns):
+        names = ", ".join(columns)
+        updates = ", ".join(f"{name} = excluded.{name}" for name in columns)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO pages (index_name, url, {names}) VALUES (?, ?{', ?' * len(columns)})"
+                f" ON CONFLICT (index_name, url) DO UPDATE SET {updates}",
+                (index_name, url, *columns.values()),
+            )
+            self._conn.commit()
+
+    ############## CRAWL STATE ##############
+
+    def conditional_headers(self, index_name: str, url: str) -> Dict[str, str]:
+        """Headers for a conditional GET, only if the page's chunks are already stored."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, chunk_ids FROM pages WHERE index_name = ? AND url = ?",
+                (index_name, url),
+            ).fetchone()
+        if not row or row[2] is None:
+            return {}
+        headers = {}
+        if row[0]:
+            headers["If-None-Match"] = row[0]
+        if row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def links(self, index_name: str, url: str) -> List[str]:
+        links = self._get(index_name, url, "links")
+        return json.loads(links) if links else []
+
+    def set_links(self, index_name: str, url: str, links: List[str]):
+        self._upsert(index_name, url, links=json.dumps(links))
+
+    ############## INGESTED CHUNKS ##############
+
+    def chunk_ids(self, index_name: str, url: str) -> List[str]:
+        ids = self._get(index_name, url, "chunk_ids")
+        return json.loads(ids) if ids else []
+
+    def set_chunks(
+        self, index_name: str, url: str, ids: List[str],
+        etag: Optional[str] = None, last_modified: Optional[str] = None,
+    ):
+        self._upsert(index_name, url, chunk_ids=json.dumps(ids), etag=etag, last_modified=last_modified)
+
+    def forget(self, index_name: str, url: str = None):
+        """Drop one page, or a whole index, from the manifest."""
+        with self._lock:
+            if url is None:
+                self._conn.execute("DELETE FROM pages WHERE index_name = ?", (index_name,))
+            else:
+                self._conn.execute("DELETE FROM pages WHERE index_name = ? AND url = ?", (index_name, url))
+            self._conn.commit()
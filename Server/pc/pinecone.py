@@ -1,11 +1,28 @@
-from typing import List
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
 from langchain_core.documents import Document
 from langchain_openai import OpenAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone, ServerlessSpec
+from pinecone import ServerlessSpec
 from config import CONFIG
+from pc.embedding_cache import CachedEmbeddings, EmbeddingCache
+from pc.dedup import NearDuplicateIndex
+from pc.lexical import LexicalIndex
+from pc.local_store import LocalVectorStore
+from pc.manifest import IngestManifest, chunk_id, content_hash
+from utils.clients import CLIENTS
+from utils.ingestion.chunker import chunk_records
 
+# Bounded pool for blocking vectorstore calls so retrieval never runs on the event loop
+_search_executor = ThreadPoolExecutor(
+    max_workers=CONFIG.RETRIEVAL_WORKERS, thread_name_prefix="pc-search"
+)
 
 class PineconeClient:
     _instance = None
@@ -17,6 +34,8 @@ class PineconeClient:
     index_name = None
     embeddings = None
     vectorstore = None
+    backend = None  # "pinecone" or "local"
+    manifest = None
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -29,39 +48,300 @@ class PineconeClient:
         print("------------------------- Pinecone Initialized ----------------------")
         self.openai_api_key = CONFIG.OPENAI_API_KEY
         self.pinecone_api_key = CONFIG.PINECONE_API_KEY
-        self.pc = Pinecone(self.pinecone_api_key)
+        self.backend = CONFIG.VECTOR_BACKEND
+        if self.backend == "pinecone":
+            self.pc = CLIENTS.pinecone
+        elif self.backend != "local":
+            raise ValueError(f"Unknown VECTOR_BACKEND '{self.backend}', expected 'pinecone' or 'local'")
         self.index_name = index_name
-        self.embeddings = OpenAIEmbeddings(openai_api_key=self.openai_api_key)  
-        self._create_index_if_not_exists()
-        self.vectorstore = PineconeVectorStore.from_existing_index(
-            index_name=self.index_name, 
-            embedding=self.embeddings
+        self.embeddings = CachedEmbeddings(
+            OpenAIEmbeddings(
+                openai_api_key=self.openai_api_key,
+                openai_api_base=CONFIG.OPENAI_BASE_URL,
+                # chunks are far below the model's input limit, so skip tokenizing them client-side
+                check_embedding_ctx_length=False,
+                http_client=CLIENTS.openai_sync,
+                http_async_client=CLIENTS.openai_async,
+            ),
+            EmbeddingCache(CONFIG.EMBEDDING_CACHE_PATH, CONFIG.EMBEDDING_CACHE_SIZE),
         )
+        self.manifest = IngestManifest(CONFIG.INGEST_MANIFEST_PATH)
+        # Per-index state, so requests can be routed to any index without touching the default
+        self._pool_lock = threading.Lock()
+        self._handles: "OrderedDict[Tuple[str, Optional[str]], object]" = OrderedDict()
+        self._lexical: "OrderedDict[Tuple[str, Optional[str]], LexicalIndex]" = OrderedDict()
+        self._dedup: Dict[str, NearDuplicateIndex] = {}
+        self._dedup_lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._catalog: Optional[Set[str]] = None
+        self._catalog_at = 0.0
+        self._create_index_if_not_exists()
+        self.vectorstore = self.get_vectorstore()
         self.__class__._initialized = True
 
-    def _create_index_if_not_exists(self, dimension: int = 1536, metric: str = "cosine"):
+    ################################################
+    ##              INDEX CATALOG & HANDLE POOL
+    ################################################
+
+    @property
+    def data_version(self) -> int:
+        """Version of the default index; bumped whenever its answerable content changes."""
+        return self._versions.get(self.index_name, 0)
+
+    @data_version.setter
+    def data_version(self, value: int):
+        self._versions[self.index_name] = value
+
+    def version_of(self, index_name: Optional[str] = None) -> int:
+        return self._versions.get(index_name or self.index_name, 0)
+
+    def bump_version(self, index_name: Optional[str] = None):
+        """Mark an index's answerable content as changed (invalidates its cached answers)."""
+        index_name = index_name or self.index_name
+        self._versions[index_name] = self._versions.get(index_name, 0) + 1
+
+    def _local_index_path(self, index_name: Optional[str] = None, namespace: Optional[str] = None) -> str:
+        path = os.path.join(CONFIG.LOCAL_INDEX_DIR, index_name or self.index_name)
+        return os.path.join(path, "namespaces", namespace) if namespace else path
+
+    def _open_vectorstore(self, index_name: Optional[str] = None, namespace: Optional[str] = None):
+        """Vectorstore handle for an index (and namespace) on the configured backend."""
+        index_name = index_name or self.index_name
+        if self.backend == "local":
+            return LocalVectorStore(
+                self._local_index_path(index_name, namespace),
+                self.embeddings,
+                mode=CONFIG.LOCAL_INDEX_MODE,
+                nprobe=CONFIG.LOCAL_INDEX_NPROBE,
+            )
+        return PineconeVectorStore(
+            index=CLIENTS.pinecone_index(index_name), embedding=self.embeddings, namespace=namespace
+        )
+
+    def _index_names(self, refresh: bool = False) -> Set[str]:
+        """Cached catalog of existing indexes; Pinecone is asked at most once per TTL."""
+        if self.backend == "local":
+            if not os.path.isdir(CONFIG.LOCAL_INDEX_DIR):
+                return set()
+            return {name for name in os.listdir(CONFIG.LOCAL_INDEX_DIR)
+                    if os.path.isdir(os.path.join(CONFIG.LOCAL_INDEX_DIR, name))}
+        if refresh or self._catalog is None or time.monotonic() - self._catalog_at > CONFIG.INDEX_CATALOG_TTL:
+            self._catalog = set(self.pc.list_indexes().names())
+            self._catalog_at = time.monotonic()
+        return self._catalog
+
+    def has_index(self, index_name: str) -> bool:
+        if index_name in self._index_names():
+            return True
+        # indexes created elsewhere show up after a refresh; misses refresh at most every few seconds
+        if self.backend != "local" and time.monotonic() - self._catalog_at > 5:
+            return index_name in self._index_names(refresh=True)
+        return False
+
+    def list_indexes(self) -> List[str]:
+        return sorted(self._index_names())
+
+    def get_vectorstore(self, index_name: Optional[str] = None, namespace: Optional[str] = None):
+        """
+        Ready vectorstore for an index (default: the current one), from an LRU pool of open
+        handles. Opening may do network I/O on Pinecone, so call it off the event loop.
+        """
+        key = (index_name or self.index_name, namespace or None)
+        if key == (self.index_name, None) and self.vectorstore is not None:
+            return self.vectorstore  # the default handle is the one ingestion writes through
+        with self._pool_lock:
+            handle = self._handles.get(key)
+            if handle is not None:
+                self._handles.move_to_end(key)
+                return handle
+        if key[0] != self.index_name and not self.has_index(key[0]):
+            raise KeyError(f"Index '{key[0]}' does not exist")
+        handle = self._open_vectorstore(*key)
+        with self._pool_lock:
+            handle = self._handles.setdefault(key, handle)
+            self._handles.move_to_end(key)
+            while len(self._handles) > max(CONFIG.INDEX_POOL_SIZE, 1):
+                (evicted, _), _ = self._handles.popitem(last=False)
+                # the default index stays referenced by self.vectorstore; keep its client
+                if evicted != self.index_name and all(name != evicted for name, _ in self._handles):
+                    CLIENTS.forget_index(evicted)
+        return handle
+
+    def _forget_handles(self, index_name: str):
+        with self._pool_lock:
+            for key in [key for key in self._handles if key[0] == index_name]:
+                del self._handles[key]
+            for key in [key for key in self._lexical if key[0] == index_name]:
+                self._lexical.pop(key).close()
+        with self._dedup_lock:
+            dedup = self._dedup.pop(index_name, None)
+        if dedup is not None:
+            dedup.close()
+        NearDuplicateIndex.drop(self._dedup_path(index_name))
+        CLIENTS.forget_index(index_name)
+        if os.path.isdir(CONFIG.LEXICAL_INDEX_DIR):
+            for name in os.listdir(CONFIG.LEXICAL_INDEX_DIR):
+                if name == f"{index_name}.sqlite" or name.startswith(f"{index_name}--"):
+                    LexicalIndex.drop(os.path.join(CONFIG.LEXICAL_INDEX_DIR, name))
+
+    ################################################
+    ##              LEXICAL (BM25) INDEX
+    ################################################
+
+    def _lexical_path(self, index_name: str, namespace: Optional[str]) -> str:
+        name = f"{index_name}--{namespace}" if namespace else index_name
+        return os.path.join(CONFIG.LEXICAL_INDEX_DIR, f"{name}.sqlite")
+
+    def get_lexical(self, index_name: Optional[str] = None, namespace: Optional[str] = None) -> LexicalIndex:
+        """BM25 index kept alongside a vector index, from the same LRU pool policy."""
+        key = (index_name or self.index_name, namespace or None)
+        with self._pool_lock:
+            lexical = self._lexical.get(key)
+            if lexical is None:
+                lexical = self._lexical[key] = LexicalIndex(self._lexical_path(*key))
+            self._lexical.move_to_end(key)
+            # evicted indexes are closed when garbage collected, after any search using them
+            while len(self._lexical) > max(CONFIG.INDEX_POOL_SIZE, 1):
+                self._lexical.popitem(last=False)
+            return lexical
+
+    def _lexical_add(self, documents: List[Document], ids: List[str], index_name: Optional[str] = None):
+        if CONFIG.HYBRID_SEARCH_ENABLED and documents:
+            self.get_lexical(index_name).add(ids, [doc.page_content for doc in documents], [doc.metadata for doc in documents])
+
+    def delete_ids(self, ids: List[str], index_name: Optional[str] = None):
+        """Delete chunks from the vector index, its lexical index and its near-duplicate index."""
+        if not ids:
+            return
+        self.get_vectorstore(index_name).delete(ids=ids)
+        if CONFIG.HYBRID_SEARCH_ENABLED:
+            self.get_lexical(index_name).delete(ids)
+        if CONFIG.DEDUP_ENABLED:
+            self.get_dedup(index_name).delete(ids)
+
+    ################################################
+    ##              NEAR-DUPLICATES
+    ################################################
+
+    def _dedup_path(self, index_name: str) -> str:
+        return os.path.join(CONFIG.DEDUP_INDEX_DIR, f"{index_name}.sqlite")
+
+    def get_dedup(self, index_name: Optional[str] = None) -> NearDuplicateIndex:
+        """
+        Near-duplicate index of an index's chunks. An index ingested before it existed is
+        backfilled from its lexical index, so earlier data counts too.
+        """
+        index_name = index_name or self.index_name
+        with self._dedup_lock:  # held through a backfill, so no ingestion sees a partial index
+            dedup = self._dedup.get(index_name)
+            if dedup is not None:
+                return dedup
+            dedup = self._dedup[index_name] = NearDuplicateIndex(self._dedup_path(index_name), CONFIG.DEDUP_THRESHOLD)
+            if len(dedup) == 0 and CONFIG.HYBRID_SEARCH_ENABLED:
+                for rows in self.get_lexical(index_name).texts():
+                    dedup.add([doc_id for doc_id, _ in rows], [text for _, text in rows])
+            return dedup
+
+    def drop_near_duplicates(
+        self, documents: List[Document], ids: List[str], index_name: Optional[str] = None
+    ) -> Tuple[List[Document], List[str], List[str]]:
+        """The documents (and IDs) worth embedding, and the IDs of those nearly duplicating stored chunks."""
+        if not CONFIG.DEDUP_ENABLED or not documents:
+            return documents, ids, []
+        matches = self.get_dedup(index_name).check(ids, [doc.page_content for doc in documents])
+        kept, kept_ids, duplicates = [], [], []
+        for document, doc_id, match in zip(documents, ids, matches):
+            if match is None:
+                kept.append(document)
+                kept_ids.append(doc_id)
+            else:
+                duplicates.append(doc_id)
+        return kept, kept_ids, duplicates
+
+    def _stored(self, ids: List[str], index_name: Optional[str] = None):
+        if CONFIG.DEDUP_ENABLED and ids:
+            self.get_dedup(index_name).commit(ids)
+
+    def unstored(self, ids: Iterable[str], index_name: Optional[str] = None):
+        """Release chunks accepted by `drop_near_duplicates` that were never stored (failed or cancelled)."""
+        if CONFIG.DEDUP_ENABLED:
+            self.get_dedup(index_name).rollback(ids)
+
+    def lexical_search(
+        self, query: str, k: int = 4, index_name: Optional[str] = None, namespace: Optional[str] = None
+    ) -> Tuple[List[Document], bool]:
+        """
+        BM25 top-k and whether the top hit is a confident identifier match. Each document's
+        metadata carries the share of the query it matches as "lexical_score" (see `coverage`).
+        """
+        lexical = self.get_lexical(index_name, namespace)
+        hits = lexical.search(query, k=k)
+        confident = lexical.confident_hit(query, hits, CONFIG.LEXICAL_FAST_PATH_MARGIN) is not None
+        ids = [doc_id for doc_id, _ in hits]
+        coverage = lexical.coverage(query, ids)
+        documents = lexical.documents(ids)
+        for doc in documents:
+            doc.metadata["lexical_score"] = coverage[doc.id]
+        return documents, confident
+
+    async def alexical_search(
+        self, query: str, k: int = 4, index_name: Optional[str] = None, namespace: Optional[str] = None
+    ) -> Tuple[List[Document], bool]:
+        if not CONFIG.HYBRID_SEARCH_ENABLED:
+            return [], False
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                _search_executor, self.lexical_search, query, k, index_name, namespace
+            )
+        except Exception as e:
+            print(f"Pinecone : lexical search failed on '{index_name or self.index_name}': {e}")
+            return [], False
+
+    def _has_index(self, index_name: Optional[str] = None) -> bool:
+        index_name = index_name or self.index_name
+        if self.backend == "local":
+            return os.path.isdir(self._local_index_path(index_name))
+        return self.has_index(index_name)
+
+    def _create_index_if_not_exists(self, index_name: Optional[str] = None, dimension: int = 1536, metric: str = "cosine"):
         """Private method to create a vector index if it doesn't exist."""
-        # Using .list_indexes().names() is more efficient than .has_index()
+        index_name = index_name or self.index_name
+        # The cached catalog avoids a list_indexes call per switch
+        if self.backend == "local":
+            if self._has_index(index_name):
+                return False
+            os.makedirs(self._local_index_path(index_name), exist_ok=True)
+            print(f"Local index '{index_name}' created successfully.")
+            return True
 
-        if self.index_name not in self.pc.list_indexes().names():
-            print(f"Creating index '{self.index_name}'...")
+        if not self.has_index(index_name):
+            print(f"Creating index '{index_name}'...")
             self.pc.create_index(
-                name=self.index_name,
+                name=index_name,
                 dimension=dimension,
                 metric=metric,
                 spec=ServerlessSpec(cloud="aws", region="us-east-1"),
             )
-            print(f"Index '{self.index_name}' created successfully.")
+            self._index_names().add(index_name)
+            print(f"Index '{index_name}' created successfully.")
             return True
         else:
-            print(f"Index '{self.index_name}' already exists. Skipping creation.")
+            print(f"Index '{index_name}' already exists. Skipping creation.")
             return False
 
     def delete_index(self) -> bool:
         """Delete the vector index"""
-        if self.pc.has_index(self.index_name):
+        if self._has_index():
             print(f"Deleting index '{self.index_name}'...")
-            self.pc.delete_index(self.index_name)
+            self._forget_handles(self.index_name)
+            if self.backend == "local":
+                LocalVectorStore.drop(self._local_index_path())
+            else:
+                self.pc.delete_index(self.index_name)
+                self._index_names().discard(self.index_name)
+            self.manifest.forget(self.index_name)
+            self.data_version += 1
             print(f"Pinecone : Index '{self.index_name}' deleted successfully.")
             return True
         else:
@@ -70,42 +350,150 @@ class PineconeClient:
             )
             return False
 
-    def add_data_to_index(self, text_array: List[str]) -> bool:
-        """Add text data to the vector index"""
-        if self.pc.has_index(self.index_name):
-            concatenated_text = "".join(text.replace("\n", "") for text in text_array)
-            docs_array = [Document(page_content=concatenated_text)]
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000, chunk_overlap=100
-            )
-            docs = text_splitter.split_documents(documents=docs_array)
-            if self.vectorstore is not None:
-                self.vectorstore.add_documents(documents=docs)
-                return True
-            else:
-                print("Pinecone : Vector store not initialized. Cannot add documents.")
-                return False
+    def split_records(self, records: List[dict]) -> Tuple[List[Document], List[str]]:
+        """Chunk free-text records ({"text", optional "id" and "metadata"}), see `chunk_records`."""
+        return chunk_records(records)
 
-    def add_scrape_data(self, chunks: List[dict]):
-        documents = [
-            Document(
-                page_content=chunk["content"],
-                metadata={
-                    "source_url": chunk["source_url"],
-                    "chunk_index": chunk.get("chunk_index", i),
-                    "total_chunks": chunk.get("total_chunks", len(chunks)),
-                    "char_count": len(chunk["content"]),
-                },
-            )
-            for i, chunk in enumerate(chunks)
-        ]
+    async def add_data_to_index(self, text_array: List[str]) -> bool:
+        """
+        Add text data to the vector index, keeping every text as its own document. Runs the
+        ingestion pipeline's chunk/embed/upsert stages (batched, concurrent, retried, see
+        `IngestionPipeline.run_bulk`) and returns once every chunk is stored.
+        """
+        if self.vectorstore is None:
+            print("Pinecone : Vector store not initialized. Cannot add documents.")
+            return False
 
-        if self.vectorstore is not None:
-            self.vectorstore.add_documents(documents=documents)
-        else:
+        # imported here: the pipeline module is built on this client
+        from utils.ingestion.pipeline import IngestionJob, IngestionPipeline
+
+        # the whole call writes to the index it started on, even if the default is switched meanwhile
+        job = IngestionJob("add", {"texts": len(text_array), "index": self.index_name}, self.index_name)
+        await IngestionPipeline(self).run_bulk(job, [{"text": text} for text in text_array])
+        print(f"Pinecone : added texts to '{job.index_name}': {job.counters}")
+        return True
+
+    def plan_scrape_data(
+        self, chunks: List[dict], urls: Iterable[str] = (), index_name: Optional[str] = None
+    ) -> Tuple[List[Document], List[str], List[str], Dict[str, dict], int]:
+        """
+        Diff scraped chunks against the manifest.
+
+        Vector IDs are derived from (source_url, chunk content). Returns the documents not
+        stored yet with their IDs, the IDs of chunks no longer on their page, the manifest
+        entry to commit for every page once its documents are stored, and how many new chunks
+        were skipped as near-duplicates of stored ones. Skipped chunks are left out of their
+        page's entry, so they are checked again (and stored if the original is gone) next time.
+        `urls` are the pages crawled; one that yields no chunks any more has all of its
+        previous chunks marked stale.
+        """
+        index_name = index_name or self.index_name
+        pages = {url: [] for url in urls}
+        for i, chunk in enumerate(chunks):
+            pages.setdefault(chunk["source_url"], []).append((i, chunk))
+
+        documents, ids, stale, entries = [], [], [], {}
+        for url, page_chunks in pages.items():
+            previous = set(self.manifest.chunk_ids(index_name, url))
+            current = {}
+            for i, chunk in page_chunks:
+                chunk_hash = content_hash(chunk["content"])
+                doc_id = chunk_id(url, chunk_hash)
+                if doc_id in current:
+                    continue
+                current[doc_id] = None
+                if doc_id in previous:
+                    continue
+                ids.append(doc_id)
+                documents.append(Document(
+                    page_content=chunk["content"],
+                    metadata={
+                        "source_url": url,
+                        "chunk_index": chunk.get("chunk_index", i),
+                        "total_chunks": chunk.get("total_chunks", len(chunks)),
+                        "char_count": len(chunk["content"]),
+                        "token_count": chunk["token_count"],
+                        "heading_path": chunk["heading_path"],
+                        "breadcrumb": chunk["breadcrumb"],
+                        "chunk_hash": chunk_hash,
+                    },
+                ))
+            stale.extend(previous.difference(current))
+            metadata = (page_chunks[0][1].get("metadata") if page_chunks else None) or {}
+            entries[url] = {
+                "ids": list(current),
+                "etag": metadata.get("etag"),
+                "last_modified": metadata.get("last_modified"),
+            }
+
+        documents, ids, duplicates = self.drop_near_duplicates(documents, ids, index_name)
+        if duplicates:
+            skipped = set(duplicates)
+            for entry in entries.values():
+                entry["ids"] = [doc_id for doc_id in entry["ids"] if doc_id not in skipped]
+        return documents, ids, stale, entries, len(duplicates)
+
+    def commit_scrape_page(self, url: str, entry: dict, index_name: Optional[str] = None):
+        self.manifest.set_chunks(index_name or self.index_name, url, entry["ids"], entry["etag"], entry["last_modified"])
+
+    def add_scrape_data(self, chunks: List[dict], urls: Iterable[str] = ()) -> dict:
+        """Incrementally sync scraped chunks: upsert new chunks, delete stale ones (see `plan_scrape_data`)."""
+        stats = {"added": 0, "deleted": 0, "unchanged": 0, "duplicates": 0}
+        if self.vectorstore is None:
             print("Pinecone : Vector store not initialized. Cannot add documents.")
+            return stats
 
+        index_name = self.index_name
+        vectorstore = self.get_vectorstore(index_name)
+        documents, ids, stale, entries, stats["duplicates"] = self.plan_scrape_data(chunks, urls, index_name)
+        if documents:
+            try:
+                vectorstore.add_documents(documents=documents, ids=ids)
+                self._lexical_add(documents, ids, index_name)
+            except BaseException:
+                self.unstored(ids, index_name)
+                raise
+            self._stored(ids, index_name)
+        if stale:
+            self.delete_ids(stale, index_name)
+        for url, entry in entries.items():
+            self.commit_scrape_page(url, entry, index_name)
 
+        stats["added"], stats["deleted"] = len(documents), len(stale)
+        stats["unchanged"] = sum(len(entry["ids"]) for entry in entries.values()) - len(documents)
+        if documents or stale:
+            self.bump_version(index_name)
+        print(f"Pinecone : scrape sync on '{index_name}': {stats}")
+        return stats
+
+    def upsert_embeddings(
+        self, documents: List[Document], vectors: List[List[float]], ids: List[str], index_name: Optional[str] = None
+    ):
+        """Store documents whose embeddings were computed upstream (no re-embedding)."""
+        texts = [doc.page_content for doc in documents]
+        metadatas = [dict(doc.metadata) for doc in documents]
+        vectorstore = self.get_vectorstore(index_name)
+        self._lexical_add(documents, ids, index_name)
+        if self.backend == "local":
+            vectorstore.add_vectors(texts, vectors, metadatas, ids)
+        else:
+            text_key = getattr(vectorstore, "_text_key", "text")
+            for metadata, text in zip(metadatas, texts):
+                metadata[text_key] = text
+            vectorstore.index.upsert(vectors=list(zip(ids, vectors, metadatas)))
+        self._stored(ids, index_name)
+
+    def remove_sources(self, urls: List[str], index_name: Optional[str] = None) -> int:
+        """Delete every vector stored for the given source URLs."""
+        index_name = index_name or self.index_name
+        stale = []
+        for url in urls:
+            stale.extend(self.manifest.chunk_ids(index_name, url))
+            self.manifest.forget(index_name, url)
+        if stale:
+            self.delete_ids(stale, index_name)
+            self.bump_version(index_name)
+        return len(stale)
 
     def query_index(self, query_text: str, k: int = 5):
         """Query the vector index for similar content"""
@@ -122,16 +510,110 @@ class PineconeClient:
             print("Pinecone : Vector store not initialized. Cannot perform query.")
             return []
 
+    async def asimilarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        timeout: float = None,
+        embedding: List[float] = None,
+        index_name: Optional[str] = None,
+        namespace: Optional[str] = None,
+    ) -> List[Document]:
+        """Similarity search off the event loop, bounded by the search pool and a timeout.
+
+        Searches `index_name` / `namespace` when given (per-session routing), else the default index.
+        If the query embedding is already known it is searched directly instead of re-embedding.
+        Returns an empty list if the search times out or fails so the caller can still answer.
+        Cancelling the awaiting task also cancels the search if it is still queued.
+        Each document is a copy whose metadata carries the cosine relevance as "score".
+        """
+        timeout = CONFIG.RETRIEVAL_TIMEOUT if timeout is None else timeout
+        target = index_name or self.index_name
+        loop = asyncio.get_running_loop()
+
+        def search():
+            # handle lookup may open a new index, so it runs in the pool too
+            vectorstore = self.get_vectorstore(target, namespace)
+            if embedding is None:
+                hits = vectorstore.similarity_search_with_score(query, k=k)
+            elif isinstance(vectorstore, LocalVectorStore):
+                hits = vectorstore.similarity_search_with_score_by_vector(embedding, k=k)
+            else:
+                hits = vectorstore.similarity_search_by_vector_with_score(embedding, k=k)
+            return [
+                Document(id=doc.id, page_content=doc.page_content, metadata={**doc.metadata, "score": float(score)})
+                for doc, score in hits
+            ]
+
+        future = loop.run_in_executor(_search_executor, search)
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"Pinecone : similarity search timed out after {timeout}s on '{target}'")
+            return []
+        except Exception as e:
+            print(f"Pinecone : similarity search failed on '{target}': {e}")
+            return []
+
+    def similarity_search_with_vectors(
+        self, embedding: List[float], k: int = 20, index_name: Optional[str] = None, namespace: Optional[str] = None
+    ) -> List[Tuple[Document, np.ndarray]]:
+        """
+        Top-k hits with their stored vectors (for re-ranking). Each document is a copy whose
+        metadata carries the cosine relevance as "score".
+        """
+        vectorstore = self.get_vectorstore(index_name, namespace)
+        if isinstance(vectorstore, LocalVectorStore):
+            hits = vectorstore.similarity_search_with_vectors_by_vector(embedding, k=k)
+        else:
+            response = vectorstore.index.query(
+                vector=embedding, top_k=k, include_metadata=True, include_values=True,
+                namespace=vectorstore._namespace,
+            )
+            hits = []
+            for match in response.matches:
+                metadata = dict(match.metadata or {})
+                text = metadata.pop(vectorstore._text_key, "")
+                hits.append((Document(id=match.id, page_content=text, metadata=metadata), match.score, match.values))
+        return [
+            (Document(id=doc.id, page_content=doc.page_content, metadata={**doc.metadata, "score": float(score)}),
+             np.asarray(vector, dtype=np.float32))
+            for doc, score, vector in hits
+        ]
+
+    async def asimilarity_search_with_vectors(
+        self,
+        embedding: List[float],
+        k: int = 20,
+        timeout: float = None,
+        index_name: Optional[str] = None,
+        namespace: Optional[str] = None,
+    ) -> List[Tuple[Document, np.ndarray]]:
+        """similarity_search_with_vectors off the event loop; [] on timeout or failure."""
+        timeout = CONFIG.RETRIEVAL_TIMEOUT if timeout is None else timeout
+        target = index_name or self.index_name
+        future = asyncio.get_running_loop().run_in_executor(
+            _search_executor, self.similarity_search_with_vectors, embedding, k, target, namespace
+        )
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"Pinecone : similarity search timed out after {timeout}s on '{target}'")
+            return []
+        except Exception as e:
+            print(f"Pinecone : similarity search failed on '{target}': {e}")
+            return []
+
     def switch_index(self, index_name: str) :
         print(f"Configuring client for index: '{index_name}'")
         hasCreated = False
         try:
-            self.index_name = index_name
-            hasCreated = self._create_index_if_not_exists()
+            # The new store is opened first: requests running meanwhile keep using the old default
+            hasCreated = self._create_index_if_not_exists(index_name)
+            vectorstore = self.get_vectorstore(index_name)
 
-            self.vectorstore = PineconeVectorStore.from_existing_index(
-                index_name=self.index_name, embedding=self.embeddings
-            )
+            # Only the default changes; sessions already routed to an index keep it
+            self.index_name, self.vectorstore = index_name, vectorstore
             print(f"Successfully connected to vector store for index '{self.index_name}'")
             return True,hasCreated
 
@@ -142,6 +624,10 @@ class PineconeClient:
     def getIndexName(self) -> str:
         return self.index_name
 
+    def getEmbeddingCacheStats(self) -> dict:
+        cache = getattr(self.embeddings, "cache", None)
+        return cache.stats() if cache is not None else {}
+
     def getEmbeddings(self):
         return self.embeddings
 
@@ -0,0 +1,117 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+def mmr(query: Sequence[float], vectors: Sequence[Sequence[float]], k: int, lambda_mult: float = 0.7) -> List[int]:
+    """
+    Indices of `k` candidates picked by maximal marginal relevance, best first.
+
+    Relevance and pairwise similarities come from two matrix products up front; each pick
+    then only updates a running "most similar selected" vector, so the loop is O(k * n).
+    """
+    if len(vectors) == 0 or k <= 0:
+        return []
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = matrix @ query
+    similarity = matrix @ matrix.T
+    redundancy = np.full(len(matrix), -np.inf, dtype=np.float32)
+    available = np.ones(len(matrix), dtype=bool)
+    selected = []
+    for _ in range(min(k, len(matrix))):
+        if selected:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        redundancy = np.maximum(redundancy, similarity[pick])
+    return selected
+
+
+def strip_overlap(previous: str, following: str, max_overlap: int = 200, min_overlap: int = 8) -> str:
+    """`following` without the prefix it repeats from the end of `previous` (splitter overlap)."""
+    for size in range(min(max_overlap, len(previous), len(following)), min_overlap - 1, -1):
+        if previous.endswith(following[:size]):
+            return following[size:]
+    return following
+
+
+def _join(text: str, rest: str) -> str:
+    if not rest or text.endswith((" ", "\n")) or rest[0] in " \n.,;:!?)":
+        return text + rest
+    return text + " " + rest
+
+
+def _body(doc: Document) -> str:
+    """Chunk text without the heading path line the chunker puts in front (metadata "breadcrumb")."""
+    breadcrumb = (doc.metadata or {}).get("breadcrumb")
+    if breadcrumb and doc.page_content.startswith(breadcrumb + "\n\n"):
+        return doc.page_content[len(breadcrumb) + 2:]
+    return doc.page_content
+
+
+def _source(doc: Document) -> Tuple[Optional[str], Optional[int]]:
+    metadata = doc.metadata or {}
+    source = metadata.get("source_url") or metadata.get("source_id")
+    index = metadata.get("chunk_index")
+    try:
+        return source, int(index) if index is not None else None
+    except (TypeError, ValueError):
+        return source, None
+
+
+def merge_adjacent(docs: List[Document], max_overlap: int = 200) -> List[Document]:
+    """
+    Merge retrieved chunks that are neighbours in the same source (consecutive `chunk_index`)
+    into one document with the repeated overlap and heading path lines removed. Merged
+    documents take the rank of their best-ranked part and the highest "score" and
+    "lexical_score"; exact duplicates are dropped.
+    """
+    standalone: List[Tuple[int, Document]] = []
+    seen = set()
+    by_source: Dict[str, List[Tuple[int, int, Document]]] = {}
+    for rank, doc in enumerate(docs):
+        key = doc.id or doc.page_content
+        if key in seen:
+            continue
+        seen.add(key)
+        source, index = _source(doc)
+        if source is None or index is None:
+            standalone.append((rank, doc))
+        else:
+            by_source.setdefault(source, []).append((index, rank, doc))
+
+    merged: List[Tuple[int, Document]] = list(standalone)
+    for source, parts in by_source.items():
+        parts.sort(key=lambda part: part[0])
+        run = [parts[0]]
+        for part in parts[1:] + [None]:
+            if part is not None and part[0] == run[-1][0] + 1:
+                run.append(part)
+                continue
+            if len(run) == 1:
+                merged.append((run[0][1], run[0][2]))
+            else:
+                text = run[0][2].page_content
+                for _, _, doc in run[1:]:
+                    text = _join(text, strip_overlap(text, _body(doc), max_overlap))
+                metadata = dict(run[0][2].metadata)
+                metadata["merged_chunks"] = [index for index, _, _ in run]
+                for key in ("score", "lexical_score"):
+                    scores = [doc.metadata.get(key) for _, _, doc in run if doc.metadata.get(key) is not None]
+                    if scores:
+                        metadata[key] = max(scores)
+                merged.append((min(rank for _, rank, _ in run), Document(id=run[0][2].id, page_content=text, metadata=metadata)))
+            if part is not None:
+                run = [part]
+    merged.sort(key=lambda item: item[0])
+    return [doc for _, doc in merged]
+
@@ -1,5 +1,7 @@
 # prompt_manager.py
 
+from config import CONFIG
+
 DEFAULT_CHAT_PROMPT = """You are a conversational assistant working for a company. 
 Answer the user's questions based on context, chat history and should look interesting.
 
@@ -45,3 +47,28 @@ def reset_chat_prompt():
 def reset_voice_prompt():
     global voice_prompt
     voice_prompt = DEFAULT_VOICE_PROMPT
+
+
+############## CONTEXT BUDGETS ##############
+# Tokens of retrieved context each prompt gets
+
+chat_context_tokens = CONFIG.CONTEXT_TOKENS_CHAT
+voice_context_tokens = CONFIG.CONTEXT_TOKENS_VOICE
+
+
+def set_chat_context_tokens(tokens: int):
+    global chat_context_tokens
+    chat_context_tokens = tokens
+
+
+def set_voice_context_tokens(tokens: int):
+    global voice_context_tokens
+    voice_context_tokens = tokens
+
+
+def get_chat_context_tokens() -> int:
+    return chat_context_tokens
+
+
+def get_voice_context_tokens() -> int:
+    return voice_context_tokens
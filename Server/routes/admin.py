@@ -1,14 +1,21 @@
+import asyncio
+import os
+import tempfile
 import traceback
 from typing import List
-from fastapi import APIRouter
+from fastapi import APIRouter, File, UploadFile
 from fastapi.responses import JSONResponse
 from httpx import request
 from pydantic import BaseModel
 
 from llm.llm import LLM
 from pc.pinecone import PineconeClient
-from utils.webscrapper.webscrapper import scrape_page_and_its_links
+from utils.ingestion.pipeline import JOBS
+from utils.elevenlabs.generator import get_audio_cache
+from utils.metrics import recent_traces
+from utils.scheduler import OPENAI_CAPACITY, TTS_CAPACITY
 from prompts import get_chat_prompt,get_voice_prompt,set_chat_prompt,set_voice_prompt,reset_chat_prompt,reset_voice_prompt
+from prompts import get_chat_context_tokens,get_voice_context_tokens,set_chat_context_tokens,set_voice_context_tokens
 admin_router = APIRouter(prefix="/admin",tags=['Admin'])
 llm = LLM()
 pc = PineconeClient()
@@ -20,6 +27,7 @@ pc = PineconeClient()
 class ScrapeRequest(BaseModel):
     url : str
     limit: int
+    depth: int = 1
 
 class PineconeSetIndexRequest(BaseModel):
     indexName: str = "default"
@@ -33,6 +41,9 @@ class PineconeDataAddRequest(BaseModel):
 
 class SetPromptRequest(BaseModel):
     systemprompt: str
+
+class SetContextTokensRequest(BaseModel):
+    tokens: int
 ################################################################################################
 #                                           Admin Routes 
 ################################################################################################
@@ -45,13 +56,17 @@ async def dashboard():
 
 @admin_router.post('/pinecone/index/change')
 async def pineconeChangeIndex(request:PineconeSetIndexRequest):
-    success , hasCreated = pc.switch_index(request.indexName)
+    success , hasCreated = await asyncio.to_thread(pc.switch_index, request.indexName)
     return JSONResponse({"success":success,"created":hasCreated})
 
 @admin_router.get('/pinecone/index/get')
 async def pineconeGetIndex():
     return JSONResponse({"name":pc.getIndexName()})
 
+@admin_router.get('/pinecone/index/list')
+async def pineconeListIndexes():
+    return JSONResponse({"indexes": await asyncio.to_thread(pc.list_indexes), "current": pc.getIndexName()})
+
 @admin_router.get('/pinecone/index/delete')
 async def pineconeDeleteIndex():
     return JSONResponse({"success":pc.delete_index()})
@@ -60,9 +75,48 @@ async def pineconeDeleteIndex():
 async def pineconeDataQuery(request : PineconeQueryIndexRequest):
     return pc.query_index(request.query,request.top)
 
+@admin_router.get('/pinecone/embeddings/cache')
+async def pineconeEmbeddingCacheStats():
+    return JSONResponse(pc.getEmbeddingCacheStats())
+
 @admin_router.post('/pinecone/data/add')
 async def pineconeDataAdd(request : PineconeDataAddRequest):
-    return  JSONResponse({"success" : pc.add_data_to_index(request.textarray)})
+    return  JSONResponse({"success" : await pc.add_data_to_index(request.textarray)})
+
+@admin_router.post('/pinecone/data/bulk')
+async def pineconeDataBulk(file: UploadFile = File(...)):
+    """
+    Bulk-load an NDJSON file: one {"text", "id"?, "metadata"?} object (or JSON string) per line.
+    The upload is spooled to disk and ingested by a background job; malformed lines are
+    skipped and counted as "invalid".
+    """
+    spool = tempfile.NamedTemporaryFile(prefix="bulk-", suffix=".ndjson", delete=False)
+    try:
+        with spool:
+            while chunk := await file.read(1 << 20):
+                spool.write(chunk)
+        job = JOBS.submit_bulk_file(pc, spool.name, name=file.filename)
+        return {"success": True, "job_id": job.id, "status": job.status}
+    except Exception as e:
+        traceback.print_exc()
+        os.remove(spool.name)
+        return {"success": False, "message": f"Error loading bulk data: {str(e)}"}
+
+############################### TEXT TO SPEECH ##########################
+
+@admin_router.get('/tts/cache')
+async def ttsCacheStats():
+    cache = get_audio_cache()
+    return JSONResponse(cache.stats() if cache is not None else {"enabled": False})
+
+@admin_router.get('/traces')
+async def turnTraces():
+    # filled only while TRACE_TURNS is on
+    return JSONResponse({"traces": recent_traces()})
+
+@admin_router.get('/capacity')
+async def upstreamCapacity():
+    return JSONResponse({"openai": OPENAI_CAPACITY.stats(), "elevenlabs": TTS_CAPACITY.stats()})
 
 ############################### PROMPT REQUEST ##########################
 
@@ -90,36 +144,50 @@ async def GetVoicePrompt():
 async def ResetVoicePrompt():
     return JSONResponse({"success" : reset_voice_prompt()})
 
+@admin_router.post('/prompt/chat/context/set')
+async def SetChatContextTokens(request:SetContextTokensRequest):
+    return set_chat_context_tokens(max(request.tokens, 0))
+
+@admin_router.get('/prompt/chat/context/get')
+async def GetChatContextTokens():
+    return JSONResponse({"tokens":get_chat_context_tokens()})
+
+@admin_router.post('/prompt/voice/context/set')
+async def SetVoiceContextTokens(request:SetContextTokensRequest):
+    return set_voice_context_tokens(max(request.tokens, 0))
+
+@admin_router.get('/prompt/voice/context/get')
+async def GetVoiceContextTokens():
+    return JSONResponse({"tokens":get_voice_context_tokens()})
+
 
 ########################################################
 #               Web Scrapping Route (admin)
-#
+#   Submits a background ingestion job and returns
+#   immediately; progress is read from /jobs/{job_id}
 ########################################################
 @admin_router.post('/scrape/website')
 async def scrap_url(request: ScrapeRequest):
-
-    url = request.url
-    link_limit = request.limit
-
     try:
-        text = scrape_page_and_its_links(url, link_limit)
-
-        # ✅ Print summary
-        print(f"\n✅ Scraped {len(text)} chunks from {url}")
-        print("-" * 50)
-
-        # ✅ Print first 3 chunks for inspection
-        for i, chunk in enumerate(text[:3]):
-            print(f"🔹 Chunk {i + 1}/{len(text)} from URL: {chunk['source_url']}")
-            print(f"🔢 Index: {chunk['chunk_index'] + 1}/{chunk['total_chunks']}")
-            print(f"📏 Characters: {chunk['char_count']}")
-            print("🧩 Content Preview:")
-            print(chunk['content'][:300].strip() + "...")
-            print("-" * 50)
-            
-        pc.add_scrape_data(text)
-        return {"success": True, "text": text}
+        job = JOBS.submit_scrape(pc, request.url, request.limit, request.depth)
+        return {"success": True, "job_id": job.id, "status": job.status}
     except Exception as e:
         traceback.print_exc()
         return {"success": False, "message": f"Error scraping URL: {str(e)}"}
 
+############################### INGESTION JOBS ##########################
+
+@admin_router.get('/jobs')
+async def listJobs():
+    return JSONResponse({"jobs": [job.to_dict() for job in JOBS.list()]})
+
+@admin_router.get('/jobs/{job_id}')
+async def getJob(job_id: str):
+    job = JOBS.get(job_id)
+    if job is None:
+        return JSONResponse({"success": False, "message": "Job not found"}, status_code=404)
+    return JSONResponse({"success": True, **job.to_dict()})
+
+@admin_router.post('/jobs/{job_id}/cancel')
+async def cancelJob(job_id: str):
+    return JSONResponse({"success": JOBS.cancel(job_id)})
@@ -1,73 +1,256 @@
-
 # Updated WebSocket route
+import asyncio
+from contextlib import aclosing
+from typing import AsyncGenerator, Callable, Hashable, Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 import json
-from prompts import get_chat_prompt, get_voice_prompt
+import time
+import uuid
+from prompts import get_chat_prompt, get_voice_prompt, get_chat_context_tokens, get_voice_context_tokens
 from utils.elevenlabs.generator import AudioGeneratorFromTextGenerator
+from utils.segmenter import chat_segmenter
 from llm.llm import LLM
+from llm.session import Session
+from config import CONFIG
+from utils.coalesce import SingleFlight
+from utils.scheduler import Overloaded, Priority, admission
+from utils.metrics import ACTIVE_CONNECTIONS, COALESCED_TURNS, SEGMENTS_PER_TURN, TURNS_TOTAL, WS_SEND_SECONDS, observe_stage, trace_turn
 
 user_router = APIRouter(prefix="/user", tags=['Voice'])
 llm = LLM()
 
+########################################################
+#               Turns
+#   One turn answers one message. Turns run as tasks so
+#   the socket keeps receiving while a turn streams; a new
+#   message or a "stop" cancels the running turn, which
+#   closes the LLM and TTS streams upstream.
+########################################################
+
+########################################################
+#               Coalescing
+#   Identical first questions asked at the same time (a
+#   launch, an outage) share one retrieval, generation and
+#   synthesis; followers get a replay of what was produced
+#   so far, then the live tail. Follow-up questions depend
+#   on each conversation's history and are never shared.
+########################################################
+
+FLIGHTS = SingleFlight()
+
+
+def coalesce_key(type: str, question: str, prompt: str, session: Session) -> Optional[Hashable]:
+    if not CONFIG.COALESCE_ENABLED or session.turns or session.summary:
+        return None
+    normalized = " ".join(question.lower().split()).rstrip("?!. ")
+    return (type, normalized, session.index_name, session.namespace, prompt)
+
+
+def answer_stream(type: str, question: str, session: Session) -> AsyncGenerator:
+    """LLM tokens (chat) or text/audio chunks (voice) answering `question`."""
+    if type == "voice":
+        prompt, context_tokens = get_voice_prompt(), get_voice_context_tokens()
+    else:
+        prompt, context_tokens = get_chat_prompt(), get_chat_context_tokens()
+
+    def generate(target: Session) -> AsyncGenerator:
+        text_stream = llm.get_stream_response(question, prompt=prompt, session=target, context_tokens=context_tokens)
+        return AudioGeneratorFromTextGenerator(text_stream) if type == "voice" else text_stream
+
+    key = coalesce_key(type, question, prompt, session)
+    if key is None:
+        return generate(session)
+    return shared_answer(key, question, session, generate)
+
+
+async def shared_answer(key: Hashable, question: str, session: Session, generate: Callable[[Session], AsyncGenerator]):
+    """Lead or follow the flight for `key`, then record the answer in this session."""
+    # The generation runs on a history-less copy, so it never writes into any one subscriber's session
+    shared = Session(id="", index_name=session.index_name, namespace=session.namespace)
+    # The flight's task serves every subscriber, so it is not charged to the leader's connection
+    with admission(Priority.VOICE if key[0] == "voice" else Priority.CHAT):
+        flight = FLIGHTS.join(key, lambda: generate(shared), state=shared)
+    COALESCED_TURNS.inc(role="leader" if flight.state is shared else "follower")
+    tokens, segments = [], []
+    try:
+        async with aclosing(flight.subscribe()) as chunks:
+            async for chunk in chunks:
+                if isinstance(chunk, str):
+                    tokens.append(chunk)
+                elif chunk['type'] == "text":
+                    segments.append(chunk['data'])
+                yield chunk
+    finally:
+        session.context = flight.state.context
+        answer = "".join(tokens) or " ".join(segments)
+        # an interrupted answer is kept too, as for unshared turns
+        if answer:
+            llm.sessions.add_turn(session, question, answer)
+
+
+def context_size(session: Session) -> dict:
+    """Tokens of retrieved context the turn's prompt carried, reported with its completion."""
+    return {"context_tokens": session.context.tokens if session.context is not None else 0}
+
+
+async def voice_turn(websocket: WebSocket, question: str, session: Session):
+    start = time.perf_counter()
+    segments = 0
+    first_audio = True
+
+    # Send chunks to client
+    async with aclosing(answer_stream("voice", question, session)) as audio_stream:
+        async for chunk in audio_stream:
+            try:
+                if chunk['type'] == "text":
+                    segments += 1
+                    with WS_SEND_SECONDS.time(kind="text"):
+                        await websocket.send_json({"type":"voice","data":chunk['data']})
+                elif chunk['type'] == "audio":
+                    with WS_SEND_SECONDS.time(kind="audio"):
+                        await websocket.send_bytes(chunk['data'])
+                    if first_audio:
+                        first_audio = False
+                        observe_stage("first_audio_sent", start)
+            except Exception as send_error:
+                print(f"Error sending chunk: {send_error}")
+                break
+    SEGMENTS_PER_TURN.observe(segments, type="voice")
+    await websocket.send_json({"type":"voice","complete":True,**context_size(session)})
+
+
+async def chat_turn(websocket: WebSocket, question: str, session: Session):
+    start = time.perf_counter()
+    segments = 0
+    segmenter = chat_segmenter()
+    async with aclosing(answer_stream("chat", question, session)) as text_stream:
+        async for chunk in text_stream:
+            try:
+                for segment in segmenter.feed(chunk):
+                    with WS_SEND_SECONDS.time(kind="text"):
+                        await websocket.send_json({"type":"chat","data":segment})
+                    segments += 1
+                    if segments == 1:
+                        observe_stage("first_text_sent", start)
+            except Exception as send_error:
+                print(f"Error sending chunk: {send_error}")
+                break
+
+    remaining = segmenter.flush()
+    if remaining and remaining.strip():
+        try:
+                await websocket.send_json({"type":"chat","data":remaining})
+                segments += 1
+        except Exception as e:
+            print(f"Error sending final chunk: {e}")
+    SEGMENTS_PER_TURN.observe(segments, type="chat")
+    await websocket.send_json({"type":"chat","complete":True,**context_size(session)})
+
+
+TURNS = {"voice": voice_turn, "chat": chat_turn}
+
+
+async def run_turn(websocket: WebSocket, type: str, question: str, session: Session, connection_id: str):
+    outcome = "completed"
+    priority = Priority.VOICE if type == "voice" else Priority.CHAT
+    with trace_turn(f"{type} turn"), admission(priority, connection_id):
+        try:
+            await TURNS[type](websocket, question, session)
+        except asyncio.CancelledError:
+            outcome = "interrupted"
+            raise
+        except Overloaded as e:
+            # refused up front rather than queued past the point the answer is still useful
+            outcome = "rejected"
+            print(f"Rejected {type} turn: {e.pool} is at capacity")
+            try:
+                await websocket.send_json({"error":str(e),"busy":True,"retry_after":round(e.retry_after, 1)})
+            except Exception as send_error:
+                print(f"Error sending rejection: {send_error}")
+        except Exception as e:
+            outcome = "error"
+            print(f"Error in {type} turn: {e}")
+        finally:
+            TURNS_TOTAL.inc(type=type, outcome=outcome)
+
+
+async def cancel_turn(turn: Optional[asyncio.Task]) -> bool:
+    """Cancel a running turn and wait until its upstream streams are closed."""
+    if turn is None or turn.done():
+        return False
+    turn.cancel()
+    await asyncio.wait([turn])
+    return True
+
+
+async def route_session(websocket: WebSocket, session: Session, index_name: Optional[str], namespace: Optional[str]) -> bool:
+    """
+    Pin the session to an index so an admin switching the default index does not change
+    retrieval mid-conversation. Returns False (after telling the client) for unknown indexes.
+    """
+    if session.index_name is None and not index_name:
+        index_name = llm.pc.getIndexName()
+    if index_name and index_name != session.index_name:
+        if not await asyncio.to_thread(llm.pc.has_index, index_name):
+            await websocket.send_json({"error":f"Unknown index '{index_name}'."})
+            return False
+        session.index_name = index_name
+    if namespace is not None:
+        session.namespace = namespace or None
+    return True
+
+
 @user_router.websocket("/ws")
 async def Connect(websocket: WebSocket):
     await websocket.accept()
     print("WebSocket connection established")
-    
+    ACTIVE_CONNECTIONS.inc()
+    # upstream capacity is capped per connection, so one client cannot take it all
+    connection_id = uuid.uuid4().hex
+    turn: Optional[asyncio.Task] = None
+    turn_type: Optional[str] = None
+    # History lives server-side; a reconnecting client passes its session ID back
+    session_id: Optional[str] = websocket.query_params.get("session_id")
+    # Knowledge base for this connection (multi-tenant); defaults to the server's current index
+    index_name: Optional[str] = websocket.query_params.get("index")
+    namespace: Optional[str] = websocket.query_params.get("namespace")
+
     try:
         while True:
                 message = await websocket.receive_json()
+                type = message.get('type')
+
+                # Barge-in: any new message interrupts the answer in progress
+                interrupted = await cancel_turn(turn)
+                if interrupted:
+                    print(f"Interrupted {turn_type} turn")
+                    await websocket.send_json({"type":turn_type,"interrupted":True})
+
+                if type == "stop":
+                    await websocket.send_json({"type":"stop","stopped":interrupted})
+                elif type in TURNS:
+                    question = message['question'].strip()
+                    # chat_history only seeds a session the server does not know (e.g. after a restart)
+                    session = llm.sessions.get(message.get('session_id') or session_id, message.get('chat_history', []), question)
+                    if session.id != session_id:
+                        session_id = session.id
+                        await websocket.send_json({"type":"session","session_id":session_id})
+                    if not await route_session(websocket, session, message.get('index') or index_name, message.get('namespace') or namespace):
+                        continue
+                    turn_type = type
+                    turn = asyncio.create_task(run_turn(websocket, type, question, session, connection_id))
+                else:
+                    await websocket.send_json({"error":"Request type not specified on server."})
+
+
 
-                type = message['type']
-                question = message['question'].strip()
-                chat_history = message.get('chat_history', [])
-
-                if type == "voice":
-                        print(chat_history)
-                        text_stream = llm.get_stream_response(question, chat_history, get_voice_prompt())
-                        audio_stream = AudioGeneratorFromTextGenerator(text_stream)
-                        
-                        # Send chunks to client
-                        async for chunk in audio_stream:
-                            try:
-                                if chunk['type'] == "text":
-                                    await websocket.send_json({"type":"voice","data":chunk['data']})
-                                elif chunk['type'] == "audio":
-                                    await websocket.send_bytes(chunk['data'])
-                            except Exception as send_error:
-                                print(f"Error sending chunk: {send_error}")
-                                break
-                        await websocket.send_json({"type":"voice","complete":True})
-
-                elif type == "chat":
-                    buffer = ""
-                    text_stream = llm.get_stream_response(question,chat_history,get_chat_prompt())
-                    async for chunk in text_stream:
-                        buffer += chunk
-                        if any(punct in buffer for punct in [".", "?", ","]):
-                            try:
-                                await websocket.send_json({"type":"chat","data":buffer})
-                                buffer=""
-                            except Exception as send_error:
-                                print(f"Error sending chunk: {send_error}")
-                                break
-                    
-                    if buffer.strip():
-                        try:
-                                await websocket.send_json({"type":"chat","data":buffer})
-                                buffer=""
-                        except Exception as e:
-                            print(f"Error generating final audio: {e}")
-                    await websocket.send_json({"type":"chat","complete":True})
-                else: 
-                    websocket.send_json({"error":"Request type not specified on server."})
-
-
-                
     except json.JSONDecodeError as json_error:
         print(f"JSON decode error: {json_error}")
     except WebSocketDisconnect:
         print("Client disconnected")
     except Exception as receive_error:
         print(f"Error receiving message: {receive_error}")
+    finally:
+        ACTIVE_CONNECTIONS.dec()
+        await cancel_turn(turn)
@@ -2,13 +2,18 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 import uvicorn
 from llm.llm import LLM
 
-from elevenlabs.client import ElevenLabs
 from contextlib import asynccontextmanager
+from utils.clients import CLIENTS
+from llm.session import count_tokens
 from routes.admin import admin_router
 from routes.user import user_router
+from routes.metrics import metrics_router
+from utils.workers import start_worker_pool, shutdown_worker_pool
+from config import CONFIG
 
 #########################################################################
 #                               Server.py
@@ -67,7 +72,6 @@ class Server:
 
         self.llm_instance: Optional[LLM] = None
         self.current_index: Optional[str] = None
-        self.eleven_client = ElevenLabs()
 
         self.app = FastAPI(
             title="AI ChatBot API",
@@ -91,8 +95,24 @@ class Server:
              ╚═════╝╚═╝  ╚═╝╚═╝  ╚═╝   ╚═╝       ╚═════╝  ╚═════╝    ╚═╝   
              """
         print(logo)
+
+        # Ingestion worker processes are forked before the server's own threads start (see start_worker_pool)
+        start_worker_pool()
+
+        # Upstream connections are pooled for the whole process; pre-connect in the
+        # background so startup is not blocked by a slow or unreachable upstream
+        warm_up = asyncio.create_task(CLIENTS.warm_up())
+        # Load the tokenizer used for history budgets before the first turn needs it
+        tokenizer = asyncio.create_task(asyncio.to_thread(count_tokens, ""))
         yield 
         print("🛑 AI ChatBot API shutting down...")
+        for task in (warm_up, tokenizer):
+            task.cancel()
+        for result in await asyncio.gather(warm_up, tokenizer, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"Startup task failed: {result!r}")
+        await CLIENTS.aclose()
+        shutdown_worker_pool()
 
     ##################################################################################
     #                            ROUTE SETUP
@@ -100,6 +120,9 @@ class Server:
     def _setupRoutes(self):
         self.app.include_router(admin_router,prefix='/api')
         self.app.include_router(user_router,prefix='/api')
+        # Scraped by Prometheus at the conventional path, outside /api
+        if CONFIG.METRICS_ENABLED:
+            self.app.include_router(metrics_router)
 
 
     def get_app(self) -> FastAPI:
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def pc(tmp_path_factory):
+    """The PineconeClient singleton on the local backend, with deterministic fake embeddings."""
+    root = tmp_path_factory.mktemp("state")
+    os.environ.update(
+        OPENAI_API_KEY="test",
+        ELEVEN_API_KEY="test",
+        VECTOR_BACKEND="local",
+        LOCAL_INDEX_DIR=str(root / "index"),
+        LEXICAL_INDEX_DIR=str(root / "lexical"),
+        DEDUP_INDEX_DIR=str(root / "dedup"),
+        EMBEDDING_CACHE_PATH=str(root / "embeddings.sqlite"),
+        INGEST_MANIFEST_PATH=str(root / "manifest.sqlite"),
+        INGEST_PROCESSES="0",
+        CRAWL_RESPECT_ROBOTS="false",
+        CRAWL_DELAY="0",
+    )
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from pc.pinecone import PineconeClient
+
+    client = PineconeClient("default")
+    client.embeddings = DeterministicFakeEmbedding(size=32)
+    client.vectorstore.embedding = client.embeddings
+    return client
@@ -0,0 +1,30 @@
+from langchain_core.documents import Document
+
+from llm.context import ContextAssembler
+from pc.lexical import LexicalIndex
+
+
+def test_lexical_hits_are_held_to_their_own_floor(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+    texts = {
+        "hours": "Opening hours: the shop opens at nine and closes at five.",
+        "returns": "Returns are accepted within thirty days of purchase.",
+        "shipping": "Shipping abroad takes a week; the shop ships with tracking.",
+    }
+    index.add(list(texts), list(texts.values()), [{} for _ in texts])
+    question = "What are the shop opening hours on holidays?"
+    coverage = index.coverage(question, [doc_id for doc_id, _ in index.search(question, k=3)])
+    assert coverage["hours"] > 0.5 > coverage["shipping"] > 0
+
+    assembler = ContextAssembler(min_score=0.75, min_lexical_score=0.5)
+    one_term = Document(page_content=texts["shipping"], metadata={"lexical_score": coverage["shipping"]})
+    assert not assembler.relevant(one_term)
+    assert assembler.relevant(Document(page_content="x", metadata={"lexical_score": 0.8}))
+    assert not assembler.relevant(Document(page_content="x", metadata={}))
+    assert ContextAssembler(min_score=0.0).relevant(Document(page_content="x", metadata={}))
+
+
+def test_vector_score_decides_over_lexical_score():
+    assembler = ContextAssembler(min_score=0.75, min_lexical_score=0.5)
+    assert not assembler.relevant(Document(page_content="x", metadata={"score": 0.7, "lexical_score": 0.9}))
+    assert assembler.relevant(Document(page_content="x", metadata={"score": 0.8}))
@@ -0,0 +1,24 @@
+from langchain_core.documents import Document
+
+from pc.rerank import merge_adjacent
+from utils.ingestion.chunker import Chunker
+
+GUIDE = "# Guide\n\n## Setup\n\n" + "\n\n".join(
+    f"Step {i} is short. It has two sentences." for i in range(1, 13)
+)
+
+
+def test_merged_neighbours_repeat_neither_overlap_nor_breadcrumb():
+    chunks = Chunker(64, 16, 8).split(GUIDE)
+    assert len(chunks) > 2
+    assert any(chunk["breadcrumb"] and chunk["content"].startswith(chunk["breadcrumb"] + "\n\n") for chunk in chunks[1:])
+    docs = [
+        Document(page_content=chunk["content"], metadata={"source_id": "guide", "chunk_index": i, "breadcrumb": chunk["breadcrumb"]})
+        for i, chunk in enumerate(chunks)
+    ]
+    [merged] = merge_adjacent(docs)
+    text = merged.page_content
+    for i in range(1, 13):
+        assert text.count(f"Step {i} is short. It has two sentences.") == 1
+    assert text.count("Guide > Setup") == 0
+    assert text.startswith("# Guide")
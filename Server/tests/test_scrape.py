@@ -0,0 +1,33 @@
+import asyncio
+
+import httpx
+
+from utils.ingestion.pipeline import IngestionJob, IngestionPipeline
+from utils.webscrapper.crawler import Crawler
+
+ARTICLE = "<html><body><main><h1>Opening hours</h1>" + "<p>The shop opens at nine and closes at five on weekdays.</p>" * 20 + "</main></body></html>"
+EMPTY = "<html><body><nav><a href='/'>Home</a></nav></body></html>"
+
+
+def serve(monkeypatch, html: str):
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, text=html, headers={"content-type": "text/html"}))
+    monkeypatch.setattr(Crawler, "client", lambda self: httpx.AsyncClient(transport=transport))
+
+
+def scrape(pc) -> IngestionJob:
+    job = IngestionJob("scrape", {}, pc.getIndexName())
+    asyncio.run(IngestionPipeline(pc).run_scrape(job, "https://shop.example.com/hours", 0, 0))
+    return job
+
+
+def test_rescrape_of_a_page_now_empty_deletes_its_chunks(pc, monkeypatch):
+    url = "https://shop.example.com/hours"
+    serve(monkeypatch, ARTICLE)
+    assert scrape(pc).counters["upserted"] > 0
+    assert pc.manifest.chunk_ids(pc.getIndexName(), url)
+
+    serve(monkeypatch, EMPTY)
+    job = scrape(pc)
+    assert job.counters["pages"] == 1
+    assert job.counters["deleted"] > 0
+    assert pc.manifest.chunk_ids(pc.getIndexName(), url) == []
@@ -0,0 +1,23 @@
+from llm.session import SessionStore
+
+
+async def no_summary(previous, turns, max_tokens):
+    return previous
+
+
+def test_first_turn_history_ending_with_the_question_seeds_nothing():
+    store = SessionStore(no_summary)
+    session = store.get(None, ["user: What are your opening hours?"], "What are your opening hours?")
+    assert session.turns == []
+    store.add_turn(session, "What are your opening hours?", "9 to 5.")
+    assert [turn.role for turn in session.turns] == ["user", "assistant"]
+
+
+def test_history_before_the_question_is_kept():
+    store = SessionStore(no_summary)
+    history = ["user: Do you ship abroad?", "ai: Yes, to the EU.", "user: How much is it?"]
+    session = store.get(None, history, "How much is it?")
+    assert [(turn.role, turn.content) for turn in session.turns] == [
+        ("user", "Do you ship abroad?"),
+        ("assistant", "Yes, to the EU."),
+    ]
@@ -0,0 +1,161 @@
+import asyncio
+from typing import Dict, Optional
+
+import httpx
+from elevenlabs.client import AsyncElevenLabs
+from pinecone import Pinecone
+
+from config import CONFIG
+
+
+class UpstreamClients:
+    """
+    Long-lived, pooled HTTP clients for OpenAI, ElevenLabs and Pinecone.
+
+    Every turn reuses the same keep-alive connections instead of paying for a new
+    TCP + TLS handshake. Clients are created on first use, so scripts work without
+    the server; the server lifespan warms them at startup and closes them on shutdown
+    (they live as long as the process).
+    """
+
+    _instance = None
+    _initialized = False
+
+    _openai_async = None
+    _openai_sync = None
+    _eleven_http = None
+    _elevenlabs = None
+    _pinecone = None
+    _indexes = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(UpstreamClients, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if self.__class__._initialized:
+            return
+        self._indexes = {}
+        self.__class__._initialized = True
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=CONFIG.HTTP_POOL_SIZE,
+            max_keepalive_connections=CONFIG.HTTP_POOL_SIZE,
+            keepalive_expiry=CONFIG.HTTP_KEEPALIVE_EXPIRY,
+        )
+
+    @staticmethod
+    def _timeout() -> httpx.Timeout:
+        return httpx.Timeout(CONFIG.HTTP_TIMEOUT, connect=CONFIG.HTTP_CONNECT_TIMEOUT)
+
+    ################################################
+    ##              CLIENTS
+    ################################################
+
+    @property
+    def openai_async(self) -> httpx.AsyncClient:
+        """Async transport shared by every ChatOpenAI / OpenAIEmbeddings call."""
+        if self._openai_async is None:
+            self._openai_async = httpx.AsyncClient(limits=self._limits(), timeout=self._timeout())
+        return self._openai_async
+
+    @property
+    def openai_sync(self) -> httpx.Client:
+        """Sync transport for the embedding calls made from worker threads."""
+        if self._openai_sync is None:
+            self._openai_sync = httpx.Client(limits=self._limits(), timeout=self._timeout())
+        return self._openai_sync
+
+    @property
+    def elevenlabs(self) -> AsyncElevenLabs:
+        if self._elevenlabs is None:
+            self._eleven_http = httpx.AsyncClient(
+                limits=self._limits(), timeout=self._timeout(), follow_redirects=True
+            )
+            self._elevenlabs = AsyncElevenLabs(
+                api_key=CONFIG.ELEVEN_API_KEY,
+                base_url=CONFIG.ELEVEN_BASE_URL,
+                httpx_client=self._eleven_http,
+            )
+        return self._elevenlabs
+
+    @property
+    def pinecone(self) -> Pinecone:
+        if self._pinecone is None:
+            self._pinecone = Pinecone(CONFIG.PINECONE_API_KEY, host=CONFIG.PINECONE_HOST, pool_threads=CONFIG.RETRIEVAL_WORKERS)
+        return self._pinecone
+
+    def pinecone_index(self, name: str):
+        """Data-plane handle for an index; its host lookup and connection pool are reused."""
+        if name not in self._indexes:
+            self._indexes[name] = self.pinecone.Index(
+                name,
+                pool_threads=CONFIG.RETRIEVAL_WORKERS,
+                connection_pool_maxsize=CONFIG.HTTP_POOL_SIZE,
+            )
+        return self._indexes[name]
+
+    def forget_index(self, name: str):
+        index = self._indexes.pop(name, None)
+        if index is not None:
+            index.close()
+
+    ################################################
+    ##              LIFECYCLE
+    ################################################
+
+    async def _open(self, client: httpx.AsyncClient, url: str, count: int):
+        # Concurrent requests force `count` separate connections into the pool; the
+        # status (usually 401/404 without auth) does not matter, only the handshake
+        results = await asyncio.gather(*(client.get(url) for _ in range(count)), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            print(f"Warm-up of {url} failed: {errors[0]!r}")
+
+    def _touch_index(self, index):
+        try:
+            index.describe_index_stats()
+        except Exception as e:
+            print(f"Warm-up of Pinecone index failed: {e}")
+
+    async def warm_up(self, count: int = None):
+        """Pre-connect to every upstream so the first turns skip connection setup."""
+        count = CONFIG.HTTP_WARM_CONNECTIONS if count is None else count
+        if count <= 0:
+            return
+        self.elevenlabs  # creates the ElevenLabs transport
+        tasks = [
+            self._open(self.openai_async, f"{CONFIG.OPENAI_BASE_URL}/models", count),
+            self._open(self._eleven_http, f"{CONFIG.ELEVEN_BASE_URL}/v1/models", count),
+        ]
+        for index in list(self._indexes.values()):
+            tasks.extend(asyncio.to_thread(self._touch_index, index) for _ in range(count))
+        await asyncio.gather(*tasks)
+        print(f"Upstream connections warmed ({count} per host)")
+
+    async def aclose(self):
+        if self._openai_async is not None:
+            await self._openai_async.aclose()
+        if self._eleven_http is not None:
+            await self._eleven_http.aclose()
+        if self._openai_sync is not None:
+            self._openai_sync.close()
+        for name in list(self._indexes):
+            self.forget_index(name)
+
+    def stats(self) -> Dict[str, Optional[int]]:
+        def pool_size(client) -> Optional[int]:
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            return len(pool.connections) if pool is not None else None
+
+        return {
+            "openai_connections": pool_size(self._openai_async),
+            "elevenlabs_connections": pool_size(self._eleven_http),
+            "pinecone_indexes": len(self._indexes),
+        }
+
+
+CLIENTS = UpstreamClients()
@@ -0,0 +1,94 @@
+import asyncio
+from contextlib import aclosing
+from typing import Any, AsyncGenerator, Callable, Dict, Hashable, List, Optional
+
+
+class Flight:
+    """
+    One upstream stream shared by every subscriber with the same key.
+
+    Chunks are kept for the lifetime of the flight, so a subscriber that joins late gets
+    everything produced so far and then the live tail. The upstream is closed once its
+    last subscriber leaves (e.g. everyone barged in).
+    """
+
+    def __init__(self, key: Hashable, source: AsyncGenerator, state: Any, on_finish: Callable[["Flight"], None]):
+        self.key = key
+        self.state = state  # leader-provided data that followers can read (e.g. context size)
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._on_finish = on_finish
+        self._changed = asyncio.Condition()
+        self._task = asyncio.create_task(self._produce(source))
+
+    async def _produce(self, source: AsyncGenerator):
+        try:
+            async with aclosing(source) as stream:
+                async for chunk in stream:
+                    self.chunks.append(chunk)
+                    async with self._changed:
+                        self._changed.notify_all()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._on_finish(self)
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncGenerator[Any, None]:
+        self.subscribers += 1
+        try:
+            position = 0
+            while True:
+                if position < len(self.chunks):
+                    position += 1
+                    yield self.chunks[position - 1]
+                    continue
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                async with self._changed:
+                    await self._changed.wait_for(lambda: position < len(self.chunks) or self.done)
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                self._on_finish(self)  # no new subscriber may join a flight being torn down
+                self._task.cancel()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests: the first caller for a key starts the upstream
+    stream, callers arriving while it runs subscribe to it. Upstream calls scale with distinct
+    keys in flight rather than with callers. Finished flights are forgotten, so a later
+    request starts afresh.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, Flight] = {}
+        self.started = 0
+        self.joined = 0
+
+    def join(self, key: Hashable, factory: Callable[[], AsyncGenerator], state: Any = None) -> Flight:
+        """The running flight for `key`, or a new one streaming `factory()`."""
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.joined += 1
+            return flight
+        flight = Flight(key, factory(), state, self._forget)
+        self._flights[key] = flight
+        self.started += 1
+        return flight
+
+    def _forget(self, flight: Flight):
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights), "started": self.started, "joined": self.joined}
@@ -1,74 +1,276 @@
 # Updated AudioGeneratorFromTextGenerator function
-from typing import AsyncGenerator, Dict, Any, Union
+import asyncio
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import AsyncGenerator, Dict, Any, Iterator, List, Optional
 from config import CONFIG
-from elevenlabs.client import ElevenLabs
+from elevenlabs.client import AsyncElevenLabs
+from utils.clients import CLIENTS
+from utils.segmenter import voice_segmenter
+from utils.metrics import TTS_BYTES_PER_SECOND, TTS_TTFB_SECONDS, span
+from utils.scheduler import TTS_CAPACITY
 
 eleven_api_key = CONFIG.ELEVEN_API_KEY
-BUFFER_LENGTH = 150
-OUTPUT_FORMAT ="pcm_16000" #"mp3_44100_128" 
+OUTPUT_FORMAT ="pcm_16000" #"mp3_44100_128"
 #"mp3_44100_128"
-async def AudioGeneratorFromTextGenerator(
-    text_chunk_generator: AsyncGenerator[str, None],
-    model_id: str = 'eleven_flash_v2_5',
-    voice_id: str = "jqcCZkN6Knx8BJ5TBdYR"
-) -> AsyncGenerator[Dict[str, Any], None]:
+
+_END = object()  # end-of-stream marker for the segment and audio queues
+
+
+class AudioCache:
     """
-    Generate audio from text chunks and yield structured data
+    Content-addressed, size-bounded disk cache of synthesized audio.
+
+    Entries are keyed by (normalized text, voice_id, model_id, output format) and stored
+    as one file each. Once the total size exceeds `max_bytes` the least recently used
+    files are deleted. Cached audio is streamed back from a memory-mapped file.
     """
-    buffer = ""
-    client = ElevenLabs(api_key=CONFIG.ELEVEN_API_KEY)
 
-    try:
-        async for chunk in text_chunk_generator:
-            chunk = chunk.strip()
-            if not chunk:
+    def __init__(self, directory: str, max_bytes: int, read_size: int = 8192):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.read_size = read_size
+        self.hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+        self._lock = threading.Lock()
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".tmp"):
+                os.remove(path)
                 continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._sizes[name] = size
+            self._total += size
 
-            buffer += chunk + " "
+    @staticmethod
+    def key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{normalized}\0{voice_id}\0{model_id}\0{output_format}".encode("utf-8")).hexdigest()
 
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
 
-            if len(buffer) > BUFFER_LENGTH or any(punct in buffer for punct in [ "." , "," , "?"]):
+    def read(self, key: str) -> Optional[Iterator[bytes]]:
+        """Chunks of a cached entry, or None on a miss."""
+        with self._lock:
+            if key not in self._sizes:
+                self.misses += 1
+                return None
+            self._sizes.move_to_end(key)
+        try:
+            os.utime(self._path(key))
+            with open(self._path(key), "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # evicted or removed since the lookup
+            with self._lock:
+                self._total -= self._sizes.pop(key, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self.bytes_served += len(data)
+        return self._iter(data)
 
+    def _iter(self, data: mmap.mmap) -> Iterator[bytes]:
+        try:
+            for start in range(0, len(data), self.read_size):
+                yield data[start:start + self.read_size]
+        finally:
+            data.close()
+
+    def write(self, key: str, chunks: List[bytes]):
+        data = b"".join(chunks)
+        if not data or len(data) > self.max_bytes:
+            return
+        # a temp file per writer: two sessions may synthesize the same sentence at once
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            os.remove(tmp)
+            raise
+        with self._lock:
+            self._total += len(data) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(data)
+            while self._total > self.max_bytes and self._sizes:
+                evicted, size = self._sizes.popitem(last=False)
+                self._total -= size
                 try:
-                    audio_stream = client.text_to_speech.stream(
-                        text=buffer.strip(),
-                        voice_id=voice_id,
-                        model_id=model_id,
-                        output_format=OUTPUT_FORMAT
-                    )
-  
-                    yield {"type": "text", "data": buffer.strip()}
-                
-                    for audio_chunk in audio_stream:
-                        if audio_chunk:
-                            yield {"type": "audio", "data": audio_chunk}
-                            
-                except Exception as e:
-                    print(f"Error generating audio: {e}")
-  
-                
-                buffer = ""
-
-        # Handle remaining buffer content
-        if buffer.strip():
-
-            try:
-                audio_stream = client.text_to_speech.stream(
-                    text=buffer.strip(),
-                    voice_id=voice_id,
-                    model_id=model_id,
-                    output_format=OUTPUT_FORMAT
-                )
-                yield {"type": "text", "data": buffer.strip()}
-            
-                for audio_chunk in audio_stream:
+                    os.remove(self._path(evicted))
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._sizes),
+            "bytes": self._total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "bytes_served": self.bytes_served,
+        }
+
+
+_audio_cache: Optional[AudioCache] = None
+
+
+def get_audio_cache() -> Optional[AudioCache]:
+    global _audio_cache
+    if _audio_cache is None and CONFIG.TTS_CACHE_ENABLED:
+        _audio_cache = AudioCache(CONFIG.TTS_CACHE_DIR, CONFIG.TTS_CACHE_MAX_BYTES)
+    return _audio_cache
+
+
+def get_tts_client() -> AsyncElevenLabs:
+    """The shared ElevenLabs client (pooled keep-alive connections)."""
+    return CLIENTS.elevenlabs
+
+
+async def _synthesize(
+    client: AsyncElevenLabs,
+    text: str,
+    voice_id: str,
+    model_id: str,
+    audio_queue: asyncio.Queue,
+):
+    """
+    Stream one segment's audio into its queue. Cached segments are replayed from disk;
+    otherwise ElevenLabs capacity is held while synthesizing and the result is cached.
+    A segment refused capacity (Overloaded) is shown as text only.
+    """
+    cache = get_audio_cache()
+    key = AudioCache.key(text, voice_id, model_id, OUTPUT_FORMAT)
+    ended = False
+    try:
+        start = time.perf_counter()
+        cached = cache.read(key) if cache is not None else None
+        if cached is not None:
+            for audio_chunk in cached:
+                audio_queue.put_nowait(audio_chunk)
+            TTS_TTFB_SECONDS.observe(time.perf_counter() - start, source="cache")
+            return
+
+        received = []
+        async with TTS_CAPACITY.slot(cost=len(text)):
+            # measured from when the request goes out, not while waiting for capacity
+            start = time.perf_counter()
+            first_byte = None
+            async with aclosing(client.text_to_speech.stream(
+                text=text,
+                voice_id=voice_id,
+                model_id=model_id,
+                output_format=OUTPUT_FORMAT
+            )) as stream:
+                async for audio_chunk in stream:
                     if audio_chunk:
-                        yield {"type": "audio", "data": audio_chunk}
-                        
-            except Exception as e:
-                print(f"Error generating final audio: {e}")
-                
-    except Exception as e:
-        print(f"Error in AudioGeneratorFromTextGenerator: {e}")
+                        if first_byte is None:
+                            first_byte = time.perf_counter()
+                            TTS_TTFB_SECONDS.observe(first_byte - start, source="api")
+                        received.append(audio_chunk)
+                        audio_queue.put_nowait(audio_chunk)
+            duration = time.perf_counter() - start
+            span("tts_segment", start, duration)
+            if received and duration > 0:
+                TTS_BYTES_PER_SECOND.observe(sum(len(chunk) for chunk in received) / duration)
+        # the segment is complete: the next one plays without waiting for the disk write
+        audio_queue.put_nowait(_END)
+        ended = True
+        if cache is not None:
+            await asyncio.to_thread(cache.write, key, received)
+    except asyncio.CancelledError:
         raise
+    except Exception as e:
+        print(f"Error generating audio: {e}")
+    finally:
+        if not ended:
+            audio_queue.put_nowait(_END)
+
+
+async def AudioGeneratorFromTextGenerator(
+    text_chunk_generator: AsyncGenerator[str, None],
+    model_id: str = 'eleven_flash_v2_5',
+    voice_id: str = "jqcCZkN6Knx8BJ5TBdYR",
+    lookahead: int = None,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Generate audio from text chunks and yield structured data
+
+    LLM tokens keep being read and segmented while earlier segments are synthesized.
+    At most `lookahead` segments are started and not yet played out (the one playing
+    included), so they synthesize concurrently while the producer never gets further
+    ahead; text and audio are still yielded strictly in segment order. Closing the generator (e.g. on barge-in) cancels
+    the producer and every synthesis, which closes the LLM and TTS streams.
+    """
+    client = get_tts_client()
+    slots = asyncio.Semaphore(lookahead or CONFIG.TTS_LOOKAHEAD)
+    segments: asyncio.Queue = asyncio.Queue()
+    synth_tasks: List[asyncio.Task] = []
+    failure: List[BaseException] = []
+
+    async def start_segment(text: str):
+        await slots.acquire()  # released once the segment has been played out
+        audio_queue: asyncio.Queue = asyncio.Queue()
+        synth_tasks.append(asyncio.create_task(
+            _synthesize(client, text, voice_id, model_id, audio_queue)
+        ))
+        await segments.put((text, audio_queue))
+
+    async def segment_text():
+        segmenter = voice_segmenter()
+        try:
+            async with aclosing(text_chunk_generator) as text_chunks:
+                async for chunk in text_chunks:
+                    for segment in segmenter.feed(chunk):
+                        if segment.strip():
+                            await start_segment(segment.strip())
 
+            # Handle remaining buffer content
+            remaining = segmenter.flush()
+            if remaining and remaining.strip():
+                await start_segment(remaining.strip())
+        except Exception as e:
+            print(f"Error in AudioGeneratorFromTextGenerator: {e}")
+            failure.append(e)
+        finally:
+            await segments.put(_END)
+
+    producer = asyncio.create_task(segment_text())
+    try:
+        while True:
+            segment = await segments.get()
+            if segment is _END:
+                break
+            text, audio_queue = segment
+            yield {"type": "text", "data": text}
+            while True:
+                audio_chunk = await audio_queue.get()
+                if audio_chunk is _END:
+                    break
+                yield {"type": "audio", "data": audio_chunk}
+            slots.release()
+        if failure:
+            raise failure[0]
+    finally:
+        producer.cancel()
+        for task in synth_tasks:
+            task.cancel()
+        await asyncio.gather(producer, *synth_tasks, return_exceptions=True)
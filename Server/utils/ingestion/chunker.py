@@ -0,0 +1,325 @@
+#########################################################################
+#                       Chunking
+#
+#   One chunker for every ingestion path (website scrapes, bulk uploads,
+#   text added from the admin API). Text is read as blocks: Markdown-style
+#   headings, fenced code, and paragraphs, lists and tables separated by
+#   blank lines, which is what the page extractor emits and what most
+#   uploaded documents look like.
+#   - blocks are packed up to CHUNK_TOKENS tokens of the embedding model's
+#     tokenizer; a block that is too long is split at its lines (list
+#     items, table rows), then sentences, then words
+#   - a heading starts a new chunk once the current one holds
+#     CHUNK_MIN_TOKENS, so small sections are packed together while
+#     larger ones are not mixed
+#   - a chunk that continues a section repeats the end of the previous
+#     one (CHUNK_OVERLAP_TOKENS, whole sentences) and starts with the
+#     section's heading path, which is also kept in its metadata; the
+#     path in the text is cut to a quarter of the chunk (outer headings
+#     go first), and a "#" line too long for a title is read as text
+#########################################################################
+
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from config import CONFIG
+from llm.tokens import CHARS_PER_TOKEN, encoding, text_tokens
+from pc.manifest import chunk_id, content_hash
+
+HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+FENCE = re.compile(r"^\s*(```|~~~)")
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+PATH_SEPARATOR = " > "
+# a longer "# ..." line is text (a flattened page, a line of hashtags), not a title
+MAX_HEADING_CHARS = 200
+# OpenAIEmbeddings' default model; chunk sizes are measured with its tokenizer
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+
+@dataclass
+class Block:
+    text: str
+    path: Tuple[str, ...]  # headings enclosing the block, outermost first
+    heading: bool = False
+    code: bool = False
+
+
+def parse_blocks(text: str) -> List[Block]:
+    """Headings, fenced code blocks and blank-line separated blocks, with their heading paths."""
+    blocks: List[Block] = []
+    headings: List[Tuple[int, str]] = []
+    lines: List[str] = []
+
+    def path() -> Tuple[str, ...]:
+        return tuple(title for _, title in headings)
+
+    def flush():
+        if lines:
+            body = "\n".join(lines).strip("\n")
+            if body.strip():
+                blocks.append(Block(body, path()))
+            lines.clear()
+
+    rows = text.splitlines()
+    i = 0
+    while i < len(rows):
+        row = rows[i]
+        fence = FENCE.match(row)
+        heading = HEADING.match(row)
+        if heading and len(heading.group(2)) > MAX_HEADING_CHARS:
+            heading = None
+        if fence:
+            flush()
+            end = i + 1
+            while end < len(rows) and not rows[end].strip().startswith(fence.group(1)):
+                end += 1
+            blocks.append(Block("\n".join(rows[i:end + 1]), path(), code=True))
+            i = end + 1
+            continue
+        if heading:
+            flush()
+            level = len(heading.group(1))
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            headings.append((level, heading.group(2)))
+            blocks.append(Block(row.strip(), path(), heading=True))
+        elif not row.strip():
+            flush()
+        else:
+            lines.append(row.rstrip())
+        i += 1
+    flush()
+    return blocks
+
+
+@dataclass
+class _Unit:
+    text: str
+    tokens: int
+    joiner: str  # separator before this unit when it follows another one
+    path: Tuple[str, ...]
+    heading: bool = False
+
+
+class Chunker:
+    """Splits text into chunks of at most `target_tokens` tokens along its structure."""
+
+    def __init__(self, target_tokens: int = 256, overlap_tokens: int = 32, min_tokens: int = 64, model: str = EMBEDDING_MODEL):
+        self.target_tokens = target_tokens
+        self.overlap_tokens = min(overlap_tokens, target_tokens // 4)
+        self.min_tokens = min_tokens
+        self.model = model
+        self._crumbs = {}
+
+    def tokens(self, text: str) -> int:
+        return text_tokens(text, self.model)
+
+    ################################################
+    ##              UNITS
+    ################################################
+
+    def _pieces(self, text: str, limit: int, code: bool) -> List[Tuple[str, str]]:
+        """(piece, joiner) parts of a block too long for one chunk, each within `limit` tokens."""
+        lines = [line for line in text.split("\n") if line.strip()]
+        if len(lines) > 1 and (code or not _is_prose(lines)):
+            parts, joiner = lines, "\n"  # list items, table rows, code lines
+        else:
+            prose = " ".join(line.strip() for line in lines)
+            parts = [part for part in SENTENCE_END.split(prose) if part]
+            joiner = " "
+            if len(parts) == 1:
+                parts = prose.split(" ")
+        if len(parts) == 1:
+            return [(piece, "") for piece in self._slice(parts[0], limit)]
+        pieces = []
+        for part in parts:
+            if self.tokens(part) <= limit:
+                pieces.append((part, joiner))
+            else:
+                pieces.extend((piece, joiner if i == 0 else "") for i, (piece, _) in enumerate(self._pieces(part, limit, code)))
+        return pieces
+
+    def _slice(self, text: str, limit: int) -> List[str]:
+        """Token slices of one unbreakable run (a long URL, a minified line)."""
+        enc = encoding(self.model)
+        if enc is None:
+            size = max((limit - 1) * CHARS_PER_TOKEN, 1)
+            return [text[i:i + size] for i in range(0, len(text), size)]
+        tokens = enc.encode(text, disallowed_special=())
+        return [enc.decode(tokens[i:i + limit]) for i in range(0, len(tokens), limit)]
+
+    def _units(self, block: Block) -> List[_Unit]:
+        # room for the heading path line in front of a continuation chunk
+        limit = max(self.target_tokens - self._prefix(block.path) - 2, 1)
+        count = self.tokens(block.text)
+        if count <= limit:
+            return [_Unit(block.text, count, "\n\n", block.path, block.heading)]
+        pieces = self._pieces(block.text, limit, block.code)
+        units = [_Unit(piece, self.tokens(piece), joiner, block.path) for piece, joiner in pieces]
+        units[0].joiner = "\n\n"
+        return units
+
+    ################################################
+    ##              PACKING
+    ################################################
+
+    def _crumb(self, path: Tuple[str, ...]) -> Tuple[str, int]:
+        """The heading path line put in front of a chunk and its tokens, within a quarter of the target."""
+        if path not in self._crumbs:
+            if len(self._crumbs) >= 4096:
+                self._crumbs.clear()
+            crumb, count = "", 0
+            for start in range(len(path)):
+                text = PATH_SEPARATOR.join(path[start:])
+                count = self.tokens(text) + 1
+                if count <= self.target_tokens // 4:
+                    crumb = text
+                    break
+            self._crumbs[path] = (crumb, count if crumb else 0)
+        return self._crumbs[path]
+
+    def _prefix(self, path: Tuple[str, ...]) -> int:
+        return self._crumb(path)[1]
+
+    def _size(self, units: List[_Unit]) -> int:
+        """Estimated tokens of the rendered chunk; a space mostly merges into the next word's token."""
+        return self._prefix(units[0].path) + sum(unit.tokens + _cost(unit) for unit in units)
+
+    def _breadcrumb(self, units: List[_Unit]) -> str:
+        # a chunk opening with a heading only needs the headings above it
+        return self._crumb(units[0].path[:-1] if units[0].heading else units[0].path)[0]
+
+    def _render(self, units: List[_Unit], breadcrumb: bool = True) -> str:
+        body = units[0].text + "".join(unit.joiner + unit.text for unit in units[1:])
+        crumb = self._breadcrumb(units) if breadcrumb else ""
+        return f"{crumb}\n\n{body}" if crumb else body
+
+    def _overlap(self, units: List[_Unit]) -> List[_Unit]:
+        """Whole trailing units (or sentences of the last one) within the overlap budget."""
+        tail: List[_Unit] = []
+        budget = self.overlap_tokens
+        for unit in reversed(units):
+            if unit.heading:
+                break
+            if unit.tokens <= budget:
+                tail.insert(0, unit)
+                budget -= unit.tokens
+                continue
+            sentences = [sentence for sentence in SENTENCE_END.split(unit.text) if sentence]
+            for sentence in reversed(sentences[1:]):
+                count = self.tokens(sentence)
+                if count > budget:
+                    break
+                tail.insert(0, _Unit(sentence, count, " ", unit.path))
+                budget -= count
+            break
+        if tail:
+            tail[0] = _Unit(tail[0].text, tail[0].tokens, "\n\n", tail[0].path)
+        return tail
+
+    def split(self, text: str) -> List[dict]:
+        """
+        Chunks as {"content", "heading_path", "breadcrumb", "token_count"}; `breadcrumb` is the
+        heading path line the content starts with ("" if none), followed by a blank line.
+        """
+        chunks: List[dict] = []
+        queue = deque(unit for block in parse_blocks(text) for unit in self._units(block))
+        units: List[_Unit] = []
+
+        def emit(carry: bool) -> List[_Unit]:
+            """Close the current chunk; returns the units that did not fit after all."""
+            nonlocal units
+            overflow: List[_Unit] = []
+            while True:
+                content = self._render(units)
+                count = self.tokens(content)
+                if count <= self.target_tokens or len(units) == 1:
+                    break
+                overflow.insert(0, units.pop())  # the estimate was short; the real count decides
+            breadcrumb = self._breadcrumb(units)
+            if count > self.target_tokens:
+                content, breadcrumb = self._render(units, breadcrumb=False), ""
+                count = self.tokens(content)
+            chunks.append({
+                "content": content,
+                "heading_path": PATH_SEPARATOR.join(units[0].path),
+                "breadcrumb": breadcrumb,
+                "token_count": count,
+            })
+            units = self._overlap(units) if carry and not overflow else []
+            return overflow
+
+        while queue or units:
+            if not queue:
+                queue.extend(emit(carry=False))
+                continue
+            unit = queue.popleft()
+            if units:
+                section_break = unit.heading and self._size(units) >= self.min_tokens
+                if section_break or self._size(units) + unit.tokens + _cost(unit) > self.target_tokens:
+                    overflow = emit(carry=not unit.heading and unit.path == units[-1].path)
+                    queue.appendleft(unit)
+                    queue.extendleft(reversed(overflow))
+                    if units and self._size(units) + unit.tokens + _cost(unit) > self.target_tokens:
+                        units = []  # the overlap would not leave room for the next unit
+                    continue
+            units.append(unit)
+        return chunks
+
+
+def _cost(unit: _Unit) -> int:
+    return 1 if "\n" in unit.joiner else 0
+
+
+def _is_prose(lines: List[str]) -> bool:
+    """Hard-wrapped paragraph rather than a list or table: most lines are not items or rows."""
+    structured = sum(1 for line in lines if line.lstrip()[:2] in ("- ", "* ", "+ ") or " | " in line or line.lstrip()[:1].isdigit())
+    return structured < len(lines) / 2
+
+
+_chunker: Optional[Chunker] = None
+
+
+def get_chunker() -> Chunker:
+    """The chunker configured by CHUNK_TOKENS / CHUNK_OVERLAP_TOKENS / CHUNK_MIN_TOKENS."""
+    global _chunker
+    if _chunker is None:
+        _chunker = Chunker(CONFIG.CHUNK_TOKENS, CONFIG.CHUNK_OVERLAP_TOKENS, CONFIG.CHUNK_MIN_TOKENS)
+    return _chunker
+
+
+def chunk_records(records: List[dict]) -> Tuple[List[Document], List[str]]:
+    """
+    Chunk free-text records ({"text", optional "id" and "metadata"}), one source document per
+    record. Chunk IDs are deterministic, so loading the same record twice does not duplicate it.
+    """
+    chunker = get_chunker()
+    documents, ids = [], []
+    for record in records:
+        text = record.get("text") or ""
+        if not text.strip():
+            continue
+        source_id = str(record.get("id") or content_hash(text))
+        chunks = chunker.split(text)
+        for idx, chunk in enumerate(chunks):
+            chunk_hash = content_hash(chunk["content"])
+            ids.append(chunk_id(source_id, chunk_hash))
+            documents.append(Document(
+                page_content=chunk["content"],
+                metadata={
+                    **(record.get("metadata") or {}),
+                    "source_id": source_id,
+                    "chunk_index": idx,
+                    "total_chunks": len(chunks),
+                    "char_count": len(chunk["content"]),
+                    "token_count": chunk["token_count"],
+                    "heading_path": chunk["heading_path"],
+                    "breadcrumb": chunk["breadcrumb"],
+                    "chunk_hash": chunk_hash,
+                },
+            ))
+    return documents, ids
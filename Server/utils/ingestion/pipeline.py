@@ -0,0 +1,447 @@
+import asyncio
+import json
+import os
+import random
+import time
+import traceback
+import uuid
+from collections import deque
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set, Union
+
+from config import CONFIG
+from pc.pinecone import PineconeClient
+from utils.ingestion.chunker import chunk_records
+from utils.webscrapper.crawler import Crawler
+from utils.webscrapper.webscrapper import PageChunk, chunk_pages
+from utils.metrics import INGEST_ITEMS, stage
+from utils.scheduler import OPENAI_CAPACITY, Priority, admission
+from utils.workers import run_in_worker
+
+PREVIEW_CHUNKS = 10
+_DONE = object()  # end-of-stream marker passed down the stage queues
+
+
+class IngestionJob:
+    """State and live counters of one background ingestion run."""
+
+    COUNTERS = (
+        "pages", "documents", "not_modified", "removed", "chunks", "unchanged", "duplicates",
+        "embedded", "upserted", "deleted", "invalid",
+    )
+
+    def __init__(self, kind: str, params: dict, index_name: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        # every write of the job goes to this index, even if the default is switched while it runs
+        self.index_name = index_name
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.counters: Dict[str, int] = {name: 0 for name in self.COUNTERS}
+        self.preview: List[PageChunk] = []
+        # IDs that passed the near-duplicate check but are not upserted yet
+        self.unstored: Set[str] = set()
+        self.task: Optional[asyncio.Task] = None
+
+    def add(self, counter: str, amount: int = 1):
+        self.counters[counter] += amount
+        INGEST_ITEMS.inc(amount, stage=counter)
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        rates = {
+            f"{name}_per_sec": round(self.counters[name] / elapsed, 2) if elapsed else 0.0
+            for name in ("pages", "documents", "chunks", "embedded", "upserted")
+        }
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "error": self.error,
+            "elapsed": round(elapsed, 3),
+            **self.counters,
+            **rates,
+            "preview": self.preview,
+        }
+
+
+async def with_retries(label: str, fn, *args, attempts: int = None, base_delay: float = None, **kwargs):
+    """Await `fn(*args)`, retrying failures with jittered exponential backoff."""
+    attempts = attempts or CONFIG.INGEST_RETRIES
+    base_delay = CONFIG.INGEST_RETRY_DELAY if base_delay is None else base_delay
+    for attempt in range(1, attempts + 1):
+        try:
+            return await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            delay = base_delay * (2 ** (attempt - 1)) * (0.5 + random.random())
+            print(f"{label} failed (attempt {attempt}/{attempts}): {e}. Retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+class _BatchWriter:
+    """Groups (document, id) pairs into embedding batches on a bounded queue."""
+
+    def __init__(self, queue: asyncio.Queue, size: int, consumers: int):
+        self.queue = queue
+        self.size = size
+        self.consumers = consumers
+        self.batch = []
+
+    async def add(self, documents, ids):
+        for item in zip(documents, ids):
+            self.batch.append(item)
+            if len(self.batch) >= self.size:
+                await self.queue.put(self.batch)
+                self.batch = []
+
+    async def close(self):
+        if self.batch:
+            await self.queue.put(self.batch)
+            self.batch = []
+        for _ in range(self.consumers):
+            await self.queue.put(_DONE)
+
+
+async def _aiter(records: Union[Iterable[dict], AsyncIterable[dict]]) -> AsyncIterator[dict]:
+    if hasattr(records, "__aiter__"):
+        async for record in records:
+            yield record
+    else:
+        for record in records:
+            yield record
+            await asyncio.sleep(0)  # let other tasks run between records
+
+
+class IngestionPipeline:
+    """
+    Streaming ingestion: fetch -> extract -> chunk -> embed (batched) -> upsert (batched).
+
+    Every stage runs as its own task and hands work to the next through a bounded queue,
+    so a slow stage applies backpressure upstream and memory stays flat whatever the
+    size of the input. Embedding and upsert calls are retried with backoff.
+    """
+
+    def __init__(self, pc: PineconeClient):
+        self.pc = pc
+        self.queue_size = CONFIG.INGEST_QUEUE_SIZE
+        self.embed_batch_size = CONFIG.EMBED_BATCH_SIZE
+        self.upsert_batch_size = CONFIG.UPSERT_BATCH_SIZE
+        self.embed_workers = CONFIG.INGEST_EMBED_WORKERS
+        self.upsert_workers = CONFIG.INGEST_UPSERT_WORKERS
+        self.chunk_window = 2 * max(CONFIG.INGEST_PROCESSES, 1)  # chunking jobs handed to the workers at once
+
+    ################################################
+    ##          EMBED + UPSERT STAGES
+    ################################################
+
+    async def _sink(self, job: IngestionJob, embed_queue: asyncio.Queue, on_upserted: Callable = None):
+        """Embed and upsert batches from `embed_queue` until every embed worker got _DONE."""
+        pc = self.pc
+        upsert_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        async def embed_stage():
+            while True:
+                batch = await embed_queue.get()
+                if batch is _DONE:
+                    break
+                texts = [doc.page_content for doc, _ in batch]
+                # shares OpenAI capacity with live turns, which are always served first
+                async with OPENAI_CAPACITY.slot(cost=sum(len(text) for text in texts) // 4):
+                    with stage("ingest_embed_batch"):
+                        vectors = await with_retries("Embedding batch", pc.embeddings.aembed_documents, texts)
+                job.add("embedded", len(batch))
+                for start in range(0, len(batch), self.upsert_batch_size):
+                    end = start + self.upsert_batch_size
+                    await upsert_queue.put((batch[start:end], vectors[start:end]))
+
+        async def upsert_stage():
+            while True:
+                item = await upsert_queue.get()
+                if item is _DONE:
+                    break
+                batch, vectors = item
+                documents = [doc for doc, _ in batch]
+                ids = [doc_id for _, doc_id in batch]
+                with stage("ingest_upsert_batch"):
+                    await with_retries(
+                        "Upsert batch", asyncio.to_thread, pc.upsert_embeddings, documents, vectors, ids, job.index_name
+                    )
+                job.unstored.difference_update(ids)
+                job.add("upserted", len(batch))
+                if on_upserted is not None:
+                    on_upserted(documents)
+
+        async def close_upserts():
+            await asyncio.gather(*embedders)
+            for _ in range(self.upsert_workers):
+                await upsert_queue.put(_DONE)
+
+        embedders = [asyncio.create_task(embed_stage()) for _ in range(self.embed_workers)]
+        upserters = [asyncio.create_task(upsert_stage()) for _ in range(self.upsert_workers)]
+        closer = asyncio.create_task(close_upserts())
+        try:
+            # gather raises on the first failure, so a dead stage cannot leave the others blocked
+            await asyncio.gather(closer, *upserters)
+        finally:
+            for task in embedders + upserters + [closer]:
+                task.cancel()
+
+    async def _run(self, job: IngestionJob, *stages):
+        embed_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        with admission(Priority.INGEST):  # stage tasks inherit the lowest priority
+            tasks = [asyncio.create_task(stage(embed_queue)) for stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            if job.unstored:
+                # failed or cancelled: their duplicates must not be skipped against chunks never stored
+                self.pc.unstored(job.unstored, job.index_name)
+                job.unstored.clear()
+            if job.counters["upserted"] or job.counters["deleted"] or job.counters["removed"]:
+                self.pc.bump_version(job.index_name)
+
+    ################################################
+    ##              WEBSITE SCRAPE
+    ################################################
+
+    async def run_scrape(self, job: IngestionJob, url: str, link_limit: int, max_depth: int):
+        """A page's manifest entry is committed only once all of its new chunks are upserted."""
+        pc = self.pc
+        job.index_name = job.index_name or pc.getIndexName()
+        crawler = Crawler(
+            max_pages=link_limit + 1,
+            max_depth=max_depth,
+            concurrency=CONFIG.CRAWL_CONCURRENCY,
+            per_host_concurrency=CONFIG.CRAWL_PER_HOST_CONCURRENCY,
+            delay=CONFIG.CRAWL_DELAY,
+            respect_robots=CONFIG.CRAWL_RESPECT_ROBOTS,
+            manifest=pc.manifest,
+            index_name=job.index_name,
+        )
+        page_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        # url -> [new chunks still to upsert, manifest entry]
+        pending_pages: Dict[str, list] = {}
+
+        def settle(url: str, upserted: int):
+            page = pending_pages[url]
+            page[0] -= upserted
+            if page[0] <= 0:
+                pc.commit_scrape_page(url, page[1], job.index_name)
+                del pending_pages[url]
+
+        def on_upserted(documents):
+            for doc in documents:
+                settle(doc.metadata["source_url"], 1)
+
+        async def fetch_stage(_):
+            async for page_url, text in crawler.crawl(url):
+                job.add("pages")
+                await page_queue.put({"url": page_url, "content": text, "validators": crawler.validators.get(page_url)})
+            job.counters["not_modified"] = len(crawler.not_modified)
+            if crawler.gone:
+                job.add("removed", await asyncio.to_thread(pc.remove_sources, crawler.gone, job.index_name))
+            await page_queue.put(_DONE)
+
+        async def plan(page_url: str, page_chunks: List[PageChunk], writer: _BatchWriter):
+            job.add("chunks", len(page_chunks))
+            if len(job.preview) < PREVIEW_CHUNKS:
+                job.preview.extend(page_chunks[:PREVIEW_CHUNKS - len(job.preview)])
+
+            documents, ids, stale, entries, duplicates = await asyncio.to_thread(
+                pc.plan_scrape_data, page_chunks, [page_url], job.index_name
+            )
+            if stale:
+                await asyncio.to_thread(pc.delete_ids, stale, job.index_name)
+                job.add("deleted", len(stale))
+            # every skipped near-duplicate is an embedding (and a stored vector) saved
+            job.add("duplicates", duplicates)
+            job.add("unchanged", len(page_chunks) - len(documents) - duplicates)
+            for entry_url, entry in entries.items():
+                pending_pages[entry_url] = [0, entry]
+            for document in documents:
+                pending_pages[document.metadata["source_url"]][0] += 1
+            for entry_url in entries:
+                if pending_pages[entry_url][0] == 0:
+                    settle(entry_url, 0)
+            job.unstored.update(ids)
+            await writer.add(documents, ids)
+
+        async def chunk_stage(embed_queue):
+            writer = _BatchWriter(embed_queue, self.embed_batch_size, self.embed_workers)
+            # pages are chunked in the worker processes in parallel, and planned in arrival order
+            in_flight: deque = deque()
+            try:
+                while True:
+                    page = await page_queue.get()
+                    if page is _DONE:
+                        break
+                    in_flight.append((page["url"], asyncio.ensure_future(run_in_worker(chunk_pages, [page]))))
+                    if len(in_flight) >= self.chunk_window:
+                        page_url, task = in_flight.popleft()
+                        await plan(page_url, await task, writer)
+                while in_flight:
+                    page_url, task = in_flight.popleft()
+                    await plan(page_url, await task, writer)
+            finally:
+                for _, task in in_flight:
+                    task.cancel()
+            await writer.close()
+
+        await self._run(
+            job, fetch_stage, chunk_stage, lambda embed_queue: self._sink(job, embed_queue, on_upserted)
+        )
+
+    ################################################
+    ##              BULK DOCUMENTS
+    ################################################
+
+    async def run_bulk(self, job: IngestionJob, records: Union[Iterable[dict], AsyncIterable[dict]]):
+        """Ingest a stream of {"text", optional "id" and "metadata"} records."""
+        pc = self.pc
+        job.index_name = job.index_name or pc.getIndexName()
+
+        async def chunk_stage(embed_queue):
+            writer = _BatchWriter(embed_queue, self.embed_batch_size, self.embed_workers)
+            batch = []
+
+            async def flush():
+                # records are chunked in the worker processes, a share of the batch each
+                parts = [batch[i::self.chunk_window] for i in range(min(self.chunk_window, len(batch)))]
+                documents, ids = [], []
+                for part_documents, part_ids in await asyncio.gather(*(run_in_worker(chunk_records, part) for part in parts)):
+                    documents.extend(part_documents)
+                    ids.extend(part_ids)
+                job.add("documents", len(batch))
+                job.add("chunks", len(documents))
+                documents, ids, duplicates = await asyncio.to_thread(pc.drop_near_duplicates, documents, ids, job.index_name)
+                job.add("duplicates", len(duplicates))
+                job.unstored.update(ids)
+                await writer.add(documents, ids)
+                batch.clear()
+
+            async for record in _aiter(records):
+                batch.append(record)
+                if len(batch) >= self.embed_batch_size:
+                    await flush()
+            if batch:
+                await flush()
+            await writer.close()
+
+        await self._run(job, chunk_stage, lambda embed_queue: self._sink(job, embed_queue))
+
+
+def read_ndjson(path: str, on_invalid: Callable[[int, str], None] = None) -> Iterator[dict]:
+    """
+    Stream records from an NDJSON file, one JSON object (or bare string) per line.
+    Other lines are skipped and reported to `on_invalid(line_number, reason)`.
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                reason = f"invalid JSON: {e}"
+            else:
+                if isinstance(record, str):
+                    record = {"text": record}
+                if isinstance(record, dict):
+                    yield record
+                    continue
+                reason = f"expected an object or a string, got {type(record).__name__}"
+            if on_invalid is not None:
+                on_invalid(number, reason)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class JobManager:
+    """Registry of background ingestion jobs (kept in memory, newest last)."""
+
+    def __init__(self, max_jobs: int = 100):
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, IngestionJob] = {}
+
+    def submit_scrape(self, pc: PineconeClient, url: str, link_limit: int, max_depth: int = 1) -> IngestionJob:
+        index_name = pc.getIndexName()
+        job = IngestionJob("scrape", {"url": url, "limit": link_limit, "depth": max_depth, "index": index_name}, index_name)
+        pipeline = IngestionPipeline(pc)
+        job.task = asyncio.create_task(self._run(job, pipeline.run_scrape(job, url, link_limit, max_depth)))
+        self._remember(job)
+        return job
+
+    async def _run(self, job: IngestionJob, work):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            await work
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            traceback.print_exc()
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            print(f"Ingestion job {job.id} {job.status}: {job.counters}")
+
+    def submit_bulk(self, pc: PineconeClient, records: Union[Iterable[dict], AsyncIterable[dict]], name: str = None) -> IngestionJob:
+        index_name = pc.getIndexName()
+        job = IngestionJob("bulk", {"source": name, "index": index_name}, index_name)
+        pipeline = IngestionPipeline(pc)
+        job.task = asyncio.create_task(self._run(job, pipeline.run_bulk(job, records)))
+        self._remember(job)
+        return job
+
+    def submit_bulk_file(self, pc: PineconeClient, path: str, name: str = None) -> IngestionJob:
+        """Bulk-load an NDJSON file, which is removed once the job ends, however it ends."""
+
+        def invalid(number: int, reason: str):
+            job.add("invalid")
+            print(f"Ingestion job {job.id}: skipped line {number} of {name or path}: {reason}")
+
+        job = self.submit_bulk(pc, read_ndjson(path, on_invalid=invalid), name=name)
+        # a done callback also runs for a job cancelled before it started, unlike a finally
+        job.task.add_done_callback(lambda _: _remove(path))
+        return job
+
+    def _remember(self, job: IngestionJob):
+        self._jobs[job.id] = job
+        finished = [j for j in self._jobs.values() if j.finished_at is not None]
+        while len(self._jobs) > self.max_jobs and finished:
+            del self._jobs[finished.pop(0).id]
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestionJob]:
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job.task is None or job.task.done():
+            return False
+        job.task.cancel()
+        return True
+
+
+JOBS = JobManager()
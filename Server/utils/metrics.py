@@ -0,0 +1,311 @@
+#########################################################################
+#                           Metrics
+#
+#   Counters, gauges and histograms rendered in the Prometheus text
+#   format on GET /metrics, plus optional per-turn trace spans.
+#
+#   - stage("retrieval") times a block: the duration is observed in
+#     chatbot_stage_seconds{stage="retrieval"} and, when turn tracing
+#     is on, recorded as a span of the current turn
+#   - a turn's trace follows the turn's task and every task it starts
+#     (contextvars), so spans from the TTS workers land in it too
+#########################################################################
+
+import bisect
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import CONFIG
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 1000, 10_000, 100_000, 1_000_000)
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """A settable value, or one read from `source` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), source: Callable[[], float] = None):
+        super().__init__(name, help, labels)
+        self.source = source
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[str]:
+        if self.source is not None:
+            try:
+                return [f"{self.name} {_number(self.source())}"]
+            except Exception as e:
+                print(f"Metrics : gauge {self.name} failed: {e}")
+                return []
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(series[0]), series[1], series[2])) for key, series in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (), source: Callable[[], float] = None) -> Gauge:
+        return self.register(Gauge(name, help, labels, source))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+################################################
+##              CHATBOT METRICS
+################################################
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "chatbot_stage_seconds", "Latency of one pipeline stage", ["stage"]
+)
+LLM_TTFT_SECONDS = REGISTRY.histogram(
+    "chatbot_llm_time_to_first_token_seconds", "LLM request to first streamed token"
+)
+LLM_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "chatbot_llm_tokens_per_second", "Streamed tokens per second after the first token", buckets=RATE_BUCKETS
+)
+TTS_TTFB_SECONDS = REGISTRY.histogram(
+    "chatbot_tts_time_to_first_byte_seconds", "TTS request to first audio byte", ["source"]
+)
+TTS_BYTES_PER_SECOND = REGISTRY.histogram(
+    "chatbot_tts_bytes_per_second", "Audio bytes per second of one synthesized segment", buckets=RATE_BUCKETS
+)
+WS_SEND_SECONDS = REGISTRY.histogram(
+    "chatbot_ws_send_seconds", "Time to hand one message to the WebSocket", ["kind"]
+)
+SEGMENTS_PER_TURN = REGISTRY.histogram(
+    "chatbot_segments_per_turn", "Text segments sent in one turn", ["type"], buckets=COUNT_BUCKETS
+)
+CONTEXT_TOKENS = REGISTRY.histogram(
+    "chatbot_context_tokens", "Retrieved context tokens in one prompt", buckets=(0, 100, 250, 500, 1000, 2000, 4000)
+)
+TURNS_TOTAL = REGISTRY.counter(
+    "chatbot_turns_total", "Finished turns by outcome", ["type", "outcome"]
+)
+COALESCED_TURNS = REGISTRY.counter(
+    "chatbot_coalesced_turns_total", "Turns that started (leader) or joined (follower) a shared generation", ["role"]
+)
+ACTIVE_CONNECTIONS = REGISTRY.gauge(
+    "chatbot_active_connections", "Open WebSocket connections"
+)
+INGEST_ITEMS = REGISTRY.counter(
+    "chatbot_ingest_items_total", "Items processed by ingestion jobs", ["stage"]
+)
+
+################################################
+##              TURN TRACES
+################################################
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+_recent_traces: deque = deque(maxlen=100)
+
+
+class Trace:
+    """Spans (name, start offset, duration) of one turn."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans: List[Tuple[str, float, float]] = []
+        self.duration: Optional[float] = None
+
+    def add(self, name: str, start: float, duration: float):
+        self.spans.append((name, start - self.start, duration))
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "duration_ms": round((self.duration or 0) * 1000, 1),
+            "spans": [
+                {"name": name, "start_ms": round(offset * 1000, 1), "duration_ms": round(duration * 1000, 1)}
+                for name, offset, duration in sorted(self.spans, key=lambda span: span[1])
+            ],
+        }
+
+    def summary(self) -> str:
+        spans = ", ".join(f"{name} +{offset * 1000:.0f}ms/{duration * 1000:.0f}ms" for name, offset, duration in sorted(self.spans, key=lambda span: span[1]))
+        return f"Trace {self.name} {self.duration * 1000:.0f}ms: {spans}"
+
+
+@contextmanager
+def trace_turn(name: str) -> Iterator[Optional[Trace]]:
+    """Collect the spans of one turn (if TRACE_TURNS is on) and log them when it ends."""
+    if not CONFIG.TRACE_TURNS:
+        yield None
+        return
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.duration = time.perf_counter() - trace.start
+        _recent_traces.append(trace)
+        print(trace.summary())
+
+
+def span(name: str, start: float, duration: float):
+    """Record an already measured span on the current turn's trace, if any."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, start, duration)
+
+
+def observe_stage(name: str, start: float) -> float:
+    """Record a stage that began at `start` (perf_counter) and ends now; returns its duration."""
+    duration = time.perf_counter() - start
+    STAGE_SECONDS.observe(duration, stage=name)
+    span(name, start, duration)
+    return duration
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block into chatbot_stage_seconds and the current trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, start)
+
+
+def recent_traces() -> List[dict]:
+    return [trace.to_dict() for trace in reversed(_recent_traces)]
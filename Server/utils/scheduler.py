@@ -0,0 +1,284 @@
+#########################################################################
+#                       Admission control
+#
+#   Upstream capacity (OpenAI, ElevenLabs) is handed out by pools with
+#   - a global concurrency cap and a per-connection cap
+#   - an optional token (or character) rate budget per minute
+#   - strict priority between waiters: voice, then chat, then ingestion
+#   - a deadline: a request whose expected wait exceeds its priority's
+#     deadline is rejected at once (Overloaded) instead of queueing
+#
+#   Priority, connection and deadline travel with the turn in a
+#   contextvar (see `admission`), so the LLM and TTS call sites only
+#   say how much they are about to spend.
+#########################################################################
+
+import asyncio
+import contextvars
+import itertools
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Dict, Iterator, List, Optional
+
+from config import CONFIG
+from utils.metrics import LATENCY_BUCKETS, REGISTRY
+
+QUEUE_SECONDS = REGISTRY.histogram(
+    "chatbot_admission_wait_seconds", "Time a request waited for upstream capacity", ["pool", "priority"],
+    buckets=(0.0,) + LATENCY_BUCKETS,
+)
+REJECTED = REGISTRY.counter(
+    "chatbot_admission_rejected_total", "Requests refused because the wait would exceed their deadline", ["pool", "priority"]
+)
+IN_USE = REGISTRY.gauge("chatbot_admission_active", "Upstream requests holding capacity", ["pool"])
+WAITING = REGISTRY.gauge("chatbot_admission_waiting", "Requests queued for upstream capacity", ["pool"])
+
+
+class Priority(IntEnum):
+    VOICE = 0
+    CHAT = 1
+    INGEST = 2
+
+
+class Overloaded(Exception):
+    """Upstream capacity will not free up within the request's deadline."""
+
+    def __init__(self, pool: str, retry_after: float):
+        super().__init__(f"The assistant is busy right now ({pool}), please try again in a few seconds.")
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+@dataclass
+class Admission:
+    priority: Priority = Priority.CHAT
+    connection: Optional[str] = None
+    deadline: Optional[float] = None  # seconds a request may wait; None waits as long as it takes
+
+
+_admission: contextvars.ContextVar = contextvars.ContextVar("admission", default=Admission())
+
+
+def deadline_for(priority: Priority) -> Optional[float]:
+    if priority == Priority.VOICE:
+        return CONFIG.ADMISSION_DEADLINE_VOICE
+    if priority == Priority.CHAT:
+        return CONFIG.ADMISSION_DEADLINE_CHAT
+    return None
+
+
+@contextmanager
+def admission(priority: Priority, connection: Optional[str] = None) -> Iterator[Admission]:
+    """Requests made inside (and by tasks started inside) are admitted with these settings."""
+    current = Admission(priority, connection, deadline_for(priority))
+    token = _admission.set(current)
+    try:
+        yield current
+    finally:
+        _admission.reset(token)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "connection", "cost", "future")
+
+    def __init__(self, priority: int, seq: int, connection: Optional[str], cost: float, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.connection = connection
+        self.cost = cost
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class Lease:
+    """Capacity held by one request; `spent` corrects the rate budget once the real cost is known."""
+
+    def __init__(self, pool: "CapacityPool", connection: Optional[str], cost: float):
+        self.pool = pool
+        self.connection = connection
+        self.cost = cost
+        self.started = time.monotonic()
+        self.released = False
+
+    def spent(self, actual: float):
+        self.pool._charge(actual - self.cost)
+        self.cost = actual
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.pool._release(self)
+
+
+class CapacityPool:
+    """
+    Concurrency and rate budget for one upstream. Waiters are served in priority order;
+    a waiter held back only by its own connection's cap lets lower ones pass.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, per_connection: int = 0, rate_per_minute: float = 0, burst_seconds: float = 10):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.per_connection = per_connection
+        self.rate = rate_per_minute / 60.0  # budget units per second; 0 = unlimited
+        self.capacity = self.rate * burst_seconds
+        self.budget = self.capacity
+        self.active = 0
+        self.hold_time = 1.0  # moving average of how long a lease is held
+        self._refilled = time.monotonic()
+        self._connections: Dict[Optional[str], int] = {}
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    ################################################
+    ##              BUDGET
+    ################################################
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self.budget = min(self.capacity, self.budget + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _charge(self, amount: float):
+        if self.rate:
+            self._refill()
+            self.budget -= amount
+
+    def _fits(self, connection: Optional[str]) -> bool:
+        return not self.per_connection or connection is None or self._connections.get(connection, 0) < self.per_connection
+
+    def _open(self) -> bool:
+        """A slot is free and the rate budget is not in debt."""
+        return self.active < self.max_concurrent and (not self.rate or self.budget >= 0)
+
+    def expected_wait(self, priority: int) -> float:
+        """Rough time until a new request of `priority` would be admitted."""
+        self._refill()
+        ahead = sum(1 for waiter in self._waiters if waiter.priority <= priority)
+        free = self.max_concurrent - self.active
+        # with every slot busy, leases finish at about max_concurrent / hold_time per second
+        wait = 0.0 if ahead < free else (ahead - free + 1) * self.hold_time / self.max_concurrent
+        if self.rate and self.budget < 0:
+            wait = max(wait, -self.budget / self.rate)
+        return wait
+
+    ################################################
+    ##              ADMISSION
+    ################################################
+
+    def _grant(self, connection: Optional[str], cost: float) -> Lease:
+        self.active += 1
+        self._connections[connection] = self._connections.get(connection, 0) + 1
+        self._charge(cost)
+        IN_USE.set(self.active, pool=self.name)
+        return Lease(self, connection, cost)
+
+    def _release(self, lease: Lease):
+        self.active -= 1
+        count = self._connections.get(lease.connection, 1) - 1
+        if count:
+            self._connections[lease.connection] = count
+        else:
+            self._connections.pop(lease.connection, None)
+        self.hold_time = 0.9 * self.hold_time + 0.1 * (time.monotonic() - lease.started)
+        IN_USE.set(self.active, pool=self.name)
+        self._dispatch()
+
+    def _dispatch(self):
+        self._refill()
+        while self._waiters and self._open():
+            # highest priority first; skip waiters whose connection is at its own cap
+            for waiter in sorted(self._waiters):
+                if self._fits(waiter.connection):
+                    break
+            else:
+                break
+            self._waiters.remove(waiter)
+            waiter.future.set_result(self._grant(waiter.connection, waiter.cost))
+        WAITING.set(len(self._waiters), pool=self.name)
+        if self._waiters and self.rate and self.budget < 0 and self._timer is None:
+            # wake up when the budget is out of debt again
+            self._timer = asyncio.get_running_loop().call_later(-self.budget / self.rate, self._wake)
+
+    def _wake(self):
+        self._timer = None
+        self._dispatch()
+
+    async def acquire(self, cost: float = 0) -> Lease:
+        """Capacity for one request costing `cost` budget units (tokens, characters)."""
+        request = _admission.get()
+        priority = int(request.priority)
+        start = time.monotonic()
+        self._refill()
+        if not self._waiters and self._open() and self._fits(request.connection):
+            QUEUE_SECONDS.observe(0.0, pool=self.name, priority=request.priority.name.lower())
+            return self._grant(request.connection, cost)
+
+        if request.deadline is not None:
+            expected = self.expected_wait(priority)
+            if expected > request.deadline:
+                REJECTED.inc(pool=self.name, priority=request.priority.name.lower())
+                raise Overloaded(self.name, expected)
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(priority, next(self._seq), request.connection, cost, future)
+        self._waiters.append(waiter)
+        self._dispatch()  # also arms the refill timer when only the rate budget holds it back
+        try:
+            done, _ = await asyncio.wait([future], timeout=request.deadline)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if not done:
+            self._abandon(waiter)
+            if future.done() and not future.cancelled():
+                future.result().release()  # granted just as the deadline passed
+            REJECTED.inc(pool=self.name, priority=request.priority.name.lower())
+            raise Overloaded(self.name, self.expected_wait(priority))
+        QUEUE_SECONDS.observe(time.monotonic() - start, pool=self.name, priority=request.priority.name.lower())
+        return future.result()
+
+    def _abandon(self, waiter: _Waiter):
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            WAITING.set(len(self._waiters), pool=self.name)
+        if waiter.future.done() and not waiter.future.cancelled():
+            waiter.future.result().release()
+        else:
+            waiter.future.cancel()
+
+    @asynccontextmanager
+    async def slot(self, cost: float = 0):
+        if not CONFIG.ADMISSION_ENABLED:
+            yield None
+            return
+        lease = await self.acquire(cost)
+        try:
+            yield lease
+        finally:
+            lease.release()
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "budget": round(self.budget, 1) if self.rate else None,
+            "hold_time": round(self.hold_time, 3),
+        }
+
+
+# OpenAI capacity is shared by answer generation and ingestion embeddings
+OPENAI_CAPACITY = CapacityPool(
+    "openai", CONFIG.OPENAI_MAX_CONCURRENT, CONFIG.OPENAI_MAX_PER_CONNECTION, CONFIG.OPENAI_TOKENS_PER_MINUTE
+)
+TTS_CAPACITY = CapacityPool(
+    "elevenlabs", CONFIG.ELEVEN_MAX_CONCURRENT, CONFIG.ELEVEN_MAX_PER_CONNECTION, CONFIG.ELEVEN_CHARS_PER_MINUTE
+)
@@ -0,0 +1,141 @@
+import re
+from typing import List, Optional
+
+from config import CONFIG
+
+SENTENCE_ENDS = ".!?"
+CLAUSE_ENDS = ",;:"
+CLOSERS = "\"')]”’"
+_CANDIDATE = re.compile(r"[\n.!?,;:\"')\]”’]")
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "inc", "ltd", "co",
+    "corp", "no", "fig", "approx", "dept", "est", "e.g", "i.e", "a.m", "p.m", "u.s",
+}
+
+
+class Segmenter:
+    """
+    Incremental text segmenter for streamed LLM output.
+
+    Text is fed as it arrives and every character is scanned exactly once. A sentence
+    boundary is a sentence end followed by whitespace (so "3.5", "example.com" and
+    "Dr. Smith" do not split) or a newline; a clause boundary is , ; or : followed by
+    whitespace.
+
+    - the first segment is cut at the first sentence or clause boundary after
+      `first_min_chars`, or at a space once it reaches `first_max_chars` (a few words),
+      to start speaking as early as possible
+    - later segments are cut at a sentence boundary once they reach `min_chars`
+    - a segment that reaches `max_chars` is cut at its last clause boundary,
+      else its last space
+
+    Segments joined together always reproduce the input exactly.
+    """
+
+    def __init__(self, first_min_chars: int = 4, first_max_chars: int = 24, min_chars: int = 80, max_chars: int = 200):
+        self.first_min_chars = first_min_chars
+        self.first_max_chars = first_max_chars
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._scan = 0
+        self._first = True
+        # latest cut positions (index just after the boundary) in the current buffer
+        self._sentence: Optional[int] = None
+        self._clause: Optional[int] = None
+        self._space: Optional[int] = None
+
+    def _is_abbreviation(self, dot: int) -> bool:
+        start = dot
+        while start > 0 and (self._buffer[start - 1].isalpha() or self._buffer[start - 1] == ".") and dot - start < 8:
+            start -= 1
+        word = self._buffer[start:dot].lower()
+        if not word:
+            return False
+        return word in ABBREVIATIONS or (len(word) == 1 and word.isalpha())
+
+    def _is_list_marker(self, dot: int) -> bool:
+        """A number opening a line, as in "1. First step"."""
+        start = dot
+        while start > 0 and self._buffer[start - 1].isdigit():
+            start -= 1
+        return start < dot and (start == 0 or self._buffer[start - 1] == "\n")
+
+    def _scan_new(self):
+        buffer = self._buffer
+        # a boundary needs the character after it, so stop one short of the end
+        end = len(buffer) - 1
+        if end <= self._scan:
+            return
+        space = buffer.rfind(" ", self._scan + 1, end + 1)
+        if space > 0:
+            self._space = space
+        for match in _CANDIDATE.finditer(buffer, self._scan, end):
+            i = match.start()
+            char = buffer[i]
+            if char == "\n":
+                self._sentence = i + 1
+            elif not buffer[i + 1].isspace():
+                continue
+            elif char in SENTENCE_ENDS or (char in CLOSERS and i > 0 and buffer[i - 1] in SENTENCE_ENDS):
+                dot = i if char in SENTENCE_ENDS else i - 1
+                if buffer[dot] != "." or not (self._is_abbreviation(dot) or self._is_list_marker(dot)):
+                    self._sentence = i + 1
+            elif char in CLAUSE_ENDS:
+                self._clause = i + 1
+        self._scan = end
+
+    def _next_cut(self) -> Optional[int]:
+        if self._first:
+            if self._sentence and self._sentence >= self.first_min_chars:
+                return self._sentence
+            if self._clause and self._clause >= self.first_min_chars:
+                return self._clause
+            if len(self._buffer) >= self.first_max_chars and self._space:
+                return self._space
+        elif self._sentence and self._sentence >= self.min_chars:
+            return self._sentence
+        if len(self._buffer) >= self.max_chars:
+            return self._sentence or self._clause or self._space or len(self._buffer)
+        return None
+
+    def _cut(self, position: int) -> str:
+        segment, self._buffer = self._buffer[:position], self._buffer[position:]
+        shift = lambda p: p - position if p is not None and p > position else None
+        self._sentence, self._clause, self._space = shift(self._sentence), shift(self._clause), shift(self._space)
+        self._scan = max(0, self._scan - position)
+        self._first = False
+        return segment
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text; returns the segments completed by it (possibly none)."""
+        self._buffer += text
+        self._scan_new()
+        segments = []
+        while (cut := self._next_cut()) is not None:
+            segments.append(self._cut(cut))
+        return segments
+
+    def flush(self) -> Optional[str]:
+        """Whatever is left once the stream ends."""
+        if not self._buffer:
+            return None
+        segment, self._buffer = self._buffer, ""
+        self._scan, self._sentence, self._clause, self._space = 0, None, None, None
+        return segment
+
+
+def voice_segmenter() -> Segmenter:
+    """Small first segment for time-to-first-audio, then sentence-sized TTS requests."""
+    return Segmenter(
+        first_min_chars=CONFIG.VOICE_SEGMENT_FIRST_MIN_CHARS,
+        first_max_chars=CONFIG.VOICE_SEGMENT_FIRST_MAX_CHARS,
+        min_chars=CONFIG.VOICE_SEGMENT_MIN_CHARS,
+        max_chars=CONFIG.VOICE_SEGMENT_MAX_CHARS,
+    )
+
+
+def chat_segmenter() -> Segmenter:
+    """Chat text goes out sentence by sentence (or clause by clause in long sentences)."""
+    max_chars = CONFIG.CHAT_SEGMENT_MAX_CHARS
+    return Segmenter(first_min_chars=1, first_max_chars=max_chars, min_chars=1, max_chars=max_chars)
@@ -0,0 +1,236 @@
+import asyncio
+import time
+from collections import deque
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+from urllib.parse import urldefrag, urlparse, urlunparse
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+from pc.manifest import IngestManifest
+from utils.webscrapper.extractor import extract
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+def normalize_url(url: str) -> Optional[str]:
+    """Canonical form used for the frontier: no fragment, lower-case host, no default port."""
+    url, _ = urldefrag(url.strip())
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return None
+    host = parsed.hostname.lower()
+    port = parsed.port
+    if port and not ((parsed.scheme == "http" and port == 80) or (parsed.scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    path = parsed.path or "/"
+    return urlunparse((parsed.scheme, host, path, "", parsed.query, ""))
+
+
+class Crawler:
+    """
+    Breadth-first async crawler.
+
+    - one pooled httpx.AsyncClient (keep-alive) for every request
+    - bounded global and per-host concurrency
+    - robots.txt rules and crawl delays, plus a minimum delay between requests to a host
+    - depth and page budgets over a normalized-URL frontier restricted to the start domain
+    - with a manifest: conditional GETs, so unchanged pages (304) are not re-downloaded
+      but their recorded links are still followed
+
+    After a crawl, `not_modified` and `gone` list the pages that were unchanged or
+    returned 404/410, and `validators` maps each fetched URL to its (ETag, Last-Modified).
+    """
+
+    def __init__(
+        self,
+        max_pages: int = 50,
+        max_depth: int = 1,
+        concurrency: int = 32,
+        per_host_concurrency: int = 8,
+        delay: float = 0.0,
+        timeout: float = 10.0,
+        respect_robots: bool = True,
+        user_agent: str = USER_AGENT,
+        manifest: Optional[IngestManifest] = None,
+        index_name: Optional[str] = None,
+    ):
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.concurrency = concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.delay = delay
+        self.timeout = timeout
+        self.respect_robots = respect_robots
+        self.user_agent = user_agent
+        self.manifest = manifest
+        self.index_name = index_name
+
+        self.not_modified: List[str] = []
+        self.gone: List[str] = []
+        self.validators: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+
+        self._global = asyncio.Semaphore(concurrency)
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._robots: Dict[str, Optional[RobotFileParser]] = {}
+        self._robots_lock = asyncio.Lock()
+        self._next_slot: Dict[str, float] = {}
+
+    ################################################
+    ##              POLITENESS
+    ################################################
+
+    async def _robots_for(self, client: httpx.AsyncClient, url: str) -> Optional[RobotFileParser]:
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        async with self._robots_lock:
+            if origin not in self._robots:
+                parser = None
+                try:
+                    response = await client.get(f"{origin}/robots.txt")
+                    if response.status_code == 200:
+                        parser = RobotFileParser()
+                        parser.parse(response.text.splitlines())
+                except httpx.HTTPError:
+                    pass
+                self._robots[origin] = parser
+        return self._robots[origin]
+
+    async def _allowed(self, client: httpx.AsyncClient, url: str) -> bool:
+        if not self.respect_robots:
+            return True
+        robots = await self._robots_for(client, url)
+        return robots is None or robots.can_fetch(self.user_agent, url)
+
+    async def _wait_turn(self, client: httpx.AsyncClient, host: str, url: str):
+        """Space out requests to one host by the politeness delay (or robots crawl-delay)."""
+        delay = self.delay
+        if self.respect_robots:
+            robots = await self._robots_for(client, url)
+            crawl_delay = robots.crawl_delay(self.user_agent) if robots else None
+            if crawl_delay:
+                delay = max(delay, float(crawl_delay))
+        if delay <= 0:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + delay
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    ################################################
+    ##              FETCHING
+    ################################################
+
+    async def fetch(self, client: httpx.AsyncClient, url: str, headers: Optional[dict] = None) -> Optional[httpx.Response]:
+        host = urlparse(url).netloc
+        host_limit = self._hosts.setdefault(host, asyncio.Semaphore(self.per_host_concurrency))
+        async with self._global, host_limit:
+            await self._wait_turn(client, host, url)
+            try:
+                response = await client.get(url, headers=headers)
+            except httpx.HTTPError as e:
+                print(f"Error scraping {url}: {e}")
+                return None
+        if response.status_code in (304, 404, 410):
+            return response
+        if response.is_error:
+            print(f"Error scraping {url}: HTTP {response.status_code}")
+            return None
+        if "html" not in response.headers.get("content-type", "text/html"):
+            return None
+        return response
+
+    async def _visit(self, client: httpx.AsyncClient, url: str) -> Optional[Tuple[str, Optional[str], List[str]]]:
+        if not await self._allowed(client, url):
+            print(f"Skipping {url}: disallowed by robots.txt")
+            return None
+        headers = None
+        if self.manifest is not None:
+            headers = await asyncio.to_thread(self.manifest.conditional_headers, self.index_name, url)
+        response = await self.fetch(client, url, headers)
+        if response is None:
+            return None
+
+        if response.status_code == 304:
+            self.not_modified.append(url)
+            links = await asyncio.to_thread(self.manifest.links, self.index_name, url)
+            return url, None, links
+        if response.status_code in (404, 410):
+            self.gone.append(url)
+            return None
+
+        # Parsing is CPU-bound; it runs in the extraction process pool, off the event loop
+        text, links = await extract(str(response.url), response.content, response.charset_encoding)
+        self.validators[url] = (response.headers.get("etag"), response.headers.get("last-modified"))
+        if self.manifest is not None:
+            await asyncio.to_thread(self.manifest.set_links, self.index_name, url, links)
+        return url, text, links
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            headers={"User-Agent": self.user_agent},
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+        )
+
+    async def crawl(self, start_url: str) -> AsyncGenerator[Tuple[str, str], None]:
+        """
+        Yield (url, text) for every page downloaded, level by level; text is "" for a page
+        without main content, so its previously stored chunks can be dropped.
+        """
+        start = normalize_url(start_url)
+        if start is None:
+            return
+        domain = urlparse(start).netloc
+        seen = {start}
+        frontier = deque([start])
+        pages = 0
+
+        async with self.client() as client:
+            for depth in range(self.max_depth + 1):
+                if not frontier or pages >= self.max_pages:
+                    break
+                level = list(frontier)[: self.max_pages - pages]
+                frontier.clear()
+
+                # Sliding window of in-flight pages so memory stays bounded by the concurrency
+                queued = iter(level)
+                pending = set()
+                found: Dict[str, List[str]] = {}
+                try:
+                    while True:
+                        while len(pending) < self.concurrency:
+                            url = next(queued, None)
+                            if url is None:
+                                break
+                            pending.add(asyncio.create_task(self._visit(client, url)))
+                        if not pending:
+                            break
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            result = task.result()
+                            if result is None:
+                                continue
+                            url, text, links = result
+                            pages += 1
+                            found[url] = links
+                            if text is not None:  # None: not modified since the last crawl
+                                yield url, text
+                finally:
+                    for task in pending:
+                        task.cancel()
+
+                if depth == self.max_depth:
+                    break
+                # Expand in level order so the frontier (and page budget) is stable between runs
+                for url in level:
+                    for link in found.get(url, []):
+                        link = normalize_url(link)
+                        if link and link not in seen and urlparse(link).netloc == domain:
+                            seen.add(link)
+                            frontier.append(link)
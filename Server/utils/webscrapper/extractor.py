@@ -0,0 +1,247 @@
+#########################################################################
+#                       HTML extraction
+#
+#   Turns a downloaded page into the text worth indexing:
+#   - parsed with lxml (libxml2) rather than BeautifulSoup's pure-Python
+#     html.parser
+#   - scripts, styles, hidden elements and boilerplate (navigation, page
+#     headers and footers, sidebars, cookie banners, share widgets) dropped
+#   - when the page marks its main content (<main>, role="main", a single
+#     <article>) only that part is kept; link lists (menus without markup)
+#     are dropped anywhere by their link density
+#   - headings, list items, table rows and code blocks kept as lines of
+#     Markdown-like text, so chunking can split on the page's structure
+#
+#   Pages are parsed in the ingestion worker pool (see `extract`), so
+#   parsing scales across cores and does not hold the server's GIL.
+#########################################################################
+
+import re
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urljoin
+
+import lxml.html
+from lxml import etree
+
+from utils.workers import run_in_worker
+
+# never visible text
+DROP_TAGS = (
+    "script", "style", "noscript", "template", "iframe", "svg", "canvas", "object", "embed",
+    "button", "select", "textarea", "input", "dialog",
+)
+BOILERPLATE_TAGS = {"nav", "aside", "footer"}
+BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search", "menu", "menubar", "dialog", "alertdialog"}
+BOILERPLATE_NAME = re.compile(
+    r"(?:^|[\s_-])(?:nav|navbar|navigation|breadcrumbs?|footer|sidebar|cookies?|consent|gdpr|share|sharing|social|"
+    r"newsletter|subscribe|popup|modal|advert|ads|promo|skip-link)(?:$|[\s_-])",
+    re.I,
+)
+HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.I)
+# containers that are never dropped as boilerplate, whatever their class says
+KEEP_TAGS = {"html", "body", "main", "article"}
+
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "header", "footer", "aside", "nav", "blockquote", "figure",
+    "figcaption", "ul", "ol", "dl", "dt", "dd", "li", "table", "caption", "tr", "pre", "form", "fieldset",
+    "legend", "address", "details", "summary", "hr", "br", "h1", "h2", "h3", "h4", "h5", "h6",
+}
+HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+CELLS = {"td", "th"}
+
+MAX_LINK_DENSITY = 0.5  # share of a block's text inside links above which it is navigation
+MIN_MAIN_CHARS = 200  # a <main>/<article> with less text than this is not trusted as the content
+WHITESPACE = re.compile(r"\s+")
+
+
+################################################
+##              BOILERPLATE
+################################################
+
+def _is_boilerplate(element) -> bool:
+    if element.tag in KEEP_TAGS:
+        return False
+    attrib = element.attrib
+    if element.tag in BOILERPLATE_TAGS:
+        return True
+    if element.tag == "header" and not element.xpath("ancestor::article or ancestor::main"):
+        return True  # the site header; an article's header holds its title
+    if "hidden" in attrib or attrib.get("aria-hidden") == "true" or HIDDEN_STYLE.search(attrib.get("style", "")):
+        return True
+    if attrib.get("role", "").lower() in BOILERPLATE_ROLES:
+        return True
+    name = f"{attrib.get('class', '')} {attrib.get('id', '')}"
+    return bool(name.strip()) and BOILERPLATE_NAME.search(name) is not None
+
+
+def _strip_boilerplate(body):
+    page_chars = len(body.text_content())
+    doomed = []
+    for element in body.iter(etree.Element):
+        if not _is_boilerplate(element) or any(parent in doomed for parent in element.iterancestors()):
+            continue
+        # a class such as "has-sidebar" on a page-wide wrapper must not take the content with it
+        if element.tag not in BOILERPLATE_TAGS and len(element.text_content()) > page_chars / 2:
+            continue
+        doomed.append(element)
+    for element in doomed:
+        element.drop_tree()
+
+
+def _main_content(body):
+    """The element holding the page's main content, or `body` when the page does not mark it."""
+    candidates = body.xpath(".//main | .//*[@role='main']")
+    if not candidates:
+        articles = body.xpath(".//article")
+        candidates = articles if len(articles) == 1 else []  # several articles: a listing page
+    best = max(candidates, key=lambda element: len(element.text_content()), default=None)
+    if best is None or len(best.text_content().strip()) < MIN_MAIN_CHARS:
+        return body
+    return best
+
+
+################################################
+##              STRUCTURED TEXT
+################################################
+
+class _Blocks:
+    """Collects (kind, level, text) blocks while walking the tree."""
+
+    def __init__(self):
+        self.blocks: List[Tuple[str, int, str]] = []
+        self.parts: List[str] = []
+        self.link_chars = 0
+        self.kinds: List[Tuple[str, int]] = [("text", 0)]
+        self.links = 0
+        self.pre = 0
+        self.lists = 0
+
+    def add(self, text: Optional[str]):
+        if not text:
+            return
+        self.parts.append(text)
+        if self.links:
+            self.link_chars += len(text.strip())
+
+    def flush(self):
+        raw = "".join(self.parts)
+        kind, level = self.kinds[-1]
+        self.parts = []
+        link_chars, self.link_chars = self.link_chars, 0
+        text = raw.strip("\n") if kind == "pre" else WHITESPACE.sub(" ", raw).strip(" |")
+        if not text.strip():
+            return
+        if kind != "heading" and link_chars / len(text) > MAX_LINK_DENSITY:
+            return  # a menu, a list of related links, a "read more"
+        self.blocks.append((kind, level, text))
+
+    def start(self, element):
+        tag = element.tag
+        if tag in BLOCK_TAGS:
+            self.flush()
+            if tag in HEADINGS:
+                self.kinds.append(("heading", HEADINGS[tag]))
+            elif tag == "li":
+                self.kinds.append(("item", max(self.lists, 1)))
+            elif tag == "tr":
+                self.kinds.append(("row", 0))
+            elif tag == "pre":
+                self.pre += 1
+                self.kinds.append(("pre", 0))
+            elif tag in ("ul", "ol"):
+                self.lists += 1
+        elif tag in CELLS and self.parts:
+            self.parts.append(" | ")
+        elif tag == "a":
+            self.links += 1
+        self.add(element.text)
+
+    def end(self, element):
+        tag = element.tag
+        if tag in BLOCK_TAGS:
+            self.flush()
+            if tag in HEADINGS or tag in ("li", "tr", "pre"):
+                self.kinds.pop()
+            if tag == "pre":
+                self.pre -= 1
+            elif tag in ("ul", "ol"):
+                self.lists -= 1
+        elif tag == "a":
+            self.links -= 1
+        elif tag in CELLS:
+            self.parts.append(" ")
+        self.add(element.tail)
+
+    def text(self) -> str:
+        lines: List[str] = []
+        previous = None
+        for kind, level, text in self.blocks:
+            if kind == "heading":
+                line = f"{'#' * level} {text}"
+            elif kind == "item":
+                line = f"{'  ' * (level - 1)}- {text}"
+            elif kind == "pre":
+                line = f"```\n{text}\n```"
+            else:
+                line = text
+            # list items and table rows stay on consecutive lines, other blocks are paragraphs
+            if lines:
+                lines.append("\n" if kind == previous and kind in ("item", "row") else "\n\n")
+            lines.append(line)
+            previous = kind
+        return "".join(lines)
+
+
+def _walk(root) -> str:
+    blocks = _Blocks()
+    for event, element in etree.iterwalk(root, events=("start", "end")):
+        if not isinstance(element.tag, str):
+            continue
+        if event == "start":
+            blocks.start(element)
+        elif element is not root:
+            blocks.end(element)
+        else:
+            blocks.flush()  # the root's tail is outside the content
+    return blocks.text()
+
+
+################################################
+##              EXTRACTION
+################################################
+
+_parsers: Dict[Optional[str], lxml.html.HTMLParser] = {}
+
+
+def _parser(encoding: Optional[str]) -> lxml.html.HTMLParser:
+    if encoding not in _parsers:
+        try:
+            _parsers[encoding] = lxml.html.HTMLParser(encoding=encoding, remove_comments=True, remove_pis=True)
+        except LookupError:
+            return _parser(None)  # unknown charset label: let libxml2 detect it
+    return _parsers[encoding]
+
+
+def extract_page(url: str, html: Union[bytes, str], encoding: Optional[str] = None) -> Tuple[str, List[str]]:
+    """Main text of a page (structure kept as Markdown-like lines) and the absolute links it contains."""
+    if isinstance(html, str):
+        html, encoding = html.encode("utf-8"), "utf-8"
+    try:
+        document = lxml.html.document_fromstring(html, parser=_parser(encoding))
+    except (etree.ParserError, ValueError):
+        return "", []  # empty or not HTML
+
+    # links of the whole page (menus included) are still followed by the crawler
+    links = [urljoin(url, href.strip()) for href in document.xpath("//a/@href")]
+
+    etree.strip_elements(document, *DROP_TAGS, with_tail=False)
+    body = document.find("body")
+    if body is None:
+        body = document
+    _strip_boilerplate(body)
+    return _walk(_main_content(body)), links
+
+
+async def extract(url: str, html: Union[bytes, str], encoding: Optional[str] = None) -> Tuple[str, List[str]]:
+    """`extract_page` in the ingestion worker pool."""
+    return await run_in_worker(extract_page, url, html, encoding)
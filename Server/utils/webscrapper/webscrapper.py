@@ -1,100 +1,95 @@
 from typing import List, TypedDict, Optional
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from urllib.parse import urldefrag
+from urllib.parse import urlparse
+from config import CONFIG
+from pc.manifest import IngestManifest
+from utils.ingestion.chunker import get_chunker
+from utils.webscrapper.crawler import Crawler
+from utils.workers import run_in_worker
 
 class PageChunk(TypedDict):
     source_url: str
     content: str
     chunk_index: int
     total_chunks: int
-    char_count: int  # could be token_count if using token-based splitters
+    char_count: int
+    token_count: int  # tokens of the embedding model, the unit chunks are sized in
+    heading_path: str  # headings the chunk sits under, "Guide > Install"
+    breadcrumb: str  # heading path line the content starts with, "" if none
     metadata: Optional[dict]  # extendable
 
-def scrape_text_from_url(url: str, headers: dict) -> tuple[Optional[str], Optional[BeautifulSoup]]:
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        text = soup.get_text(separator=' ', strip=True)
-        return text, soup
-    except requests.exceptions.RequestException as e:
-        print(f"Error scraping {url}: {e}")
-        return None, None
+class ScrapeResult(TypedDict):
+    chunks: List[PageChunk]  # chunks of every downloaded page
+    pages: List[str]  # every downloaded page, including those that yielded no chunks
+    not_modified: List[str]  # pages answered with 304, nothing to re-ingest
+    removed: List[str]  # pages answered with 404/410, their vectors are stale
 
-def scrape_page_and_its_links(
-    start_url: str,
-    link_limit: int = 5,
-    chunk_size: int = 500,
-    chunk_overlap: int = 50
-) -> List[PageChunk]:
-    raw_pages: List[dict] = []
-
-    print(f"Starting scrape process for base URL: {start_url}")
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-
-    visited_urls = set()
-
-    # Scrape the base page
-    print(f"\n--- Scraping base page: {start_url} ---")
-    initial_text, soup = scrape_text_from_url(start_url, headers)
-
-    if not soup or not initial_text:
-        return []
-
-    raw_pages.append({"url": start_url, "content": initial_text})
-    visited_urls.add(start_url)
-    print(f"Successfully scraped {len(initial_text)} characters from the base page.")
-
-    # Collect links on the page
-    links_to_visit = set()
-    base_domain = urlparse(start_url).netloc
-
-    for tag in soup.find_all('a', href=True):
-        raw_url = urljoin(start_url, tag['href'])
-        full_url, _ = urldefrag(raw_url)  # strip fragment
-        if urlparse(full_url).netloc == base_domain and full_url.startswith('http'):
-            links_to_visit.add(full_url)
-
-    print(f"\nFound {len(links_to_visit)} unique links. Will scrape up to {link_limit}.")
-
-    # Scrape linked pages
-    scraped_link_count = 0
-    for link in links_to_visit:
-        if scraped_link_count >= link_limit:
-            break
-        if link not in visited_urls:
-            print(f"\n--- Scraping linked page ({scraped_link_count + 1}/{link_limit}): {link} ---")
-            linked_text, _ = scrape_text_from_url(link, headers)
-            if linked_text:
-                raw_pages.append({"url": link, "content": linked_text})
-                print(f"Successfully scraped {len(linked_text)} characters.")
-            visited_urls.add(link)
-            scraped_link_count += 1
-
-    # ✅ Chunk all page contents
-    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+def chunk_pages(raw_pages: List[dict]) -> List[PageChunk]:
+    """Chunk extracted pages with the shared chunker (CHUNK_TOKENS, see utils.ingestion.chunker)."""
+    chunker = get_chunker()
     chunked_pages: List[PageChunk] = []
 
     for page in raw_pages:
-        chunks = splitter.split_text(page["content"])
+        chunks = chunker.split(page["content"])
         total = len(chunks)
+        etag, last_modified = page.get("validators") or (None, None)
         for idx, chunk in enumerate(chunks):
             chunked_pages.append({
                 "source_url": page["url"],
-                "content": chunk,
+                "content": chunk["content"],
                 "chunk_index": idx,
                 "total_chunks": total,
-                "char_count": len(chunk),
+                "char_count": len(chunk["content"]),
+                "token_count": chunk["token_count"],
+                "heading_path": chunk["heading_path"],
+                "breadcrumb": chunk["breadcrumb"],
                 "metadata": {
                     "source": "scraped",
-                    "domain": urlparse(page["url"]).netloc
+                    "domain": urlparse(page["url"]).netloc,
+                    "etag": etag,
+                    "last_modified": last_modified,
                 }
             })
-
-    print(f"\nTotal chunks generated: {len(chunked_pages)}")
     return chunked_pages
+
+async def scrape_site(
+    start_url: str,
+    link_limit: int = 5,
+    max_depth: int = 1,
+    manifest: Optional[IngestManifest] = None,
+    index_name: Optional[str] = None,
+) -> ScrapeResult:
+    """
+    Crawl `start_url` breadth-first (up to `link_limit` further pages) and chunk every page.
+    With a manifest, pages unchanged since the last ingestion into `index_name` are not downloaded.
+    """
+    print(f"Starting scrape process for base URL: {start_url}")
+    crawler = Crawler(
+        max_pages=link_limit + 1,
+        max_depth=max_depth,
+        concurrency=CONFIG.CRAWL_CONCURRENCY,
+        per_host_concurrency=CONFIG.CRAWL_PER_HOST_CONCURRENCY,
+        delay=CONFIG.CRAWL_DELAY,
+        respect_robots=CONFIG.CRAWL_RESPECT_ROBOTS,
+        manifest=manifest,
+        index_name=index_name,
+    )
+
+    raw_pages: List[dict] = []
+    async for url, text in crawler.crawl(start_url):
+        raw_pages.append({"url": url, "content": text, "validators": crawler.validators.get(url)})
+        print(f"Scraped {len(text)} characters from {url} ({len(raw_pages)}/{link_limit + 1})")
+
+    # ✅ Chunk all page contents
+    chunked_pages = await run_in_worker(chunk_pages, raw_pages)
+
+    print(f"\nTotal chunks generated: {len(chunked_pages)} ({len(crawler.not_modified)} pages not modified)")
+    return {"chunks": chunked_pages, "pages": [page["url"] for page in raw_pages], "not_modified": crawler.not_modified, "removed": crawler.gone}
+
+async def scrape_page_and_its_links(
+    start_url: str,
+    link_limit: int = 5,
+    max_depth: int = 1,
+) -> List[PageChunk]:
+    """Crawl `start_url` and return the chunks of every page (no incremental state)."""
+    result = await scrape_site(start_url, link_limit, max_depth)
+    return result["chunks"]
@@ -0,0 +1,61 @@
+#########################################################################
+#                       Ingestion worker processes
+#
+#   CPU-bound ingestion work (parsing pages, chunking documents) runs in
+#   one shared process pool, so it scales across cores and neither blocks
+#   the event loop nor holds the server's GIL. Functions sent here must
+#   be module-level and take picklable arguments.
+#########################################################################
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional, TypeVar
+
+from config import CONFIG
+
+T = TypeVar("T")
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_worker_pool() -> Optional[ProcessPoolExecutor]:
+    """The shared pool; None runs work in a thread instead (INGEST_PROCESSES=0)."""
+    global _pool
+    if _pool is None and CONFIG.INGEST_PROCESSES > 0:
+        _pool = ProcessPoolExecutor(CONFIG.INGEST_PROCESSES)
+    return _pool
+
+
+def start_worker_pool():
+    """
+    Fork the workers now, before the server starts its own threads (connection warm-up,
+    search and ingestion executors), rather than mid-ingestion. Threads a library started
+    at import time may already exist; the workers only run the picklable functions sent to
+    them, which use none of those threads' state. The fork start method is kept because
+    spawn / forkserver re-import the main module, which builds the whole server.
+    """
+    pool = get_worker_pool()
+    if pool is not None:
+        pool.submit(int)
+
+
+def shutdown_worker_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def run_in_worker(fn: Callable[..., T], *args) -> T:
+    """`fn(*args)` in the worker pool, off the event loop."""
+    pool = get_worker_pool()
+    if pool is not None:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            # a worker died (e.g. out of memory); the next call gets a fresh pool
+            print(f"Worker pool failed running {fn.__name__}, restarting it")
+            if _pool is pool:
+                shutdown_worker_pool()
+    return await asyncio.to_thread(fn, *args)